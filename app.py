@@ -1,139 +1,321 @@
-from flask import Flask, render_template_string, request
+from flask import Flask, Response, g, jsonify, render_template_string, request, stream_with_context
+import codecs
+import csv
+import io
+import itertools
+import json
+import re
+import threading
+import time
 import uuid
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.storage.blob import BlobServiceClient
-from azure.cosmos import CosmosClient, PartitionKey
-from azure.mgmt.containerregistry import ContainerRegistryManagementClient
-from azure.mgmt.containerregistry.models import Registry
-import pyodbc
-import redis
-
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
 import os
 
+from lazy_sdk import lazy_import, process_age, register_metrics as register_sdk_metrics, rss_bytes
+
+# SDK của từng service chỉ được import khi service đó được dùng lần đầu (xem lazy_sdk.py)
+keyvault_secrets = lazy_import("azure.keyvault.secrets")
+storage_blob = lazy_import("azure.storage.blob")
+azure_cosmos = lazy_import("azure.cosmos")
+acr_mgmt = lazy_import("azure.mgmt.containerregistry")
+pyodbc = lazy_import("pyodbc")
+redis = lazy_import("redis")
+
+from app_config import DEFAULT_CONFIG_FILE, ConfigHolder
+from blob_transfer import DEFAULT_BLOCK_SIZE, DEFAULT_CHUNK_SIZE, iter_download, upload_stream
+from client_pool import ClientPool, SqlConnectionPool
+from cosmos_ingest import ingest_items, iter_json_items, open_text
+from metrics import CONTENT_TYPE, REGISTRY, MultiprocessExporter
+from result_cache import RedisCache, TTLCache
+from shared_credential import get_credential, register_metrics
+from step_results import StepRecorder, waterfall
+
 app = Flask(__name__)
 
+# --- Metrics (Prometheus, GET /metrics) ---
+KNOWN_SERVICES = ("keyvault", "sql", "cosmos", "blob", "acr", "redis")
+KNOWN_ACTIONS = ("add", "bulk", "ingest", "list", "test")
+REQUEST_SECONDS = REGISTRY.histogram(
+    "flask_request_duration_seconds", "Thời gian xử lý request Flask", ("endpoint", "service", "action", "status"))
+SDK_CALLS = REGISTRY.counter("azure_sdk_calls_total", "Số lần gọi SDK", ("service", "operation"))
+SDK_ERRORS = REGISTRY.counter("azure_sdk_errors_total", "Số lần gọi SDK bị lỗi", ("service", "operation"))
+SDK_SECONDS = REGISTRY.histogram("azure_sdk_call_duration_seconds", "Thời gian gọi SDK", ("service", "operation"))
+register_metrics(REGISTRY)
+register_sdk_metrics(REGISTRY)
+
+@contextmanager
+def sdk_call(service, operation):
+    """Đếm số lần gọi, số lỗi và đo thời gian một thao tác SDK."""
+    SDK_CALLS.labels(service, operation).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SDK_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        SDK_SECONDS.labels(service, operation).observe(time.perf_counter() - start)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    start = g.pop("request_start", None)
+    if start is not None and request.endpoint not in ("metrics", "healthz", "readyz"):
+        # Chỉ dùng giá trị đã biết làm nhãn để số series không tăng theo input người dùng
+        service = request.form.get("service") if request.method == "POST" else None
+        action = request.form.get("action") if request.method == "POST" else None
+        REQUEST_SECONDS.labels(
+            request.endpoint or "unknown",
+            service if service in KNOWN_SERVICES else "none",
+            action if action in KNOWN_ACTIONS else "none",
+            response.status_code,
+        ).observe(time.perf_counter() - start)
+    return response
+
+# Nhiều worker gunicorn (serve.py): metric của các worker được gộp qua thư mục chung, scrape worker nào cũng như nhau
+METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR")
+metrics_exporter = MultiprocessExporter(REGISTRY, METRICS_MULTIPROC_DIR) if METRICS_MULTIPROC_DIR else None
+
+@app.route('/metrics')
+def metrics():
+    body = metrics_exporter.render() if metrics_exporter is not None else REGISTRY.render()
+    return Response(body, content_type=CONTENT_TYPE)
+
+# --- Client dùng chung (tái sử dụng giữa các request) ---
+CLIENT_IDLE_TIMEOUT = int(os.environ.get("CLIENT_IDLE_TIMEOUT", "300"))
+clients = ClientPool(
+    idle_timeout=CLIENT_IDLE_TIMEOUT,
+    check_interval=int(os.environ.get("CLIENT_CHECK_INTERVAL", "30")),
+)
+
+def get_secret_client(vault_url, credential):
+    return clients.get("keyvault", vault_url,
+                       lambda: keyvault_secrets.SecretClient(vault_url=f"https://{vault_url}/",
+                                                             credential=credential))
+
+def get_blob_service_client(connection_string):
+    return clients.get("blob", connection_string,
+                       lambda: storage_blob.BlobServiceClient.from_connection_string(connection_string))
+
+def get_blob_service_client_aad(blob_url, credential):
+    return clients.get("blob_aad", blob_url,
+                       lambda: storage_blob.BlobServiceClient(account_url=f"https://{blob_url}/",
+                                                              credential=credential))
+
+def get_cosmos_client(endpoint, key):
+    return clients.get("cosmos", (endpoint, key), lambda: azure_cosmos.CosmosClient(f"https://{endpoint}/", key))
+
+def get_acr_client(subscription_id, credential):
+    return clients.get("acr", subscription_id,
+                       lambda: acr_mgmt.ContainerRegistryManagementClient(credential, subscription_id))
+
+def get_redis_client(redis_connection_string):
+    return clients.get("redis", redis_connection_string,
+                       lambda: redis.from_url(redis_connection_string),
+                       health_check=lambda r: r.ping())
+
+def get_redis_cluster_client(redis_connection_string):
+    # Client biết slot map: gửi từng key tới đúng shard thay vì nhận MOVED
+    return clients.get("redis_cluster", redis_connection_string,
+                       lambda: redis.RedisCluster.from_url(redis_connection_string),
+                       health_check=lambda r: r.ping())
+
+def is_sql_disconnect(exc):
+    """Lỗi làm hỏng connection: SQLSTATE 08xxx (mất kết nối) hoặc lỗi của chính pyodbc/driver."""
+    state = exc.args[0] if isinstance(exc, pyodbc.Error) and exc.args else ''
+    return isinstance(exc, (pyodbc.OperationalError, pyodbc.InterfaceError)) or str(state).startswith('08')
+
+def get_sql_pool(connection_string):
+    # Mỗi worker một pool (gunicorn fork nhiều worker) nên tổng connection = SQL_POOL_SIZE x số worker
+    return clients.get("sql", connection_string, lambda: SqlConnectionPool(
+        lambda: pyodbc.connect(connection_string, timeout=5),
+        max_size=int(os.environ.get("SQL_POOL_SIZE", "5")),
+        max_lifetime=int(os.environ.get("SQL_POOL_MAX_LIFETIME", "1800")),
+        idle_timeout=CLIENT_IDLE_TIMEOUT,
+        checkout_timeout=int(os.environ.get("SQL_POOL_CHECKOUT_TIMEOUT", "10")),
+        is_disconnect=is_sql_disconnect,
+    ), close=SqlConnectionPool.close)
+
+# --- Cache kết quả list (khóa theo service + resource + tham số; action add xóa namespace tương ứng) ---
+def make_list_cache():
+    """Cache trong process (LRU); có LIST_CACHE_REDIS_URL thì dùng Redis để các replica dùng chung.
+
+    Cache trong process có LIST_CACHE_DIR (serve.py tự đặt khi chạy nhiều worker) thì generation của
+    namespace nằm trong thư mục đó: add/bulk/ingest ở một worker cũng làm mới list ở các worker khác.
+    Nhiều replica (pod) thì vẫn cần LIST_CACHE_REDIS_URL.
+    """
+    ttl = int(os.environ.get("LIST_CACHE_TTL", "30"))
+    redis_url = os.environ.get("LIST_CACHE_REDIS_URL")
+    if redis_url:
+        return RedisCache(redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1), ttl=ttl)
+    return TTLCache(ttl=ttl, max_entries=int(os.environ.get("LIST_CACHE_MAX_ENTRIES", "1024")),
+                    generation_dir=os.environ.get("LIST_CACHE_DIR") or None)
+
+list_cache = make_list_cache()
+
+for _name, _stat, _help in (
+    ("list_cache_hits_total", "hits", "Số lần list lấy kết quả từ cache"),
+    ("list_cache_misses_total", "misses", "Số lần list không có trong cache"),
+    ("list_cache_coalesced_total", "coalesced", "Số request list gộp vào một lần gọi đang chạy"),
+):
+    REGISTRY.callback(_name, "counter", _help, lambda stat=_stat: list_cache.stats()[stat])
+
+def sql_connection(connection_string):
+    # pyodbc connection không thread-safe nên mượn độc quyền từ pool của connection string
+    return get_sql_pool(connection_string).connection()
+
+def sql_pool_stat(name):
+    return sum(pool.stats()[name] for pool in clients.items("sql"))
+
+for _name, _kind, _stat, _help in (
+    ("sql_pool_checked_out", "gauge", "checked_out", "Số connection SQL đang được mượn"),
+    ("sql_pool_idle", "gauge", "idle", "Số connection SQL đang rảnh trong pool"),
+    ("sql_pool_connections_created_total", "counter", "created", "Số connection SQL đã mở"),
+    ("sql_pool_stale_total", "counter", "stale", "Số connection SQL hỏng phát hiện khi mượn"),
+    ("sql_pool_checkout_timeouts_total", "counter", "timeouts", "Số lần chờ mượn connection SQL quá hạn"),
+):
+    REGISTRY.callback(_name, _kind, _help, lambda stat=_stat: sql_pool_stat(stat))
+
 
 # --- Helper functions ---
 def test_key_vault_full(vault_url, credential):
-    steps = []
+    steps = StepRecorder()
     try:
-        client = SecretClient(vault_url=f"https://{vault_url}/", credential=credential)
+        client = keyvault_secrets.SecretClient(vault_url=f"https://{vault_url}/", credential=credential)
         secret_name = f"test-conn-{uuid.uuid4().hex[:8]}"
         secret_value = uuid.uuid4().hex
+        steps.begin("set_secret")
         client.set_secret(secret_name, secret_value)
-        steps.append((True, f"Tạo secret '{secret_name}' thành công"))
+        steps.ok(f"Tạo secret '{secret_name}' thành công")
+        steps.begin("get_secret")
         got = client.get_secret(secret_name)
         if got.value == secret_value:
-            steps.append((True, f"Đọc secret thành công: {got.value}"))
+            steps.ok(f"Đọc secret thành công: {got.value}")
         else:
-            steps.append((False, "Giá trị secret không khớp!"))
+            steps.fail("Giá trị secret không khớp!")
+        steps.begin("delete_secret")
         poller = client.begin_delete_secret(secret_name)
         poller.wait()
-        steps.append((True, "Xóa secret thành công"))
+        steps.ok("Xóa secret thành công")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_azure_sql_full(connection_string):
-    steps = []
+    steps = StepRecorder()
     table = "test_connectivity"
     try:
-        conn = pyodbc.connect(connection_string, timeout=5)
-        cursor = conn.cursor()
-        try:
-            cursor.execute(f"CREATE TABLE {table} (id INT PRIMARY KEY, val NVARCHAR(100))")
+        steps.begin("connect")
+        with sql_connection(connection_string) as conn:
+            cursor = conn.cursor()
+            steps.ok("Kết nối thành công")
+            steps.begin("create_table")
+            try:
+                cursor.execute(f"CREATE TABLE {table} (id INT PRIMARY KEY, val NVARCHAR(100))")
+                conn.commit()
+                steps.ok("Tạo bảng test thành công")
+            except Exception:
+                conn.rollback()
+                steps.ok("Bảng test đã tồn tại")
+            steps.begin("insert")
+            cursor.execute(f"INSERT INTO {table} (id, val) VALUES (?, ?)", (1, "hello"))
             conn.commit()
-            steps.append((True, "Tạo bảng test thành công"))
-        except Exception:
-            steps.append((True, "Bảng test đã tồn tại"))
-        cursor.execute(f"INSERT INTO {table} (id, val) VALUES (?, ?)", (1, "hello"))
-        conn.commit()
-        steps.append((True, "Insert thành công"))
-        cursor.execute(f"SELECT val FROM {table} WHERE id=1")
-        row = cursor.fetchone()
-        if row and row[0] == "hello":
-            steps.append((True, f"Select thành công: {row[0]}"))
-        else:
-            steps.append((False, "Select thất bại!"))
-        cursor.execute(f"DELETE FROM {table} WHERE id=1")
-        conn.commit()
-        steps.append((True, "Xóa dòng test thành công"))
-        cursor.execute(f"DROP TABLE {table}")
-        conn.commit()
-        steps.append((True, "Xóa bảng test thành công"))
-        conn.close()
+            steps.ok("Insert thành công", count=cursor.rowcount)
+            steps.begin("select")
+            cursor.execute(f"SELECT val FROM {table} WHERE id=1")
+            row = cursor.fetchone()
+            if row and row[0] == "hello":
+                steps.ok(f"Select thành công: {row[0]}", count=1)
+            else:
+                steps.fail("Select thất bại!")
+            steps.begin("delete_row")
+            cursor.execute(f"DELETE FROM {table} WHERE id=1")
+            conn.commit()
+            steps.ok("Xóa dòng test thành công", count=cursor.rowcount)
+            steps.begin("drop_table")
+            cursor.execute(f"DROP TABLE {table}")
+            conn.commit()
+            steps.ok("Xóa bảng test thành công")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
-def test_cosmosdb_full(connection_string):
-    steps = []
+def test_cosmosdb_full(endpoint, key):
+    steps = StepRecorder()
     db_name = f"testdb{uuid.uuid4().hex[:6]}"
     container_name = f"testct{uuid.uuid4().hex[:6]}"
     try:
-        # Parse connection string để lấy endpoint và key
-        conn_parts = dict(part.split('=', 1) for part in connection_string.split(';') if '=' in part)
-        endpoint = conn_parts.get('AccountEndpoint', '').replace('https://', '').replace('http://', '')
-        key = conn_parts.get('AccountKey', '')
-        
-        if not endpoint or not key:
-            steps.append((False, "Connection string không hợp lệ"))
-            return steps
-            
-        client = CosmosClient(f"https://{endpoint}/", key)
+        # endpoint/key đã tách và kiểm tra sẵn trong AppConfig; client lấy từ pool như các thao tác khác
+        client = get_cosmos_client(endpoint, key)
+        steps.begin("create_database")
         db = client.create_database(db_name)
-        steps.append((True, f"Tạo database '{db_name}' thành công"))
-        container = db.create_container(id=container_name, partition_key=PartitionKey(path="/id"))
-        steps.append((True, f"Tạo container '{container_name}' thành công"))
+        steps.ok(f"Tạo database '{db_name}' thành công")
+        steps.begin("create_container")
+        container = db.create_container(id=container_name, partition_key=azure_cosmos.PartitionKey(path="/id"))
+        steps.ok(f"Tạo container '{container_name}' thành công")
+        steps.begin("create_item")
         item = {"id": "1", "val": "hello"}
         container.create_item(item)
-        steps.append((True, "Insert item thành công"))
+        steps.ok("Insert item thành công", count=1)
+        steps.begin("query_items")
         items = list(container.query_items(query="SELECT * FROM c WHERE c.id='1'", enable_cross_partition_query=True))
         if items and items[0]["val"] == "hello":
-            steps.append((True, f"Query thành công: {items[0]['val']}"))
+            steps.ok(f"Query thành công: {items[0]['val']}", count=len(items))
         else:
-            steps.append((False, "Query thất bại!"))
+            steps.fail("Query thất bại!", count=len(items))
+        steps.begin("delete_item")
         container.delete_item(item="1", partition_key="1")
-        steps.append((True, "Xóa item thành công"))
+        steps.ok("Xóa item thành công", count=1)
+        steps.begin("delete_container")
         db.delete_container(container_name)
-        steps.append((True, "Xóa container thành công"))
+        steps.ok("Xóa container thành công")
+        steps.begin("delete_database")
         client.delete_database(db_name)
-        steps.append((True, "Xóa database thành công"))
+        steps.ok("Xóa database thành công")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_blob_full(connection_string):
-    steps = []
+    steps = StepRecorder()
     container_name = f"testct{uuid.uuid4().hex[:6]}"
     blob_name = "testfile.txt"
     data = b"hello azure blob"
     try:
-        client = BlobServiceClient.from_connection_string(connection_string)
+        client = storage_blob.BlobServiceClient.from_connection_string(connection_string)
+        steps.begin("create_container")
         container = client.create_container(container_name)
-        steps.append((True, f"Tạo container '{container_name}' thành công"))
+        steps.ok(f"Tạo container '{container_name}' thành công")
         container_client = client.get_container_client(container_name)
+        steps.begin("upload_blob")
         container_client.upload_blob(blob_name, data)
-        steps.append((True, "Upload blob thành công"))
+        steps.ok("Upload blob thành công", count=len(data))
+        steps.begin("download_blob")
         blob_data = container_client.download_blob(blob_name).readall()
         if blob_data == data:
-            steps.append((True, "Download blob thành công"))
+            steps.ok("Download blob thành công", count=len(blob_data))
         else:
-            steps.append((False, "Dữ liệu blob không khớp!"))
+            steps.fail("Dữ liệu blob không khớp!", count=len(blob_data))
+        steps.begin("delete_blob")
         container_client.delete_blob(blob_name)
-        steps.append((True, "Xóa blob thành công"))
+        steps.ok("Xóa blob thành công")
+        steps.begin("delete_container")
         client.delete_container(container_name)
-        steps.append((True, "Xóa container thành công"))
+        steps.ok("Xóa container thành công")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_redis_full(redis_connection_string):
-    steps = []
+    steps = StepRecorder()
     key = f"testkey:{uuid.uuid4().hex[:6]}"
     value = uuid.uuid4().hex
     try:
+        steps.begin("connect")
         # Hỗ trợ Redis với SSH tunnel
         if redis_connection_string.startswith('ssh://'):
             # Parse SSH connection string: ssh://user@host:port
@@ -152,144 +334,424 @@ def test_redis_full(redis_connection_string):
                 
                 # Tạo Redis connection qua SSH tunnel
                 r = redis.Redis(host='localhost', port=6379, decode_responses=True)
-                steps.append((True, f"Kết nối Redis qua SSH thành công: {host}:{port}"))
+                steps.ok(f"Kết nối Redis qua SSH thành công: {host}:{port}")
             else:
-                steps.append((False, "SSH connection string không hợp lệ"))
+                steps.fail("SSH connection string không hợp lệ")
                 return steps
         else:
             # Kết nối Redis trực tiếp
             r = redis.from_url(redis_connection_string)
-            steps.append((True, "Kết nối Redis trực tiếp thành công"))
+            steps.ok("Kết nối Redis trực tiếp thành công")
         
-        r.set(key, value)
-        steps.append((True, f"Set key '{key}' thành công"))
-        val = r.get(key)
-        if val and val == value:
-            steps.append((True, "Get key thành công"))
+        # SET/GET/DEL gửi chung một pipeline: 1 round-trip thay vì 3
+        steps.begin("set_get_delete")
+        pipe = r.pipeline(transaction=False)
+        pipe.set(key, value, ex=60)
+        pipe.get(key)
+        pipe.delete(key)
+        _, val, deleted = pipe.execute()
+        if isinstance(val, bytes):
+            val = val.decode()
+        if val == value:
+            steps.ok(f"Set/Get/Xóa key '{key}' thành công (1 round-trip)", count=deleted)
         else:
-            steps.append((False, "Giá trị key không khớp!"))
-        r.delete(key)
-        steps.append((True, "Xóa key thành công"))
+            steps.fail("Giá trị key không khớp!", count=deleted)
         
         if redis_connection_string.startswith('ssh://'):
             ssh.close()
             
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_acr_full(acr_name, subscription_id, resource_group, credential):
-    steps = []
+    steps = StepRecorder()
     try:
-        acr_client = ContainerRegistryManagementClient(credential, subscription_id)
+        acr_client = acr_mgmt.ContainerRegistryManagementClient(credential, subscription_id)
+        steps.begin("get_registry")
         registry = acr_client.registries.get(resource_group, acr_name)
         login_server = registry.login_server
-        steps.append((True, f"Login server: {login_server}"))
+        steps.ok(f"Login server: {login_server}")
+        steps.begin("get_properties")
         try:
             props = acr_client.registries.get(resource_group, acr_name)
-            steps.append((True, "Có thể truy cập registry properties"))
+            steps.ok("Có thể truy cập registry properties")
         except Exception as e:
-            steps.append((False, f"Không thể truy cập registry properties: {e}"))
+            steps.fail(f"Không thể truy cập registry properties: {e}")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
-def list_key_vault_secrets(vault_url, credential):
+def _first_page(paged, marker):
+    """Lấy đúng một trang từ ItemPaged của SDK, trả về (items, marker của trang sau hoặc None)."""
+    pages = paged.by_page(continuation_token=marker or None)
+    page = next(pages, None)
+    return (list(page) if page is not None else []), pages.continuation_token
+
+KEYVAULT_PAGE_SIZE = int(os.environ.get("KEYVAULT_PAGE_SIZE", "25"))
+
+def _describe_secret(props):
+    expires = props.expires_on.strftime('%Y-%m-%d %H:%M') if props.expires_on else 'không'
+    updated = props.updated_on.strftime('%Y-%m-%d %H:%M') if props.updated_on else '?'
+    state = 'enabled' if props.enabled else 'disabled'
+    return f"Secret {props.name} — {state} — hết hạn: {expires} — cập nhật: {updated}"
+
+def list_key_vault_secrets(vault_url, credential, marker=None, page_size=KEYVAULT_PAGE_SIZE):
+    """Một trang thuộc tính secret (enabled, hết hạn, cập nhật), trả về (dòng hiển thị, marker trang sau)."""
+    def load():
+        client = get_secret_client(vault_url, credential)
+        with sdk_call("keyvault", "list_secrets"):
+            secrets, next_marker = _first_page(client.list_properties_of_secrets(max_page_size=page_size), marker)
+        return [_describe_secret(props) for props in secrets], next_marker
     try:
-        client = SecretClient(vault_url=f"https://{vault_url}/", credential=credential)
-        secrets = [s.name for s in client.list_properties_of_secrets()]
-        return secrets
+        return list_cache.get_or_load(("keyvault", vault_url), ("secrets", marker, page_size), load)
     except Exception as e:
-        return [str(e)]
+        clients.reset("keyvault", vault_url)
+        return [str(e)], None
+
+SQL_BULK_BATCH_SIZE = int(os.environ.get("SQL_BULK_BATCH_SIZE", "1000"))
+_SQL_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Bảng đã biết là tồn tại, để add/bulk không phải hỏi sysobjects mỗi lần
+_known_sql_tables = set()
+
+def ensure_sql_table(conn, connection_string, table):
+    """Tạo bảng test (id IDENTITY, val NVARCHAR(100)) nếu chưa có; chỉ kiểm tra một lần mỗi bảng."""
+    if (connection_string, table) in _known_sql_tables:
+        return
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM sysobjects WHERE name=? AND xtype='U'", (table,))
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE TABLE {table} (id INT IDENTITY(1,1) PRIMARY KEY, val NVARCHAR(100))")
+        conn.commit()
+    _known_sql_tables.add((connection_string, table))
+
+def read_sql_rows(text=None, upload=None):
+    """Các dòng CSV từ file upload (đọc dần theo stream) hoặc từ text dán vào; bỏ dòng trống."""
+    if upload is not None and upload.filename:
+        # SpooledTemporaryFile của Werkzeug không có readable() trên Python 3.10 nên không bọc bằng TextIOWrapper được
+        source = codecs.getreader("utf-8-sig")(upload.stream)
+    else:
+        source = io.StringIO(text or "")
+    return (row for row in csv.reader(source) if row and any(cell.strip() for cell in row))
+
+def bulk_insert_sql(connection_string, table, rows, header=False, batch_size=SQL_BULK_BATCH_SIZE):
+    """Insert theo lô bằng executemany với fast_executemany (một round-trip mỗi lô), commit mỗi lô.
+
+    header=False: mỗi dòng lấy cột đầu làm val của bảng test (tự tạo bảng).
+    header=True: dòng đầu là tên cột của một bảng đã có.
+    Trả về (số dòng, số giây).
+    """
+    if not _SQL_IDENTIFIER.match(table or ''):
+        raise ValueError(f"Tên bảng không hợp lệ: {table}")
+    rows = iter(rows)
+    if header:
+        columns = [c.strip() for c in next(rows, [])]
+        if not columns or not all(_SQL_IDENTIFIER.match(c) for c in columns):
+            raise ValueError(f"Header CSV không hợp lệ: {columns}")
+    else:
+        columns = ["val"]
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    total = 0
+    start = time.perf_counter()
+    with sdk_call("sql", "bulk_insert"), sql_connection(connection_string) as conn:
+        if not header:
+            ensure_sql_table(conn, connection_string, table)
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        while True:
+            # Dòng thiếu cột thì bù NULL, thừa cột thì bỏ
+            batch = [(tuple(row) + (None,) * len(columns))[:len(columns)] for row in itertools.islice(rows, batch_size)]
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+    return total, time.perf_counter() - start
 
 def list_sql_tables(connection_string):
-    try:
-        conn = pyodbc.connect(connection_string, timeout=5)
+    def query(conn):
         cursor = conn.cursor()
         cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE='BASE TABLE'")
-        tables = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return tables
+        return [row[0] for row in cursor.fetchall()]
+    def load():
+        with sdk_call("sql", "list_tables"):
+            # Chỉ đọc nên chạy lại được an toàn nếu connection trong pool đã bị đứt
+            return get_sql_pool(connection_string).run(query)
+    try:
+        return list_cache.get_or_load(("sql", connection_string), ("tables",), load)
     except Exception as e:
         return [str(e)]
 
-def list_cosmos_items(endpoint, key, db_name, container_name):
-    try:
-        client = CosmosClient(f"https://{endpoint}/", key)
+COSMOS_PAGE_SIZE = int(os.environ.get("COSMOS_PAGE_SIZE", "50"))
+_COSMOS_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+def cosmos_projection(fields):
+    """Câu SELECT chỉ lấy các field được chọn (luôn kèm id); không chọn field nào thì lấy cả document.
+
+    Field viết dạng c["tên"] để tên trùng từ khóa của Cosmos SQL (value, select, top...) vẫn hợp lệ.
+    """
+    names = [f.strip() for f in (fields or '').split(',') if f.strip()]
+    for name in names:
+        if not _COSMOS_FIELD.match(name):
+            raise ValueError(f"Tên field không hợp lệ: {name}")
+    if not names:
+        return "SELECT * FROM c"
+    if 'id' not in names:
+        names.insert(0, 'id')
+    paths = ("c" + "".join(f'["{part}"]' for part in name.split('.')) for name in names)
+    return "SELECT " + ", ".join(paths) + " FROM c"
+
+def list_cosmos_items(endpoint, key, db_name, container_name, fields=None, continuation=None,
+                      page_size=COSMOS_PAGE_SIZE):
+    """Đọc đúng một trang item (tối đa page_size), trả về (items, continuation token của trang sau hoặc None)."""
+    def load():
+        client = get_cosmos_client(endpoint, key)
         db = client.get_database_client(db_name)
         container = db.get_container_client(container_name)
-        items = list(container.read_all_items())
-        return items
+        with sdk_call("cosmos", "list_items"):
+            pages = container.query_items(
+                query=cosmos_projection(fields),
+                enable_cross_partition_query=True,
+                max_item_count=page_size,
+            ).by_page(continuation or None)
+            page = next(pages, None)
+            items = list(page) if page is not None else []
+        return [json.dumps(item, ensure_ascii=False, default=str) for item in items], pages.continuation_token
+    try:
+        return list_cache.get_or_load(("cosmos", endpoint),
+                                      ("items", db_name, container_name, fields, continuation, page_size), load)
+    except ValueError as e:
+        return [str(e)], None
     except Exception as e:
-        return [str(e)]
+        clients.reset("cosmos", (endpoint, key))
+        return [str(e)], None
+
+BLOB_PAGE_SIZE = int(os.environ.get("BLOB_PAGE_SIZE", "100"))
 
-def list_blob_containers(connection_string):
+def _describe_blob(item):
+    if isinstance(item, storage_blob.BlobPrefix):
+        return f"[thư mục] {item.name}"
+    modified = item.last_modified.strftime('%Y-%m-%d %H:%M:%S') if item.last_modified else '?'
+    return f"{item.name} — {item.size} bytes — {modified}"
+
+def list_blob_containers(connection_string, prefix=None, marker=None, page_size=BLOB_PAGE_SIZE):
+    """Một trang container (lọc theo prefix), trả về (tên container, marker trang sau)."""
+    def load():
+        client = get_blob_service_client(connection_string)
+        with sdk_call("blob", "list_containers"):
+            containers, next_marker = _first_page(
+                client.list_containers(name_starts_with=prefix or None, results_per_page=page_size), marker)
+        return [c['name'] for c in containers], next_marker
     try:
-        client = BlobServiceClient.from_connection_string(connection_string)
-        containers = [c['name'] for c in client.list_containers()]
-        return containers
+        return list_cache.get_or_load(("blob", connection_string), ("containers", prefix, marker, page_size), load)
     except Exception as e:
-        return [str(e)]
+        clients.reset("blob", connection_string)
+        return [str(e)], None
 
-def list_blobs_in_container(connection_string, container_name):
-    try:
-        client = BlobServiceClient.from_connection_string(connection_string)
+def list_blobs_in_container(connection_string, container_name, prefix=None, delimiter=None, marker=None,
+                            page_size=BLOB_PAGE_SIZE):
+    """Một trang blob theo prefix; có delimiter thì gộp theo thư mục ảo (walk_blobs).
+
+    Kích thước và thời gian sửa lấy luôn từ kết quả list, không gọi thêm get_blob_properties.
+    """
+    def load():
+        client = get_blob_service_client(connection_string)
         container_client = client.get_container_client(container_name)
-        blobs = [b.name for b in container_client.list_blobs()]
-        return blobs
+        with sdk_call("blob", "list_blobs"):
+            if delimiter:
+                paged = container_client.walk_blobs(
+                    name_starts_with=prefix or None, delimiter=delimiter, results_per_page=page_size)
+            else:
+                paged = container_client.list_blobs(name_starts_with=prefix or None, results_per_page=page_size)
+            blobs, next_marker = _first_page(paged, marker)
+        return [_describe_blob(b) for b in blobs], next_marker
+    try:
+        return list_cache.get_or_load(("blob", connection_string),
+                                      ("blobs", container_name, prefix, delimiter, marker, page_size), load)
     except Exception as e:
-        return [str(e)]
+        clients.reset("blob", connection_string)
+        return [str(e)], None
 
 def list_acr_images(acr_name, subscription_id, resource_group, credential):
-    try:
-        acr_client = ContainerRegistryManagementClient(credential, subscription_id)
-        repos = acr_client.registries.list_credentials(resource_group, acr_name)
-        # This only lists credentials, to list images use REST or Azure SDK for Container Registry (preview)
-        # Here, we just return the login server as a placeholder
-        registry = acr_client.registries.get(resource_group, acr_name)
+    def load():
+        acr_client = get_acr_client(subscription_id, credential)
+        with sdk_call("acr", "list_images"):
+            repos = acr_client.registries.list_credentials(resource_group, acr_name)
+            # This only lists credentials, to list images use REST or Azure SDK for Container Registry (preview)
+            # Here, we just return the login server as a placeholder
+            registry = acr_client.registries.get(resource_group, acr_name)
         return [registry.login_server]
+    try:
+        return list_cache.get_or_load(("acr", subscription_id), ("images", resource_group, acr_name), load)
     except Exception as e:
+        clients.reset("acr", subscription_id)
         return [str(e)]
 
-def list_redis_keys(redis_connection_string, pattern='*'):
+REDIS_BULK_BATCH_SIZE = int(os.environ.get("REDIS_BULK_BATCH_SIZE", "500"))
+
+def parse_redis_pairs(text):
+    """Các cặp (key, value) từ text, mỗi dòng 'key=value'; bỏ dòng trống hoặc không có '='."""
+    for line in (text or '').splitlines():
+        key, sep, value = line.partition('=')
+        if sep and key.strip():
+            yield key.strip(), value.strip()
+
+# {connection string: server có chạy cluster mode không}; chỉ hỏi INFO một lần cho mỗi Redis
+_redis_cluster_mode = {}
+
+def redis_is_cluster(redis_connection_string):
+    """Redis chạy cluster mode (INFO cluster có cluster_enabled), kết quả được cache theo connection string."""
+    enabled = _redis_cluster_mode.get(redis_connection_string)
+    if enabled is None:
+        r = get_redis_client(redis_connection_string)
+        try:
+            enabled = bool(r.info("cluster").get("cluster_enabled"))
+        except redis.ResponseError:
+            enabled = False
+        _redis_cluster_mode[redis_connection_string] = enabled
+    return enabled
+
+def bulk_set_redis(redis_connection_string, pairs, ttl=None, batch_size=REDIS_BULK_BATCH_SIZE):
+    """Ghi nhiều key theo lô: không TTL thì một lệnh MSET mỗi lô, có TTL thì pipeline SET EX mỗi lô.
+
+    Trên Redis cluster, MSET với các key khác slot bị CROSSSLOT nên dùng client RedisCluster
+    và pipeline SET từng key (client tự chia lệnh theo shard).
+    Trả về (số key, số round-trip, số giây).
+    """
+    if ttl is not None and ttl <= 0:
+        raise ValueError("TTL phải lớn hơn 0")
+    pairs = iter(pairs)
+    count = round_trips = 0
+    start = time.perf_counter()
+    with sdk_call("redis", "bulk_set"):
+        cluster = redis_is_cluster(redis_connection_string)
+        if cluster:
+            r = get_redis_cluster_client(redis_connection_string)
+        else:
+            r = get_redis_client(redis_connection_string)
+        while True:
+            batch = list(itertools.islice(pairs, batch_size))
+            if not batch:
+                break
+            if ttl or cluster:
+                pipe = r.pipeline(transaction=False)
+                for key, value in batch:
+                    pipe.set(key, value, ex=ttl)
+                pipe.execute()
+            else:
+                r.mset(dict(batch))
+            count += len(batch)
+            round_trips += 1
+    return count, round_trips, time.perf_counter() - start
+
+# SCAN thay cho KEYS: mỗi lần gọi chỉ duyệt ~COUNT slot nên không chặn Redis
+REDIS_SCAN_COUNT = int(os.environ.get("REDIS_SCAN_COUNT", "200"))
+REDIS_LIST_LIMIT = int(os.environ.get("REDIS_LIST_LIMIT", "200"))
+REDIS_SCAN_MAX_CALLS = int(os.environ.get("REDIS_SCAN_MAX_CALLS", "50"))
+REDIS_KEY_TYPES = ("string", "list", "set", "zset", "hash", "stream")
+
+def list_redis_keys(redis_connection_string, pattern='*', cursor=0, key_type=None,
+                    page_size=REDIS_SCAN_COUNT, limit=REDIS_LIST_LIMIT, max_calls=REDIS_SCAN_MAX_CALLS):
+    """Liệt kê key bằng SCAN từ cursor, dừng khi đủ limit key hoặc hết max_calls lần gọi.
+
+    Trả về (keys, next_cursor); next_cursor = 0 nghĩa là đã duyệt hết keyspace.
+    Một lần SCAN có thể trả nhiều hơn phần còn thiếu, nên số key có thể vượt limit tối đa một trang.
+    """
+    def load():
+        r = get_redis_client(redis_connection_string)
+        keys = []
+        calls = 0
+        next_cursor = cursor
+        with sdk_call("redis", "scan"):
+            while True:
+                next_cursor, batch = r.scan(cursor=next_cursor, match=pattern or '*', count=page_size,
+                                            _type=key_type or None)
+                calls += 1
+                keys.extend(k.decode(errors='replace') if isinstance(k, bytes) else k for k in batch)
+                if next_cursor == 0 or len(keys) >= limit or calls >= max_calls:
+                    break
+        return keys, int(next_cursor)
     try:
-        r = redis.from_url(redis_connection_string)
-        keys = r.keys(pattern)
-        return [k.decode() for k in keys]
+        return list_cache.get_or_load(("redis", redis_connection_string),
+                                      ("keys", pattern, cursor, key_type, page_size, limit, max_calls), load)
     except Exception as e:
-        return [str(e)]
+        clients.reset("redis", redis_connection_string)
+        return [str(e)], 0
 
-def get_config():
-    # Ưu tiên lấy từ biến môi trường, fallback sang file yaml nếu chạy local
-    config = {}
-    config_keys = [
-        ("keyvault_url", "KEYVAULT_URL"),
-        ("sql_connection_string", "SQL_CONNECTION_STRING"),
-        ("cosmos_connection_string", "COSMOS_CONNECTION_STRING"),
-        ("blob_connection_string", "BLOB_CONNECTION_STRING"),
-        ("acr_name", "ACR_NAME"),
-        ("acr_subscription", "ACR_SUBSCRIPTION"),
-        ("acr_rg", "ACR_RG"),
-        ("redis_connection_string", "REDIS_CONNECTION_STRING"),
-    ]
-    for k, envk in config_keys:
-        v = os.environ.get(envk)
-        if v:
-            config[k] = v
-    # Nếu thiếu biến env, thử đọc file yaml (chỉ dùng cho local dev)
-    if len(config) < len(config_keys):
+def invalidate_lists(service, config):
+    """Bỏ kết quả list đã cache của resource mà action ghi vừa tác động."""
+    namespace = {
+        'keyvault': lambda: ("keyvault", config['keyvault_url']),
+        'sql': lambda: ("sql", config['sql_connection_string']),
+        'cosmos': lambda: ("cosmos", config['cosmos_endpoint']),
+        'blob': lambda: ("blob", config['blob_connection_string']),
+        'redis': lambda: ("redis", config['redis_connection_string']),
+    }.get(service)
+    if namespace is not None:
         try:
-            CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.yaml')
-            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-                yaml_config = yaml.safe_load(f)
-            for k, _ in config_keys:
-                if k not in config and k in yaml_config:
-                    config[k] = yaml_config[k]
-        except Exception:
+            list_cache.invalidate(namespace())
+        except KeyError:
             pass
-    return config
+
+def run_full_test(service, config, credential):
+    """Chạy test *_full của một service theo cấu hình, trả về danh sách Step."""
+    try:
+        return _run_full_test(service, config, credential)
+    except KeyError as e:
+        steps = StepRecorder()
+        steps.fail(f"Thiếu cấu hình {e} cho service {service}")
+        return steps
+
+def _run_full_test(service, config, credential):
+    if service == 'keyvault':
+        return test_key_vault_full(config['keyvault_url'], credential)
+    if service == 'sql':
+        return test_azure_sql_full(config['sql_connection_string'])
+    if service == 'cosmos':
+        return test_cosmosdb_full(config['cosmos_endpoint'], config['cosmos_key'])
+    if service == 'blob':
+        return test_blob_full(config['blob_connection_string'])
+    if service == 'acr':
+        return test_acr_full(config['acr_name'], config['acr_subscription'], config['acr_rg'], credential)
+    if service == 'redis':
+        return test_redis_full(config['redis_connection_string'])
+    steps = StepRecorder()
+    steps.fail(f"Service không hợp lệ: {service}")
+    return steps
+
+# --- Cấu hình: parse và kiểm tra một lần lúc khởi động, CONFIG_RELOAD_INTERVAL > 0 thì theo dõi file để reload ---
+settings = ConfigHolder(os.environ.get("CONFIG_FILE", DEFAULT_CONFIG_FILE))
+settings.watch(float(os.environ.get("CONFIG_RELOAD_INTERVAL", "0")))
+REGISTRY.callback("app_config_reloads_total", "counter", "Số lần reload cấu hình thành công", lambda: settings.reloads)
+REGISTRY.callback("app_config_reload_errors_total", "counter", "Số lần reload cấu hình bị lỗi (giữ cấu hình cũ)",
+                  lambda: settings.reload_errors)
+
+def get_config():
+    """AppConfig hiện tại; không đọc env/file hay tách chuỗi trong request."""
+    return settings.config
 
 # --- HTML Template ---
+WATERFALL_MACRO = '''
+{% macro render_waterfall(rows, total) %}
+    <div class="result-list">
+        <div class="small text-muted mb-1">Tổng thời gian: {{ '%.0f'|format(total * 1000) }} ms</div>
+        {% for step, offset, width in rows %}
+            <div class="d-flex align-items-center small mb-1" title="{{ step.message }}">
+                <div class="me-2 text-truncate" style="width: 30%">{{ step.name }}</div>
+                <div class="flex-grow-1 waterfall-track">
+                    <div class="waterfall-bar {{ 'bg-success' if step.ok else 'bg-danger' }}"
+                         style="left: {{ '%.2f'|format(offset) }}%; width: {{ '%.2f'|format(width) }}%"></div>
+                </div>
+                <div class="ms-2 text-end" style="width: 5.5rem">{{ '%.0f'|format(step.duration * 1000) }} ms</div>
+            </div>
+            <div class="small mb-2 {{ 'text-success' if step.ok else 'text-danger' }}">
+                {{ step.message }}{% if step.count is not none %} ({{ step.count }}){% endif %}
+            </div>
+        {% endfor %}
+    </div>
+{% endmacro %}
+'''
+
 TEMPLATE = '''
 <!doctype html>
 <html lang="en">
@@ -303,11 +765,28 @@ TEMPLATE = '''
         .card { margin-bottom: 2rem; }
         .service-title { font-size: 1.3rem; font-weight: 600; }
         .result-list { margin-top: 1rem; }
+        .waterfall-track { height: 1.1rem; background: #e9ecef; position: relative; }
+        .waterfall-bar { position: absolute; top: 0; bottom: 0; min-width: 2px; }
     </style>
+    {% if streaming %}
+    <script>
+        // Thay placeholder của service bằng panel kết quả vừa stream về
+        function showPanel(service) {
+            var panel = document.getElementById('result-' + service);
+            document.getElementById('stream-' + service).replaceChildren(panel.content.cloneNode(true));
+        }
+    </script>
+    {% endif %}
 </head>
 <body>
+''' + WATERFALL_MACRO + '''
 <div class="container py-4">
     <h1 class="mb-4 text-center">🔗 Azure Connectivity Tester (Flask)</h1>
+    {% if not streaming %}
+    <form method="post" action="/stream" class="text-center mb-3">
+        <button type="submit" class="btn btn-sm btn-outline-success">Full test tất cả service (stream)</button>
+    </form>
+    {% endif %}
     <div class="row row-cols-1 row-cols-md-2 g-4">
         <div class="col">
             <div class="card shadow-sm">
@@ -326,6 +805,7 @@ TEMPLATE = '''
                         <div class="col-md-2 d-grid gap-2">
                             <button type="submit" name="action" value="add" class="btn btn-primary">Add</button>
                             <button type="submit" name="action" value="list" class="btn btn-secondary mt-1">List</button>
+                            <button type="submit" name="action" value="test" class="btn btn-outline-success mt-1">Full test</button>
                         </div>
                     </form>
                     {% if results_keyvault is not none %}
@@ -339,6 +819,19 @@ TEMPLATE = '''
                         {% endfor %}
                         </div>
                     {% endif %}
+                    {% if keyvault_marker %}
+                        <form method="post" class="mt-2">
+                            <input type="hidden" name="service" value="keyvault">
+                            <input type="hidden" name="keyvault_marker" value="{{ keyvault_marker }}">
+                            <button type="submit" name="action" value="list" class="btn btn-outline-secondary btn-sm">Trang tiếp</button>
+                        </form>
+                    {% endif %}
+                    {% if streaming and 'keyvault' in stream_services %}
+                        <div id="stream-keyvault" class="result-list small text-muted">Đang chạy full test…</div>
+                    {% endif %}
+                    {% if waterfall_service == 'keyvault' %}
+                        {{ render_waterfall(waterfall_rows, waterfall_total) }}
+                    {% endif %}
                 </div>
             </div>
         </div>
@@ -346,7 +839,7 @@ TEMPLATE = '''
             <div class="card shadow-sm">
                 <div class="card-body">
                     <div class="service-title mb-2">Azure SQL Database</div>
-                    <form method="post" class="row g-2 align-items-end">
+                    <form method="post" enctype="multipart/form-data" class="row g-2 align-items-end">
                         <input type="hidden" name="service" value="sql">
                         <div class="col-md-5">
                             <label class="form-label">Table Name</label>
@@ -359,6 +852,24 @@ TEMPLATE = '''
                         <div class="col-md-2 d-grid gap-2">
                             <button type="submit" name="action" value="add" class="btn btn-primary">Add</button>
                             <button type="submit" name="action" value="list" class="btn btn-secondary mt-1">List</button>
+                            <button type="submit" name="action" value="test" class="btn btn-outline-success mt-1">Full test</button>
+                        </div>
+                        <div class="col-12">
+                            <label class="form-label">Bulk: dán nhiều dòng (CSV) hoặc chọn file CSV</label>
+                            <textarea name="sql_bulk" class="form-control" rows="3"></textarea>
+                        </div>
+                        <div class="col-md-5">
+                            <input type="file" name="sql_file" accept=".csv,.txt" class="form-control">
+                        </div>
+                        <div class="col-md-3">
+                            <input name="sql_batch_size" type="number" min="1" class="form-control" placeholder="Batch {{ sql_batch_size }}">
+                        </div>
+                        <div class="col-md-2 form-check">
+                            <input type="checkbox" name="sql_header" value="1" class="form-check-input" id="sql_header">
+                            <label class="form-check-label" for="sql_header">Header</label>
+                        </div>
+                        <div class="col-md-2 d-grid">
+                            <button type="submit" name="action" value="bulk" class="btn btn-outline-primary">Bulk insert</button>
                         </div>
                     </form>
                     {% if results_sql is not none %}
@@ -372,6 +883,12 @@ TEMPLATE = '''
                         {% endfor %}
                         </div>
                     {% endif %}
+                    {% if streaming and 'sql' in stream_services %}
+                        <div id="stream-sql" class="result-list small text-muted">Đang chạy full test…</div>
+                    {% endif %}
+                    {% if waterfall_service == 'sql' %}
+                        {{ render_waterfall(waterfall_rows, waterfall_total) }}
+                    {% endif %}
                 </div>
             </div>
         </div>
@@ -379,29 +896,41 @@ TEMPLATE = '''
             <div class="card shadow-sm">
                 <div class="card-body">
                     <div class="service-title mb-2">Cosmos DB</div>
-                    <form method="post" class="row g-2 align-items-end">
+                    <form method="post" enctype="multipart/form-data" class="row g-2 align-items-end">
                         <input type="hidden" name="service" value="cosmos">
                         <div class="col-md-4">
                             <label class="form-label">DB Name</label>
-                            <input name="cosmos_db" class="form-control">
+                            <input name="cosmos_db" class="form-control" value="{{ cosmos_db or '' }}">
                         </div>
                         <div class="col-md-4">
                             <label class="form-label">Container Name</label>
-                            <input name="cosmos_container" class="form-control">
+                            <input name="cosmos_container" class="form-control" value="{{ cosmos_container or '' }}">
                         </div>
                         <div class="col-md-4">
                             <label class="form-label">Item (JSON)</label>
                             <input name="cosmos_item" class="form-control">
                         </div>
+                        <div class="col-md-8">
+                            <label class="form-label">Ingest: file JSON array / JSONL (hoặc dán array vào ô Item)</label>
+                            <input type="file" name="cosmos_file" accept=".json,.jsonl,.ndjson" class="form-control">
+                        </div>
+                        <div class="col-md-4 d-grid">
+                            <button type="submit" name="action" value="ingest" class="btn btn-outline-primary">Ingest</button>
+                        </div>
+                        <div class="col-12">
+                            <label class="form-label">Fields khi List (vd. id, name, address.city; để trống = cả document)</label>
+                            <input name="cosmos_fields" class="form-control" value="{{ cosmos_fields or '' }}">
+                        </div>
                         <div class="col-12 d-grid gap-2 mt-2">
                             <button type="submit" name="action" value="add" class="btn btn-primary">Add</button>
                             <button type="submit" name="action" value="list" class="btn btn-secondary mt-1">List</button>
+                            <button type="submit" name="action" value="test" class="btn btn-outline-success mt-1">Full test</button>
                         </div>
                     </form>
                     {% if results_cosmos is not none %}
                         <div class="result-list">
                         {% for msg in results_cosmos %}
-                            {% if 'Item' in msg or 'success' in msg or 'thành công' in msg %}
+                            {% if 'Item' in msg or 'Ingested' in msg or 'success' in msg or 'thành công' in msg %}
                                 <div class="alert alert-success py-2 mb-2">{{ msg }}</div>
                             {% else %}
                                 <div class="alert alert-danger py-2 mb-2">{{ msg }}</div>
@@ -409,6 +938,22 @@ TEMPLATE = '''
                         {% endfor %}
                         </div>
                     {% endif %}
+                    {% if cosmos_continuation %}
+                        <form method="post" class="mt-2">
+                            <input type="hidden" name="service" value="cosmos">
+                            <input type="hidden" name="cosmos_db" value="{{ cosmos_db }}">
+                            <input type="hidden" name="cosmos_container" value="{{ cosmos_container }}">
+                            <input type="hidden" name="cosmos_fields" value="{{ cosmos_fields or '' }}">
+                            <input type="hidden" name="cosmos_continuation" value="{{ cosmos_continuation }}">
+                            <button type="submit" name="action" value="list" class="btn btn-outline-secondary btn-sm">Trang tiếp</button>
+                        </form>
+                    {% endif %}
+                    {% if streaming and 'cosmos' in stream_services %}
+                        <div id="stream-cosmos" class="result-list small text-muted">Đang chạy full test…</div>
+                    {% endif %}
+                    {% if waterfall_service == 'cosmos' %}
+                        {{ render_waterfall(waterfall_rows, waterfall_total) }}
+                    {% endif %}
                 </div>
             </div>
         </div>
@@ -420,7 +965,7 @@ TEMPLATE = '''
                         <input type="hidden" name="service" value="blob">
                         <div class="col-md-4">
                             <label class="form-label">Container Name</label>
-                            <input name="blob_container" class="form-control">
+                            <input name="blob_container" class="form-control" value="{{ blob_container or '' }}">
                         </div>
                         <div class="col-md-4">
                             <label class="form-label">Blob Name</label>
@@ -430,9 +975,18 @@ TEMPLATE = '''
                             <label class="form-label">Data</label>
                             <input name="blob_data" class="form-control">
                         </div>
+                        <div class="col-md-8">
+                            <label class="form-label">Prefix khi List</label>
+                            <input name="blob_prefix" class="form-control" value="{{ blob_prefix or '' }}">
+                        </div>
+                        <div class="col-md-4">
+                            <label class="form-label">Delimiter</label>
+                            <input name="blob_delimiter" class="form-control" value="{{ blob_delimiter or '' }}">
+                        </div>
                         <div class="col-12 d-grid gap-2 mt-2">
                             <button type="submit" name="action" value="add" class="btn btn-primary">Upload</button>
                             <button type="submit" name="action" value="list" class="btn btn-secondary mt-1">List</button>
+                            <button type="submit" name="action" value="test" class="btn btn-outline-success mt-1">Full test</button>
                         </div>
                     </form>
                     {% if results_blob is not none %}
@@ -446,6 +1000,22 @@ TEMPLATE = '''
                         {% endfor %}
                         </div>
                     {% endif %}
+                    {% if blob_marker %}
+                        <form method="post" class="mt-2">
+                            <input type="hidden" name="service" value="blob">
+                            <input type="hidden" name="blob_container" value="{{ blob_container or '' }}">
+                            <input type="hidden" name="blob_prefix" value="{{ blob_prefix or '' }}">
+                            <input type="hidden" name="blob_delimiter" value="{{ blob_delimiter or '' }}">
+                            <input type="hidden" name="blob_marker" value="{{ blob_marker }}">
+                            <button type="submit" name="action" value="list" class="btn btn-outline-secondary btn-sm">Trang tiếp</button>
+                        </form>
+                    {% endif %}
+                    {% if streaming and 'blob' in stream_services %}
+                        <div id="stream-blob" class="result-list small text-muted">Đang chạy full test…</div>
+                    {% endif %}
+                    {% if waterfall_service == 'blob' %}
+                        {{ render_waterfall(waterfall_rows, waterfall_total) }}
+                    {% endif %}
                 </div>
             </div>
         </div>
@@ -457,6 +1027,7 @@ TEMPLATE = '''
                         <input type="hidden" name="service" value="acr">
                         <div class="col-12 d-grid gap-2">
                             <button type="submit" name="action" value="list" class="btn btn-secondary">List Images</button>
+                            <button type="submit" name="action" value="test" class="btn btn-outline-success mt-1">Full test</button>
                         </div>
                     </form>
                     {% if results_acr is not none %}
@@ -466,6 +1037,12 @@ TEMPLATE = '''
                         {% endfor %}
                         </div>
                     {% endif %}
+                    {% if streaming and 'acr' in stream_services %}
+                        <div id="stream-acr" class="result-list small text-muted">Đang chạy full test…</div>
+                    {% endif %}
+                    {% if waterfall_service == 'acr' %}
+                        {{ render_waterfall(waterfall_rows, waterfall_total) }}
+                    {% endif %}
                 </div>
             </div>
         </div>
@@ -486,8 +1063,48 @@ TEMPLATE = '''
                         <div class="col-md-2 d-grid gap-2">
                             <button type="submit" name="action" value="add" class="btn btn-primary">Set</button>
                             <button type="submit" name="action" value="list" class="btn btn-secondary mt-1">List</button>
+                            <button type="submit" name="action" value="test" class="btn btn-outline-success mt-1">Full test</button>
+                        </div>
+                        <div class="col-12">
+                            <label class="form-label">Bulk: mỗi dòng key=value</label>
+                            <textarea name="redis_bulk" class="form-control" rows="3"></textarea>
+                        </div>
+                        <div class="col-md-4">
+                            <input name="redis_ttl" type="number" min="1" class="form-control" placeholder="TTL (giây, tùy chọn)">
+                        </div>
+                        <div class="col-md-4">
+                            <input name="redis_batch_size" type="number" min="1" class="form-control" placeholder="Batch {{ redis_batch_size }}">
+                        </div>
+                        <div class="col-md-4 d-grid">
+                            <button type="submit" name="action" value="bulk" class="btn btn-outline-primary">Bulk set</button>
+                        </div>
+                    </form>
+                    <form method="post" class="row g-2 align-items-end mt-1">
+                        <input type="hidden" name="service" value="redis">
+                        <input type="hidden" name="action" value="list">
+                        <div class="col-md-5">
+                            <label class="form-label">Pattern</label>
+                            <input name="redis_pattern" class="form-control" value="{{ redis_pattern }}">
+                        </div>
+                        <div class="col-md-4">
+                            <label class="form-label">Type</label>
+                            <select name="redis_type" class="form-select">
+                                <option value="">(tất cả)</option>
+                                {% for t in redis_key_types %}
+                                    <option value="{{ t }}" {% if t == redis_type %}selected{% endif %}>{{ t }}</option>
+                                {% endfor %}
+                            </select>
+                        </div>
+                        <div class="col-md-3 d-grid gap-2">
+                            <button type="submit" name="redis_cursor" value="0" class="btn btn-secondary">Scan</button>
+                            {% if redis_cursor %}
+                                <button type="submit" name="redis_cursor" value="{{ redis_cursor }}" class="btn btn-outline-secondary mt-1">Trang tiếp</button>
+                            {% endif %}
                         </div>
                     </form>
+                    {% if results_redis is not none and redis_cursor %}
+                        <div class="text-muted small mt-2">Còn key chưa duyệt, cursor tiếp theo: {{ redis_cursor }}</div>
+                    {% endif %}
                     {% if results_redis is not none %}
                         <div class="result-list">
                         {% for msg in results_redis %}
@@ -499,6 +1116,12 @@ TEMPLATE = '''
                         {% endfor %}
                         </div>
                     {% endif %}
+                    {% if streaming and 'redis' in stream_services %}
+                        <div id="stream-redis" class="result-list small text-muted">Đang chạy full test…</div>
+                    {% endif %}
+                    {% if waterfall_service == 'redis' %}
+                        {{ render_waterfall(waterfall_rows, waterfall_total) }}
+                    {% endif %}
                 </div>
             </div>
         </div>
@@ -506,56 +1129,100 @@ TEMPLATE = '''
     <footer class="text-center mt-4 mb-2 text-muted">&copy; {{ 2024 }} Azure Connectivity Tester</footer>
 </div>
 <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+{% if not streaming %}
 </body>
 </html>
+{% endif %}
+'''
+
+# Panel kết quả của một service, gửi dần sau khung trang ở chế độ stream
+PANEL_TEMPLATE = WATERFALL_MACRO + '''
+<template id="result-{{ service }}">{{ render_waterfall(rows, total) }}</template>
+<script>showPanel({{ service|tojson }});</script>
 '''
 
+PAGE_DEFAULTS = dict(
+    results_keyvault=None, keyvault_marker=None,
+    results_sql=None, sql_batch_size=SQL_BULK_BATCH_SIZE,
+    results_cosmos=None, cosmos_db=None, cosmos_container=None, cosmos_fields=None, cosmos_continuation=None,
+    results_blob=None, blob_container=None, blob_prefix=None, blob_delimiter='/', blob_marker=None,
+    results_acr=None,
+    results_redis=None, redis_cursor=0, redis_pattern='*', redis_type=None,
+    redis_key_types=REDIS_KEY_TYPES, redis_batch_size=REDIS_BULK_BATCH_SIZE,
+    waterfall_service=None, waterfall_rows=[], waterfall_total=0,
+    streaming=False, stream_services=(),
+)
+
+def render_page(**context):
+    return render_template_string(TEMPLATE, **dict(PAGE_DEFAULTS, **context))
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     results_keyvault = results_sql = results_cosmos = results_blob = results_acr = results_redis = None
-    credential = DefaultAzureCredential()
+    steps = waterfall_service = None
+    redis_cursor, redis_pattern, redis_type = 0, '*', None
+    db_name = container_name = cosmos_fields = cosmos_continuation = None
+    blob_container = blob_prefix = blob_marker = None
+    keyvault_marker = None
+    blob_delimiter = '/'
+    credential = get_credential()
     CONFIG = get_config()
     if request.method == 'POST':
         service = request.form.get('service')
         action = request.form.get('action')
-        if service == 'keyvault':
+        if action == 'test':
+            steps = run_full_test(service, CONFIG, credential)
+            waterfall_service = service
+        elif service == 'keyvault':
             vault_url = CONFIG['keyvault_url']
             if action == 'add':
                 secret_name = request.form.get('keyvault_secret_name')
                 secret_value = request.form.get('keyvault_secret_value')
                 try:
-                    client = SecretClient(vault_url=f"https://{vault_url}/", credential=credential)
-                    client.set_secret(secret_name, secret_value)
+                    client = get_secret_client(vault_url, credential)
+                    with sdk_call("keyvault", "set_secret"):
+                        client.set_secret(secret_name, secret_value)
                     results_keyvault = [f"Secret '{secret_name}' added."]
                 except Exception as e:
+                    clients.reset("keyvault", vault_url)
                     results_keyvault = [str(e)]
             elif action == 'list':
-                results_keyvault = list_key_vault_secrets(vault_url, credential)
+                results_keyvault, keyvault_marker = list_key_vault_secrets(
+                    vault_url, credential, request.form.get('keyvault_marker'))
         elif service == 'sql':
             sql_conn_str = CONFIG['sql_connection_string']
             if action == 'add':
                 table = request.form.get('sql_table')
                 value = request.form.get('sql_value')
                 try:
-                    conn = pyodbc.connect(sql_conn_str, timeout=5)
-                    cursor = conn.cursor()
-                    # Kiểm tra bảng tồn tại, nếu chưa thì tạo bảng
-                    cursor.execute(f"SELECT COUNT(*) FROM sysobjects WHERE name='{table}' AND xtype='U'")
-                    exists = cursor.fetchone()[0]
-                    if not exists:
-                        cursor.execute(f"CREATE TABLE {table} (id INT IDENTITY(1,1) PRIMARY KEY, val NVARCHAR(100))")
-                    cursor.execute(f"INSERT INTO {table} (val) VALUES (?)", (value,))
-                    conn.commit()
-                    conn.close()
+                    with sdk_call("sql", "insert"), sql_connection(sql_conn_str) as conn:
+                        # Kiểm tra bảng tồn tại, nếu chưa thì tạo bảng
+                        ensure_sql_table(conn, sql_conn_str, table)
+                        cursor = conn.cursor()
+                        cursor.execute(f"INSERT INTO {table} (val) VALUES (?)", (value,))
+                        conn.commit()
                     results_sql = [f"Inserted '{value}' into table '{table}'."]
                 except Exception as e:
+                    _known_sql_tables.discard((sql_conn_str, table))
+                    results_sql = [str(e)]
+            elif action == 'bulk':
+                table = request.form.get('sql_table')
+                try:
+                    batch_size = max(1, int(request.form.get('sql_batch_size') or SQL_BULK_BATCH_SIZE))
+                    rows = read_sql_rows(request.form.get('sql_bulk'), request.files.get('sql_file'))
+                    count, seconds = bulk_insert_sql(sql_conn_str, table, rows,
+                                                     header=bool(request.form.get('sql_header')), batch_size=batch_size)
+                    rate = count / seconds if seconds else 0
+                    results_sql = [f"Inserted {count} rows into table '{table}' in {seconds:.2f}s "
+                                   f"({rate:,.0f} rows/s, batch {batch_size})."]
+                except Exception as e:
+                    _known_sql_tables.discard((sql_conn_str, table))
                     results_sql = [str(e)]
             elif action == 'list':
                 results_sql = list_sql_tables(sql_conn_str) # Pass sql_conn_str directly
         elif service == 'cosmos':
-            cosmos_conn_str = CONFIG['cosmos_connection_string']
-            endpoint = cosmos_conn_str.split(';')[0].split('=')[1]
-            key = cosmos_conn_str.split(';')[1].split('=')[1]
+            endpoint = CONFIG['cosmos_endpoint']
+            key = CONFIG['cosmos_key']
             db_name = request.form.get('cosmos_db')
             container_name = request.form.get('cosmos_container')
             if action == 'add':
@@ -563,42 +1230,75 @@ def index():
                 import json
                 try:
                     item = json.loads(item_json)
-                    client = CosmosClient(f"https://{endpoint}/", key)
+                    client = get_cosmos_client(endpoint, key)
                     try:
                         db = client.create_database_if_not_exists(db_name)
                         container = db.create_container_if_not_exists(
                             id=container_name,
-                            partition_key=PartitionKey(path="/id"),
+                            partition_key=azure_cosmos.PartitionKey(path="/id"),
                             offer_throughput=400
                         )
                     except Exception as e:
                         # Xử lý lỗi
                         print(e)
-                    container.create_item(item)
+                    with sdk_call("cosmos", "create_item"):
+                        container.create_item(item)
                     results_cosmos = [f"Item added to {container_name}."]
                 except Exception as e:
+                    clients.reset("cosmos", (endpoint, key))
+                    results_cosmos = [str(e)]
+            elif action == 'ingest':
+                try:
+                    client = get_cosmos_client(endpoint, key)
+                    db = client.create_database_if_not_exists(db_name)
+                    container = db.create_container_if_not_exists(
+                        id=container_name,
+                        partition_key=azure_cosmos.PartitionKey(path="/id"),
+                        offer_throughput=400
+                    )
+                    pk_path = container.read()['partitionKey']['paths'][0]
+                    items = iter_json_items(open_text(request.files.get('cosmos_file'), request.form.get('cosmos_item')))
+                    with sdk_call("cosmos", "ingest"):
+                        stats = ingest_items(container, items, pk_path,
+                                             workers=int(os.environ.get("COSMOS_INGEST_WORKERS", "8")))
+                    results_cosmos = [stats.summary()] + [f"Lỗi: {msg}" for msg in stats.errors]
+                except Exception as e:
+                    clients.reset("cosmos", (endpoint, key))
                     results_cosmos = [str(e)]
             elif action == 'list':
-                results_cosmos = list_cosmos_items(endpoint, key, db_name, container_name)
+                cosmos_fields = request.form.get('cosmos_fields', '')
+                results_cosmos, cosmos_continuation = list_cosmos_items(
+                    endpoint, key, db_name, container_name, cosmos_fields,
+                    request.form.get('cosmos_continuation'))
         elif service == 'blob':
             blob_conn_str = CONFIG['blob_connection_string']
-            blob_url = blob_conn_str.split(';')[0].split('=')[1]
+            blob_url = CONFIG['blob_host']
             if action == 'add':
                 container_name = request.form.get('blob_container')
                 blob_name = request.form.get('blob_name')
                 data = request.form.get('blob_data', '').encode()
                 try:
-                    client = BlobServiceClient(account_url=f"https://{blob_url}/", credential=credential)
+                    client = get_blob_service_client_aad(blob_url, credential)
                     container_client = client.get_container_client(container_name)
-                    if not container_client.exists():
-                        client.create_container(container_name)
-                    container_client.upload_blob(blob_name, data)
+                    with sdk_call("blob", "upload_blob"):
+                        if not container_client.exists():
+                            client.create_container(container_name)
+                        container_client.upload_blob(blob_name, data)
                     results_blob = [f"Blob '{blob_name}' uploaded to '{container_name}'."]
                 except Exception as e:
+                    clients.reset("blob_aad", blob_url)
                     results_blob = [str(e)]
             elif action == 'list':
-                container_name = request.form.get('blob_container')
-                results_blob = list_blobs_in_container(blob_conn_str, container_name)
+                blob_container = request.form.get('blob_container')
+                blob_prefix = request.form.get('blob_prefix')
+                blob_delimiter = request.form.get('blob_delimiter')
+                marker = request.form.get('blob_marker')
+                if blob_container:
+                    results_blob, blob_marker = list_blobs_in_container(
+                        blob_conn_str, blob_container, blob_prefix, blob_delimiter, marker)
+                else:
+                    # Không nhập container thì liệt kê container, prefix lọc theo tên container
+                    results_blob, blob_marker = list_blob_containers(blob_conn_str, blob_prefix, marker)
         elif service == 'acr':
             acr_name = CONFIG['acr_name']
             acr_subscription = CONFIG['acr_subscription']
@@ -611,22 +1311,391 @@ def index():
                 key = request.form.get('redis_key')
                 value = request.form.get('redis_value')
                 try:
-                    r = redis.from_url(redis_conn_str)
-                    r.set(key, value)
+                    r = get_redis_client(redis_conn_str)
+                    with sdk_call("redis", "set"):
+                        r.set(key, value)
                     results_redis = [f"Key '{key}' set."]
                 except Exception as e:
+                    clients.reset("redis", redis_conn_str)
+                    results_redis = [str(e)]
+            elif action == 'bulk':
+                try:
+                    ttl = request.form.get('redis_ttl')
+                    ttl = int(ttl) if ttl else None
+                    batch_size = max(1, int(request.form.get('redis_batch_size') or REDIS_BULK_BATCH_SIZE))
+                    count, round_trips, seconds = bulk_set_redis(
+                        redis_conn_str, parse_redis_pairs(request.form.get('redis_bulk')), ttl, batch_size)
+                    rate = count / seconds if seconds else 0
+                    results_redis = [f"Bulk set {count} keys in {seconds:.3f}s ({rate:,.0f} keys/s, "
+                                     f"{round_trips} round-trip, {'TTL ' + str(ttl) + 's' if ttl else 'no TTL'})."]
+                except ValueError as e:
+                    # TTL/batch size sai: lỗi của input, client vẫn dùng được
+                    results_redis = [str(e)]
+                except Exception as e:
+                    clients.reset("redis", redis_conn_str)
+                    clients.reset("redis_cluster", redis_conn_str)
+                    _redis_cluster_mode.pop(redis_conn_str, None)
                     results_redis = [str(e)]
             elif action == 'list':
-                results_redis = list_redis_keys(redis_conn_str)
-    return render_template_string(
-        TEMPLATE,
+                redis_pattern = request.form.get('redis_pattern') or '*'
+                redis_type = request.form.get('redis_type') or None
+                if redis_type not in REDIS_KEY_TYPES:
+                    redis_type = None
+                try:
+                    cursor = int(request.form.get('redis_cursor') or 0)
+                except ValueError:
+                    cursor = 0
+                results_redis, redis_cursor = list_redis_keys(redis_conn_str, redis_pattern, cursor, redis_type)
+        if action in ('add', 'bulk', 'ingest'):
+            # Ghi xong (kể cả ghi dở vì lỗi) thì các list đã cache của resource đó không còn đúng
+            invalidate_lists(service, CONFIG)
+    return render_page(
         results_keyvault=results_keyvault,
+        keyvault_marker=keyvault_marker,
         results_sql=results_sql,
         results_cosmos=results_cosmos,
+        cosmos_db=db_name if results_cosmos is not None else None,
+        cosmos_container=container_name if results_cosmos is not None else None,
+        cosmos_fields=cosmos_fields,
+        cosmos_continuation=cosmos_continuation,
         results_blob=results_blob,
+        blob_container=blob_container,
+        blob_prefix=blob_prefix,
+        blob_delimiter=blob_delimiter,
+        blob_marker=blob_marker,
         results_acr=results_acr,
-        results_redis=results_redis
+        results_redis=results_redis,
+        redis_cursor=redis_cursor,
+        redis_pattern=redis_pattern,
+        redis_type=redis_type,
+        waterfall_service=waterfall_service,
+        waterfall_rows=waterfall(steps) if steps else [],
+        waterfall_total=steps.total if steps else 0,
     )
 
+# --- Trang stream: gửi khung trang ngay, panel của từng service khi test xong ---
+probe_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("PROBE_WORKERS", "12")),
+                                    thread_name_prefix="probe")
+
+def selected_services(value):
+    """Danh sách service từ tham số dạng "sql,redis" hoặc list tên; rỗng nghĩa là tất cả.
+
+    Tên không có trong KNOWN_SERVICES thì ném ValueError (gõ sai không được âm thầm bỏ qua).
+    """
+    if isinstance(value, list):
+        if not all(isinstance(name, str) for name in value):
+            raise ValueError("services phải là list tên service")
+        value = ','.join(value)
+    elif value is not None and not isinstance(value, str):
+        raise ValueError("services phải là chuỗi \"sql,redis\" hoặc list tên service")
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = sorted(set(names) - set(KNOWN_SERVICES))
+    if unknown:
+        raise ValueError(f"Service không hợp lệ: {', '.join(unknown)} (có: {', '.join(KNOWN_SERVICES)})")
+    return [name for name in KNOWN_SERVICES if not names or name in names]
+
+@app.route('/stream', methods=['POST'])
+def stream():
+    """Chạy full test của các service song song, panel nào xong trước hiện trước (POST, services=sql,redis).
+
+    Chỉ nhận POST: full test tạo/xóa database, bảng, container, secret thật nên không được chạy khi
+    crawler, prefetch của trình duyệt hay reload trang gửi GET.
+    """
+    try:
+        services = selected_services(request.values.get('services'))
+    except ValueError as e:
+        return Response(str(e), status=400, content_type='text/plain; charset=utf-8')
+    credential = get_credential()
+    CONFIG = get_config()
+
+    def generate():
+        futures = {probe_executor.submit(run_full_test, service, CONFIG, credential): service for service in services}
+        yield render_page(streaming=True, stream_services=services)
+        for future in as_completed(futures):
+            try:
+                steps = future.result()
+            except Exception as e:
+                steps = StepRecorder()
+                steps.fail(str(e))
+            yield render_template_string(PANEL_TEMPLATE, service=futures[future],
+                                         rows=waterfall(steps), total=steps.total)
+        yield "</body>\n</html>\n"
+
+    # X-Accel-Buffering: tắt buffer của nginx/ingress để trình duyệt nhận từng phần ngay
+    return Response(stream_with_context(generate()), content_type='text/html; charset=utf-8',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+PROBE_TIMEOUT = float(os.environ.get("PROBE_TIMEOUT", "60"))
+# Suite của /api/probe đang chạy trong probe_executor (kể cả suite đã báo timeout nhưng chưa xong)
+_probe_running = set()
+_probe_running_lock = threading.Lock()
+
+def _probe_done(service):
+    with _probe_running_lock:
+        _probe_running.discard(service)
+
+def suite_result(steps):
+    ok = bool(steps) and all(step.ok for step in steps)
+    return {"ok": ok, "duration_ms": round(steps.total * 1000, 1), "steps": [step.to_dict() for step in steps]}
+
+@app.route('/api/probe', methods=['POST'])
+def api_probe():
+    """Chạy song song full test của các service, trả JSON; có suite lỗi thì 503.
+
+    POST body {"services": ["sql", "redis"], "timeout": 30} (hoặc form services=sql,redis).
+    Chỉ nhận POST như /stream: full test tạo/xóa resource thật. Dùng làm smoke gate sau deploy,
+    tổng thời gian ~ suite chậm nhất.
+    """
+    body = request.get_json(silent=True)
+    if body is None:
+        body = {}
+    if not isinstance(body, dict):
+        return jsonify(ok=False, error="Body JSON phải là object, vd. {\"services\": [\"sql\"]}"), 400
+    try:
+        services = selected_services(body.get('services') or request.values.get('services'))
+    except ValueError as e:
+        return jsonify(ok=False, error=str(e)), 400
+    try:
+        timeout = float(body.get('timeout') or request.values.get('timeout') or PROBE_TIMEOUT)
+    except (TypeError, ValueError):
+        timeout = PROBE_TIMEOUT
+    # Không cho chờ lâu hơn PROBE_TIMEOUT: suite treo vẫn giữ thread của probe_executor (dùng chung với /stream)
+    timeout = min(timeout, PROBE_TIMEOUT) if timeout > 0 else PROBE_TIMEOUT
+    credential = get_credential()
+    CONFIG = get_config()
+    with _probe_running_lock:
+        busy = sorted(set(services) & _probe_running)
+        if not busy:
+            _probe_running.update(services)
+    if busy:
+        # Lần gọi trước với backend treo chưa xong: chạy thêm chỉ làm đầy pool
+        return jsonify(ok=False, error=f"Suite đang chạy từ lần gọi trước: {', '.join(busy)}"), 409
+    start = time.perf_counter()
+    futures = {}
+    for service in services:
+        futures[service] = probe_executor.submit(run_full_test, service, CONFIG, credential)
+        futures[service].add_done_callback(lambda _, service=service: _probe_done(service))
+    wait(futures.values(), timeout=timeout)
+    suites = {}
+    for service, future in futures.items():
+        if not future.done():
+            # Suite chưa xong vẫn chạy tiếp trong pool, chỉ báo timeout cho lần gọi này
+            suites[service] = {"ok": False, "duration_ms": None, "error": f"timeout sau {timeout:g}s", "steps": []}
+            continue
+        try:
+            suites[service] = suite_result(future.result())
+        except Exception as e:
+            suites[service] = {"ok": False, "duration_ms": None, "error": str(e), "steps": []}
+    # Không có suite nào chạy thì không bao giờ coi là ok
+    ok = bool(suites) and all(suite["ok"] for suite in suites.values())
+    result = {"ok": ok, "wall_ms": round((time.perf_counter() - start) * 1000, 1), "suites": suites}
+    return jsonify(result), 200 if ok else 503
+
+# --- Khởi động worker (serve.py): tạo sẵn client để request đầu tiên không phải chờ kết nối ---
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", "30"))
+
+def _warm_sql(connection_string):
+    with sql_connection(connection_string):
+        pass
+
+def _warm_cosmos(endpoint, key):
+    # Tạo CosmosClient chưa đủ: đọc một trang database để mở sẵn connection tới account
+    with sdk_call("cosmos", "warmup"):
+        next(iter(get_cosmos_client(endpoint, key).list_databases(max_item_count=1)), None)
+
+def warm_clients(config=None, timeout=WARMUP_TIMEOUT):
+    """Tạo song song token, client SDK và connection của các service đã cấu hình.
+
+    Trả về {tên: None nếu thành công, hoặc thông báo lỗi}; lỗi không làm hỏng worker,
+    request sau đó sẽ tự tạo lại client như bình thường.
+    """
+    config = config or get_config()
+    # Chỉ tạo credential (import azure.identity) khi có service dùng AAD
+    credential = get_credential() if config.keyvault_url or config.blob_host or config.acr_subscription else None
+    tasks = {}
+    if config.keyvault_url:
+        tasks["keyvault_token"] = lambda: credential.get_token("https://vault.azure.net/.default")
+        tasks["keyvault"] = lambda: get_secret_client(config.keyvault_url, credential)
+    if config.blob_host:
+        tasks["blob_token"] = lambda: credential.get_token("https://storage.azure.com/.default")
+        tasks["blob"] = lambda: get_blob_service_client_aad(config.blob_host, credential)
+    if config.acr_subscription:
+        tasks["acr_token"] = lambda: credential.get_token("https://management.azure.com/.default")
+        tasks["acr"] = lambda: get_acr_client(config.acr_subscription, credential)
+    if config.cosmos_endpoint:
+        tasks["cosmos"] = lambda: _warm_cosmos(config.cosmos_endpoint, config.cosmos_key)
+    if config.sql_connection_string:
+        tasks["sql"] = lambda: _warm_sql(config.sql_connection_string)
+    if config.redis_connection_string and not config.redis_connection_string.startswith('ssh://'):
+        tasks["redis"] = lambda: get_redis_client(config.redis_connection_string).ping()
+    futures = {name: probe_executor.submit(task) for name, task in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            results[name] = f"timeout sau {timeout:g}s"
+        elif future.exception() is not None:
+            results[name] = str(future.exception())
+        else:
+            results[name] = None
+    return results
+
+def preload_sdks(config=None):
+    """Import SDK của các service đã cấu hình (gọi ở gunicorn master để các worker dùng chung sau fork).
+
+    Service không cấu hình thì SDK của nó không bao giờ được import.
+    """
+    config = config or get_config()
+    modules = {
+        keyvault_secrets: config.keyvault_url,
+        storage_blob: config.blob_host,
+        azure_cosmos: config.cosmos_endpoint,
+        acr_mgmt: config.acr_subscription,
+        pyodbc: config.sql_connection_string,
+        redis: config.redis_connection_string,
+    }
+    for module, configured in modules.items():
+        if configured:
+            module.load()
+
+class Warmup:
+    """Warmup của process: chạy warm_clients() một lần trên thread nền, ghi lại kết quả cho /readyz."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = None
+        self.seconds = None
+        self.results = None
+        self.done = threading.Event()
+
+    def start(self):
+        """Bắt đầu warmup nếu chưa chạy (gọi nhiều lần không sao)."""
+        with self._lock:
+            if self.started is not None:
+                return
+            self.started = time.perf_counter()
+        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+
+    def _run(self):
+        try:
+            self.results = warm_clients()
+        except Exception as e:
+            self.results = {"warmup": str(e)}
+        finally:
+            self.seconds = time.perf_counter() - self.started
+            self.done.set()
+
+    def after_fork(self):
+        # Thread warmup không đi theo fork; worker chạy lại từ đầu
+        self.__init__()
+
+warmup = Warmup()
+REGISTRY.callback("app_ready", "gauge", "1 khi warmup đã xong (hoặc hết WARMUP_TIMEOUT)",
+                  lambda: int(warmup.done.is_set()))
+REGISTRY.callback("app_warmup_seconds", "gauge", "Thời gian warmup", lambda: warmup.seconds or 0)
+
+def init_worker():
+    """Chạy trong mỗi worker ngay sau fork: bật lại watcher cấu hình, bắt đầu warmup ở thread nền."""
+    settings.after_fork()
+    warmup.after_fork()
+    warmup.start()
+    if metrics_exporter is not None:
+        metrics_exporter.start()
+
+def worker_readiness():
+    """{pid: đã warmup xong} của các worker còn sống, đọc từ snapshot metric; None nếu chạy một process."""
+    if metrics_exporter is None:
+        return None
+    metrics_exporter.flush()
+    return {str(data["pid"]): any(name == "app_ready" and value for name, _, _, value in data["callbacks"])
+            for data in metrics_exporter.snapshots(live_only=True)}
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: process còn phục vụ request, không gọi tới Azure."""
+    return jsonify(ok=True)
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: 503 cho tới khi warmup (của mọi worker) xong hoặc hết WARMUP_TIMEOUT.
+
+    Service warmup lỗi chỉ được liệt kê trong errors, không giữ pod ở trạng thái not ready.
+    """
+    warmup.start()
+    if not warmup.done.is_set():
+        return jsonify(ready=False, warmup_ms=round((time.perf_counter() - warmup.started) * 1000, 1)), 503
+    errors = {name: error for name, error in (warmup.results or {}).items() if error}
+    result = {"ready": True, "warmup_ms": round(warmup.seconds * 1000, 1), "errors": errors,
+              "warmed": sorted(name for name, error in (warmup.results or {}).items() if not error)}
+    if settings.last_error:
+        # Reload cấu hình lỗi: vẫn chạy bằng cấu hình cũ nên không làm pod not ready, chỉ báo ra
+        result["config_error"] = settings.last_error
+    workers = worker_readiness()
+    if workers is not None:
+        # Nhiều worker: request tới pod rơi vào worker bất kỳ nên chỉ ready khi đủ số worker và tất cả đã warmup
+        expected = int(os.environ.get("WEB_WORKERS", "1"))
+        result["workers"] = workers
+        result["ready"] = len(workers) >= expected and all(workers.values())
+    return jsonify(result), 200 if result["ready"] else 503
+
+# --- Upload/download blob theo stream (file lớn, không qua form) ---
+BLOB_BLOCK_SIZE = int(os.environ.get("BLOB_BLOCK_SIZE", str(DEFAULT_BLOCK_SIZE)))
+BLOB_CHUNK_SIZE = int(os.environ.get("BLOB_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
+BLOB_MAX_CONCURRENCY = int(os.environ.get("BLOB_MAX_CONCURRENCY", "8"))
+
+def _blob_client(container_name, blob_name):
+    client = get_blob_service_client_aad(get_config()['blob_host'], get_credential())
+    return client, client.get_blob_client(container_name, blob_name)
+
+def _int_arg(name, default, upper):
+    try:
+        return max(1, min(upper, int(request.args.get(name, default))))
+    except ValueError:
+        return default
+
+@app.route('/blob/<container_name>/<path:blob_name>', methods=['PUT', 'POST'])
+def upload_blob_stream(container_name, blob_name):
+    """Ghi body request vào block blob: ?block_size=<byte>&concurrency=<số block upload song song>."""
+    block_size = _int_arg('block_size', BLOB_BLOCK_SIZE, 100 * 1024 * 1024)
+    concurrency = _int_arg('concurrency', 4, BLOB_MAX_CONCURRENCY)
+    try:
+        client, blob_client = _blob_client(container_name, blob_name)
+        container_client = client.get_container_client(container_name)
+        with sdk_call("blob", "upload_stream"):
+            if not container_client.exists():
+                client.create_container(container_name)
+            size, blocks, seconds = upload_stream(
+                blob_client, request.stream, block_size, concurrency,
+                storage_blob.ContentSettings(content_type=request.mimetype or 'application/octet-stream'))
+    except Exception as e:
+        return jsonify(error=str(e)), 502
+    finally:
+        invalidate_lists("blob", get_config())
+    return jsonify(blob=f"{container_name}/{blob_name}", bytes=size, blocks=blocks, block_size=block_size,
+                   concurrency=concurrency, seconds=round(seconds, 3),
+                   mb_per_s=round(size / seconds / 1024 / 1024, 2) if seconds else None)
+
+@app.route('/blob/<container_name>/<path:blob_name>', methods=['GET'])
+def download_blob_stream(container_name, blob_name):
+    """Trả blob về theo từng chunk: ?chunk_size=<byte>&concurrency=<số range đọc song song>."""
+    chunk_size = _int_arg('chunk_size', BLOB_CHUNK_SIZE, 100 * 1024 * 1024)
+    concurrency = _int_arg('concurrency', 1, BLOB_MAX_CONCURRENCY)
+    try:
+        client, blob_client = _blob_client(container_name, blob_name)
+        with sdk_call("blob", "get_properties"):
+            properties = blob_client.get_blob_properties()
+    except Exception as e:
+        return jsonify(error=str(e)), 404 if getattr(e, 'status_code', None) == 404 else 502
+    headers = {"Content-Length": str(properties.size), "ETag": properties.etag}
+    content_type = properties.content_settings.content_type or 'application/octet-stream'
+    chunks = iter_download(blob_client, chunk_size, concurrency, properties)
+    return Response(stream_with_context(chunks), content_type=content_type, headers=headers)
+
+# Thời gian từ lúc process khởi động tới khi import xong app (chưa import SDK nào) và RSS lúc đó
+REGISTRY.gauge("app_startup_seconds", "Thời gian khởi động tới khi app sẵn sàng nhận request").labels().set(
+    process_age() or 0)
+REGISTRY.gauge("app_startup_rss_bytes", "RSS của process khi khởi động xong").labels().set(rss_bytes())
+
 if __name__ == '__main__':
+    warmup.start()
     app.run(debug=True) 
\ No newline at end of file
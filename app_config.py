@@ -0,0 +1,220 @@
+"""
+Cấu hình của Flask app: đọc env (fallback config.yaml khi chạy local) một lần lúc khởi động,
+tách sẵn connection string thành endpoint/key/account, và reload nguyên khối khi file cấu hình đổi.
+"""
+import os
+import sys
+import threading
+from dataclasses import dataclass, fields
+from urllib.parse import urlsplit
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+
+# (tên trong config, biến môi trường)
+CONFIG_KEYS = (
+    ("keyvault_url", "KEYVAULT_URL"),
+    ("sql_connection_string", "SQL_CONNECTION_STRING"),
+    ("cosmos_connection_string", "COSMOS_CONNECTION_STRING"),
+    ("blob_connection_string", "BLOB_CONNECTION_STRING"),
+    ("acr_name", "ACR_NAME"),
+    ("acr_subscription", "ACR_SUBSCRIPTION"),
+    ("acr_rg", "ACR_RG"),
+    ("redis_connection_string", "REDIS_CONNECTION_STRING"),
+)
+_CONFIG_NAMES = {key for key, _ in CONFIG_KEYS}
+
+
+class ConfigError(ValueError):
+    """Cấu hình sai định dạng (connection string thiếu phần bắt buộc, file yaml hỏng...)."""
+
+
+def parse_connection_string(value):
+    """"A=1;B=2" -> {"A": "1", "B": "2"}; chỉ tách ở dấu '=' đầu tiên vì key base64 có thể chứa '='."""
+    return dict(part.split("=", 1) for part in value.split(";") if "=" in part)
+
+
+def _host(url):
+    """Host[:port] của URL, chấp nhận cả giá trị không có scheme."""
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    return parts.netloc or parts.path.strip("/")
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """Cấu hình đã kiểm tra; service không cấu hình thì trường tương ứng là None.
+
+    Đọc theo kiểu dict (config['acr_name']) vẫn dùng được, trường None ném KeyError như dict cũ.
+    """
+    keyvault_url: str = None
+    sql_connection_string: str = None
+    cosmos_connection_string: str = None
+    cosmos_endpoint: str = None
+    cosmos_key: str = None
+    blob_connection_string: str = None
+    blob_account: str = None
+    blob_host: str = None
+    acr_name: str = None
+    acr_subscription: str = None
+    acr_rg: str = None
+    redis_connection_string: str = None
+
+    def __getitem__(self, key):
+        value = getattr(self, key, None)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def configured(self):
+        """Tên các trường có giá trị (không in giá trị vì có secret)."""
+        return [f.name for f in fields(self) if getattr(self, f.name) is not None]
+
+
+def _cosmos_parts(connection_string):
+    parts = parse_connection_string(connection_string)
+    endpoint = _host(parts.get("AccountEndpoint", ""))
+    key = parts.get("AccountKey", "")
+    if not endpoint or not key:
+        raise ConfigError("COSMOS_CONNECTION_STRING cần AccountEndpoint và AccountKey")
+    return endpoint, key
+
+
+def _blob_parts(connection_string):
+    parts = parse_connection_string(connection_string)
+    if parts.get("BlobEndpoint"):
+        host = _host(parts["BlobEndpoint"])
+        return parts.get("AccountName") or host.split(".")[0], host
+    account = parts.get("AccountName")
+    if not account:
+        raise ConfigError("BLOB_CONNECTION_STRING cần BlobEndpoint hoặc AccountName")
+    return account, f"{account}.blob.{parts.get('EndpointSuffix') or 'core.windows.net'}"
+
+
+def _read_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return {}
+    try:
+        import yaml
+    except ImportError as e:
+        raise ConfigError(f"Có file {path} nhưng chưa cài PyYAML") from e
+    try:
+        data = yaml.safe_load(text) or {}
+    except yaml.YAMLError as e:
+        raise ConfigError(f"{path} không phải YAML hợp lệ: {e}") from e
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path} phải là mapping key: value")
+    return data
+
+
+def load_config(environ=None, path=DEFAULT_CONFIG_FILE):
+    """Đọc và kiểm tra cấu hình: ưu tiên biến môi trường, key nào thiếu thì lấy từ file yaml (local dev).
+
+    Connection string sai định dạng thì ném ConfigError ngay, không đợi tới request đầu tiên.
+    """
+    environ = os.environ if environ is None else environ
+    values = {}
+    for key, env_key in CONFIG_KEYS:
+        if environ.get(env_key):
+            values[key] = environ[env_key]
+    if path and len(values) < len(CONFIG_KEYS):
+        for key, value in _read_file(path).items():
+            if key in _CONFIG_NAMES and key not in values and value:
+                values[key] = str(value)
+    if values.get("keyvault_url"):
+        # Client tự thêm https://, nên chỉ giữ host (chấp nhận cả giá trị có scheme)
+        values["keyvault_url"] = _host(values["keyvault_url"])
+        if not values["keyvault_url"]:
+            raise ConfigError("KEYVAULT_URL không hợp lệ")
+    if values.get("cosmos_connection_string"):
+        values["cosmos_endpoint"], values["cosmos_key"] = _cosmos_parts(values["cosmos_connection_string"])
+    if values.get("blob_connection_string"):
+        values["blob_account"], values["blob_host"] = _blob_parts(values["blob_connection_string"])
+    return AppConfig(**values)
+
+
+class ConfigHolder:
+    """Giữ AppConfig hiện tại; reload() thay cả object một lần nên request luôn thấy cấu hình nhất quán.
+
+    Cấu hình mới không hợp lệ thì giữ cấu hình cũ và ghi lại lỗi.
+    """
+
+    def __init__(self, path=DEFAULT_CONFIG_FILE, environ=None):
+        self.path = path
+        self._environ = environ
+        self._lock = threading.Lock()
+        self._mtime = self._file_mtime()
+        self.config = load_config(environ, path)
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._watcher = None
+        self._interval = 0
+
+    def get(self):
+        return self.config
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns if self.path else None
+        except OSError:
+            return None
+
+    def reload(self):
+        """Đọc lại cấu hình; trả về True nếu đã thay cấu hình mới.
+
+        Lỗi (cấu hình sai, không đọc được file: PermissionError, file không phải UTF-8...) được đếm
+        vào reload_errors và ghi vào last_error, cấu hình cũ giữ nguyên.
+        """
+        with self._lock:
+            self._mtime = self._file_mtime()
+            try:
+                config = load_config(self._environ, self.path)
+            except (OSError, ValueError) as e:
+                self._failed(e)
+                return False
+            self.config = config
+            self.reloads += 1
+            self.last_error = None
+            return True
+
+    def _failed(self, error):
+        self.reload_errors += 1
+        self.last_error = str(error)
+        print(f"Reload cấu hình {self.path} lỗi, giữ cấu hình cũ: {error}", file=sys.stderr, flush=True)
+
+    def watch(self, interval=5.0):
+        """Thread nền kiểm tra mtime của file cấu hình mỗi interval giây, đổi thì reload()."""
+        if (self._watcher is not None and self._watcher.is_alive()) or interval <= 0:
+            return
+        self._interval = interval
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                if self._file_mtime() != self._mtime:
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        # Lỗi ngoài dự kiến cũng không được làm chết thread (hot reload sẽ tắt tới hết process)
+                        self._failed(e)
+
+        self._watcher = threading.Thread(target=run, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._watcher = None
+
+    def after_fork(self):
+        """Gọi trong process con sau fork: thread watcher không đi theo fork, lock có thể đang bị giữ."""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.watch(self._interval)
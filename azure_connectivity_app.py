@@ -1,16 +1,21 @@
 import streamlit as st
 import os
 import uuid
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.storage.blob import BlobServiceClient
-from azure.cosmos import CosmosClient, PartitionKey, exceptions as cosmos_exceptions
-from azure.mgmt.containerregistry import ContainerRegistryManagementClient
-from azure.mgmt.containerregistry.models import Registry
-import pyodbc
-import redis
-import socket
 import http.client
+import html
+
+from dns_resolver import describe, get_resolver
+from lazy_sdk import lazy_import
+from shared_credential import get_credential
+from step_results import StepRecorder, waterfall
+
+# SDK của từng service chỉ được import khi service đó được dùng lần đầu
+keyvault_secrets = lazy_import("azure.keyvault.secrets")
+storage_blob = lazy_import("azure.storage.blob")
+azure_cosmos = lazy_import("azure.cosmos")
+acr_mgmt = lazy_import("azure.mgmt.containerregistry")
+pyodbc = lazy_import("pyodbc")
+redis = lazy_import("redis")
 
 st.set_page_config(page_title="Azure Connectivity Tester", layout="wide")
 st.title("🔗 Azure Connectivity Tester (Thao tác thực tế)")
@@ -22,31 +27,53 @@ def show_result(step, ok, msg):
     else:
         st.error(f"{step}: {msg}")
 
+def show_waterfall(steps):
+    """Vẽ waterfall thời gian của các bước đã chạy."""
+    rows = waterfall(steps)
+    if not rows:
+        return
+    lines = [f"<div style='font-size:0.85rem;color:#666'>Tổng thời gian: {steps.total * 1000:.0f} ms</div>"]
+    for step, offset, width in rows:
+        color = "#198754" if step.ok else "#dc3545"
+        count = f" ({step.count})" if step.count is not None else ""
+        lines.append(
+            "<div style='display:flex;align-items:center;font-size:0.85rem;margin:2px 0'>"
+            f"<div style='width:30%'>{html.escape(step.name)}{count}</div>"
+            "<div style='flex:1;height:1rem;background:#e9ecef;position:relative'>"
+            f"<div style='position:absolute;top:0;bottom:0;left:{offset:.2f}%;width:{width:.2f}%;"
+            f"min-width:2px;background:{color}'></div></div>"
+            f"<div style='width:5.5rem;text-align:right'>{step.duration * 1000:.0f} ms</div></div>"
+        )
+    st.markdown("".join(lines), unsafe_allow_html=True)
+
 def test_key_vault_full(vault_url, credential):
-    steps = []
+    steps = StepRecorder()
     try:
-        client = SecretClient(vault_url=f"https://{vault_url}/", credential=credential)
+        client = keyvault_secrets.SecretClient(vault_url=f"https://{vault_url}/", credential=credential)
         secret_name = f"test-conn-{uuid.uuid4().hex[:8]}"
         secret_value = uuid.uuid4().hex
         # 1. Set secret
+        steps.begin("set_secret")
         client.set_secret(secret_name, secret_value)
-        steps.append((True, f"Tạo secret '{secret_name}' thành công"))
+        steps.ok(f"Tạo secret '{secret_name}' thành công")
         # 2. Get secret
+        steps.begin("get_secret")
         got = client.get_secret(secret_name)
         if got.value == secret_value:
-            steps.append((True, f"Đọc secret thành công: {got.value}"))
+            steps.ok(f"Đọc secret thành công: {got.value}")
         else:
-            steps.append((False, "Giá trị secret không khớp!"))
+            steps.fail("Giá trị secret không khớp!")
         # 3. Delete secret
+        steps.begin("delete_secret")
         poller = client.begin_delete_secret(secret_name)
         poller.wait()
-        steps.append((True, "Xóa secret thành công"))
+        steps.ok("Xóa secret thành công")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_azure_sql_full(server, database, username=None, password=None):
-    steps = []
+    steps = StepRecorder()
     table = "test_connectivity"
     try:
         if username and password:
@@ -55,148 +82,170 @@ def test_azure_sql_full(server, database, username=None, password=None):
                 f"UID={username};PWD={password};Encrypt=yes;TrustServerCertificate=no;"
             )
         else:
-            steps.append((False, "Vui lòng nhập username và password để sử dụng SQL Authentication."))
+            steps.begin("validate_input")
+            steps.fail("Vui lòng nhập username và password để sử dụng SQL Authentication.")
             return steps
+        steps.begin("connect")
         conn = pyodbc.connect(conn_str, timeout=5)
         cursor = conn.cursor()
+        steps.ok("Kết nối thành công")
         # 1. Create table
+        steps.begin("create_table")
         try:
             cursor.execute(f"CREATE TABLE {table} (id INT PRIMARY KEY, val NVARCHAR(100))")
             conn.commit()
-            steps.append((True, "Tạo bảng test thành công"))
+            steps.ok("Tạo bảng test thành công")
         except Exception:
-            steps.append((True, "Bảng test đã tồn tại"))
+            steps.ok("Bảng test đã tồn tại")
         # 2. Insert
+        steps.begin("insert")
         cursor.execute(f"INSERT INTO {table} (id, val) VALUES (?, ?)", (1, "hello"))
         conn.commit()
-        steps.append((True, "Insert thành công"))
+        steps.ok("Insert thành công")
         # 3. Select
+        steps.begin("select")
         cursor.execute(f"SELECT val FROM {table} WHERE id=1")
         row = cursor.fetchone()
         if row and row[0] == "hello":
-            steps.append((True, f"Select thành công: {row[0]}"))
+            steps.ok(f"Select thành công: {row[0]}")
         else:
-            steps.append((False, "Select thất bại!"))
+            steps.fail("Select thất bại!")
         # 4. Delete row
+        steps.begin("delete_row")
         cursor.execute(f"DELETE FROM {table} WHERE id=1")
         conn.commit()
-        steps.append((True, "Xóa dòng test thành công"))
+        steps.ok("Xóa dòng test thành công")
         # 5. Drop table
+        steps.begin("drop_table")
         cursor.execute(f"DROP TABLE {table}")
         conn.commit()
-        steps.append((True, "Xóa bảng test thành công"))
+        steps.ok("Xóa bảng test thành công")
         conn.close()
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_cosmosdb_full(endpoint, key):
-    steps = []
+    steps = StepRecorder()
     db_name = f"testdb{uuid.uuid4().hex[:6]}"
     container_name = f"testct{uuid.uuid4().hex[:6]}"
     try:
-        client = CosmosClient(f"https://{endpoint}/", key)
+        client = azure_cosmos.CosmosClient(f"https://{endpoint}/", key)
         # 1. Create DB
+        steps.begin("create_database")
         db = client.create_database(db_name)
-        steps.append((True, f"Tạo database '{db_name}' thành công"))
+        steps.ok(f"Tạo database '{db_name}' thành công")
         # 2. Create container
-        container = db.create_container(id=container_name, partition_key=PartitionKey(path="/id"))
-        steps.append((True, f"Tạo container '{container_name}' thành công"))
+        steps.begin("create_container")
+        container = db.create_container(id=container_name, partition_key=azure_cosmos.PartitionKey(path="/id"))
+        steps.ok(f"Tạo container '{container_name}' thành công")
         # 3. Insert item
+        steps.begin("create_item")
         item = {"id": "1", "val": "hello"}
         container.create_item(item)
-        steps.append((True, "Insert item thành công"))
+        steps.ok("Insert item thành công")
         # 4. Query item
+        steps.begin("query_items")
         items = list(container.query_items(query="SELECT * FROM c WHERE c.id='1'", enable_cross_partition_query=True))
         if items and items[0]["val"] == "hello":
-            steps.append((True, f"Query thành công: {items[0]['val']}"))
+            steps.ok(f"Query thành công: {items[0]['val']}", count=len(items))
         else:
-            steps.append((False, "Query thất bại!"))
+            steps.fail("Query thất bại!", count=len(items))
         # 5. Delete item
+        steps.begin("delete_item")
         container.delete_item(item="1", partition_key="1")
-        steps.append((True, "Xóa item thành công"))
+        steps.ok("Xóa item thành công")
         # 6. Delete container
+        steps.begin("delete_container")
         db.delete_container(container_name)
-        steps.append((True, "Xóa container thành công"))
+        steps.ok("Xóa container thành công")
         # 7. Delete DB
+        steps.begin("delete_database")
         client.delete_database(db_name)
-        steps.append((True, "Xóa database thành công"))
+        steps.ok("Xóa database thành công")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_blob_full(blob_url, credential):
-    steps = []
-    try:
-        ip = socket.gethostbyname(blob_url)
-        steps.append((True, f"DNS resolved {blob_url} to {ip}"))
-    except Exception as e:
-        steps.append((False, f"DNS resolution failed: {e}"))
+    steps = StepRecorder()
+    steps.begin("dns")
+    resolved = get_resolver().resolve(blob_url)
+    if resolved.error is None:
+        steps.ok(f"DNS resolved {blob_url} to {describe(resolved)}")
+    else:
+        steps.fail(f"DNS resolution failed: {describe(resolved)}")
     container_name = f"testct{uuid.uuid4().hex[:6]}"
     blob_name = "testfile.txt"
     data = b"hello azure blob"
     try:
-        client = BlobServiceClient(account_url=f"https://{blob_url}/", credential=credential)
+        client = storage_blob.BlobServiceClient(account_url=f"https://{blob_url}/", credential=credential)
         # 1. Create container
+        steps.begin("create_container")
         container = client.create_container(container_name)
-        steps.append((True, f"Tạo container '{container_name}' thành công"))
+        steps.ok(f"Tạo container '{container_name}' thành công")
         # 2. Upload blob
         container_client = client.get_container_client(container_name)
+        steps.begin("upload_blob")
         container_client.upload_blob(blob_name, data)
-        steps.append((True, "Upload blob thành công"))
+        steps.ok("Upload blob thành công", count=len(data))
         # 3. Download blob
+        steps.begin("download_blob")
         blob_data = container_client.download_blob(blob_name).readall()
         if blob_data == data:
-            steps.append((True, "Download blob thành công"))
+            steps.ok("Download blob thành công", count=len(blob_data))
         else:
-            steps.append((False, "Dữ liệu blob không khớp!"))
+            steps.fail("Dữ liệu blob không khớp!", count=len(blob_data))
         # 4. Delete blob
+        steps.begin("delete_blob")
         container_client.delete_blob(blob_name)
-        steps.append((True, "Xóa blob thành công"))
+        steps.ok("Xóa blob thành công")
         # 5. Delete container
+        steps.begin("delete_container")
         client.delete_container(container_name)
-        steps.append((True, "Xóa container thành công"))
+        steps.ok("Xóa container thành công")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_redis_full(redis_connection_string):
-    steps = []
+    steps = StepRecorder()
     key = f"testkey:{uuid.uuid4().hex[:6]}"
     value = uuid.uuid4().hex
     try:
         r = redis.from_url(redis_connection_string)
-        # 1. Set
-        r.set(key, value)
-        steps.append((True, f"Set key '{key}' thành công"))
-        # 2. Get
-        val = r.get(key)
+        # Set, Get, Delete trong một pipeline (1 round-trip)
+        steps.begin("set_get_delete")
+        pipe = r.pipeline(transaction=False)
+        pipe.set(key, value, ex=60)
+        pipe.get(key)
+        pipe.delete(key)
+        _, val, deleted = pipe.execute()
         if val and val.decode() == value:
-            steps.append((True, "Get key thành công"))
+            steps.ok(f"Set/Get/Xóa key '{key}' thành công (1 round-trip)", count=deleted)
         else:
-            steps.append((False, "Giá trị key không khớp!"))
-        # 3. Delete
-        r.delete(key)
-        steps.append((True, "Xóa key thành công"))
+            steps.fail("Giá trị key không khớp!", count=deleted)
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 def test_acr_full(acr_name, subscription_id, resource_group, credential):
-    steps = []
+    steps = StepRecorder()
     try:
-        acr_client = ContainerRegistryManagementClient(credential, subscription_id)
-        registry: Registry = acr_client.registries.get(resource_group, acr_name)
+        acr_client = acr_mgmt.ContainerRegistryManagementClient(credential, subscription_id)
+        steps.begin("get_registry")
+        registry = acr_client.registries.get(resource_group, acr_name)
         login_server = registry.login_server
-        steps.append((True, f"Login server: {login_server}"))
+        steps.ok(f"Login server: {login_server}")
         # Test quyền truy cập bằng cách gọi một API đơn giản, ví dụ: get properties
+        steps.begin("get_properties")
         try:
             props = acr_client.registries.get(resource_group, acr_name)
-            steps.append((True, "Có thể truy cập registry properties"))
+            steps.ok("Có thể truy cập registry properties")
         except Exception as e:
-            steps.append((False, f"Không thể truy cập registry properties: {e}"))
+            steps.fail(f"Không thể truy cập registry properties: {e}")
     except Exception as e:
-        steps.append((False, str(e)))
+        steps.fail(str(e))
     return steps
 
 # --- UI ---
@@ -204,7 +253,7 @@ st.header("Key Vault")
 if 'kv_step' not in st.session_state:
     st.session_state.kv_step = 0
 if 'kv_results' not in st.session_state:
-    st.session_state.kv_results = []
+    st.session_state.kv_results = StepRecorder()
 if 'kv_secret_name' not in st.session_state:
     st.session_state.kv_secret_name = ''
 if 'kv_secret_value' not in st.session_state:
@@ -215,64 +264,68 @@ with st.form("keyvault_form"):
     submitted_kv = st.form_submit_button("Bắt đầu kiểm tra Key Vault")
     if submitted_kv:
         st.session_state.kv_step = 1
-        st.session_state.kv_results = []
+        st.session_state.kv_results = StepRecorder()
         st.session_state.kv_secret_name = f"test-conn-{uuid.uuid4().hex[:8]}"
         st.session_state.kv_secret_value = uuid.uuid4().hex
 
 if st.session_state.kv_step > 0 and keyvault_url:
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=f"https://{keyvault_url}/", credential=credential)
+    credential = get_credential()
+    client = keyvault_secrets.SecretClient(vault_url=f"https://{keyvault_url}/", credential=credential)
     secret_name = st.session_state.kv_secret_name
     secret_value = st.session_state.kv_secret_value
     # Bước 1: Set secret
     if st.session_state.kv_step == 1:
         if st.button("Bước 1: Tạo secret"):
+            st.session_state.kv_results.begin("set_secret")
             try:
                 client.set_secret(secret_name, secret_value)
-                st.session_state.kv_results.append((True, f"Tạo secret '{secret_name}' thành công"))
+                st.session_state.kv_results.ok(f"Tạo secret '{secret_name}' thành công")
                 st.session_state.kv_step = 2
             except Exception as e:
-                st.session_state.kv_results.append((False, str(e)))
+                st.session_state.kv_results.fail(str(e))
                 st.session_state.kv_step = 0
     # Bước 2: Get secret
     elif st.session_state.kv_step == 2:
         for ok, msg in st.session_state.kv_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 2: Đọc secret"):
+            st.session_state.kv_results.begin("get_secret")
             try:
                 got = client.get_secret(secret_name)
                 if got.value == secret_value:
-                    st.session_state.kv_results.append((True, f"Đọc secret thành công: {got.value}"))
+                    st.session_state.kv_results.ok(f"Đọc secret thành công: {got.value}")
                     st.session_state.kv_step = 3
                 else:
-                    st.session_state.kv_results.append((False, "Giá trị secret không khớp!"))
+                    st.session_state.kv_results.fail("Giá trị secret không khớp!")
                     st.session_state.kv_step = 0
             except Exception as e:
-                st.session_state.kv_results.append((False, str(e)))
+                st.session_state.kv_results.fail(str(e))
                 st.session_state.kv_step = 0
     # Bước 3: Delete secret
     elif st.session_state.kv_step == 3:
         for ok, msg in st.session_state.kv_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 3: Xóa secret"):
+            st.session_state.kv_results.begin("delete_secret")
             try:
                 poller = client.begin_delete_secret(secret_name)
                 poller.wait()
-                st.session_state.kv_results.append((True, "Xóa secret thành công"))
+                st.session_state.kv_results.ok("Xóa secret thành công")
                 st.session_state.kv_step = 0
             except Exception as e:
-                st.session_state.kv_results.append((False, str(e)))
+                st.session_state.kv_results.fail(str(e))
                 st.session_state.kv_step = 0
     # Hiển thị kết quả các bước đã thực hiện
     for i, (ok, msg) in enumerate(st.session_state.kv_results, 1):
         show_result(f"Bước {i}", ok, msg)
+    show_waterfall(st.session_state.kv_results)
 
 # Azure SQL Database
 st.header("Azure SQL Database")
 if 'sql_step' not in st.session_state:
     st.session_state.sql_step = 0
 if 'sql_results' not in st.session_state:
-    st.session_state.sql_results = []
+    st.session_state.sql_results = StepRecorder()
 if 'sql_conn' not in st.session_state:
     st.session_state.sql_conn = None
 if 'sql_table' not in st.session_state:
@@ -286,8 +339,9 @@ with st.form("sql_form"):
     submitted_sql = st.form_submit_button("Bắt đầu kiểm tra SQL")
     if submitted_sql:
         st.session_state.sql_step = 1
-        st.session_state.sql_results = []
+        st.session_state.sql_results = StepRecorder()
         st.session_state.sql_table = f"test_connectivity_{uuid.uuid4().hex[:6]}"
+        st.session_state.sql_results.begin("connect")
         try:
             conn_str = (
                 f"DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={sql_server};DATABASE={sql_db};"
@@ -295,8 +349,10 @@ with st.form("sql_form"):
             )
             st.session_state.sql_conn = pyodbc.connect(conn_str, timeout=5)
         except Exception as e:
-            st.session_state.sql_results.append((False, f"Kết nối thất bại: {e}"))
+            st.session_state.sql_results.fail(f"Kết nối thất bại: {e}")
             st.session_state.sql_step = 0
+        else:
+            st.session_state.sql_results.ok("Kết nối thành công")
 
 if st.session_state.sql_step > 0 and st.session_state.sql_conn:
     conn = st.session_state.sql_conn
@@ -305,78 +361,84 @@ if st.session_state.sql_step > 0 and st.session_state.sql_conn:
     # Bước 1: Create table
     if st.session_state.sql_step == 1:
         if st.button("Bước 1: Tạo bảng test"):
+            st.session_state.sql_results.begin("create_table")
             try:
                 cursor.execute(f"CREATE TABLE {table} (id INT PRIMARY KEY, val NVARCHAR(100))")
                 conn.commit()
-                st.session_state.sql_results.append((True, "Tạo bảng test thành công"))
+                st.session_state.sql_results.ok("Tạo bảng test thành công")
             except Exception:
-                st.session_state.sql_results.append((True, "Bảng test đã tồn tại"))
+                st.session_state.sql_results.ok("Bảng test đã tồn tại")
             st.session_state.sql_step = 2
     # Bước 2: Insert
     elif st.session_state.sql_step == 2:
         for ok, msg in st.session_state.sql_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 2: Insert"):
+            st.session_state.sql_results.begin("insert")
             try:
                 cursor.execute(f"INSERT INTO {table} (id, val) VALUES (?, ?)", (1, "hello"))
                 conn.commit()
-                st.session_state.sql_results.append((True, "Insert thành công"))
+                st.session_state.sql_results.ok("Insert thành công")
                 st.session_state.sql_step = 3
             except Exception as e:
-                st.session_state.sql_results.append((False, str(e)))
+                st.session_state.sql_results.fail(str(e))
                 st.session_state.sql_step = 0
     # Bước 3: Select
     elif st.session_state.sql_step == 3:
         for ok, msg in st.session_state.sql_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 3: Select"):
+            st.session_state.sql_results.begin("select")
             try:
                 cursor.execute(f"SELECT val FROM {table} WHERE id=1")
                 row = cursor.fetchone()
                 if row and row[0] == "hello":
-                    st.session_state.sql_results.append((True, f"Select thành công: {row[0]}"))
+                    st.session_state.sql_results.ok(f"Select thành công: {row[0]}")
                     st.session_state.sql_step = 4
                 else:
-                    st.session_state.sql_results.append((False, "Select thất bại!"))
+                    st.session_state.sql_results.fail("Select thất bại!")
                     st.session_state.sql_step = 0
             except Exception as e:
-                st.session_state.sql_results.append((False, str(e)))
+                st.session_state.sql_results.fail(str(e))
                 st.session_state.sql_step = 0
     # Bước 4: Delete row
     elif st.session_state.sql_step == 4:
         for ok, msg in st.session_state.sql_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 4: Xóa dòng test"):
+            st.session_state.sql_results.begin("delete_row")
             try:
                 cursor.execute(f"DELETE FROM {table} WHERE id=1")
                 conn.commit()
-                st.session_state.sql_results.append((True, "Xóa dòng test thành công"))
+                st.session_state.sql_results.ok("Xóa dòng test thành công")
                 st.session_state.sql_step = 5
             except Exception as e:
-                st.session_state.sql_results.append((False, str(e)))
+                st.session_state.sql_results.fail(str(e))
                 st.session_state.sql_step = 0
     # Bước 5: Drop table
     elif st.session_state.sql_step == 5:
         for ok, msg in st.session_state.sql_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 5: Xóa bảng test"):
+            st.session_state.sql_results.begin("drop_table")
             try:
                 cursor.execute(f"DROP TABLE {table}")
                 conn.commit()
-                st.session_state.sql_results.append((True, "Xóa bảng test thành công"))
+                st.session_state.sql_results.ok("Xóa bảng test thành công")
             except Exception as e:
-                st.session_state.sql_results.append((False, str(e)))
+                st.session_state.sql_results.fail(str(e))
             st.session_state.sql_conn.close()
             st.session_state.sql_step = 0
     for i, (ok, msg) in enumerate(st.session_state.sql_results, 1):
         show_result(f"Bước {i}", ok, msg)
+    show_waterfall(st.session_state.sql_results)
 
 # Cosmos DB
 st.header("Cosmos DB")
 if 'cosmos_step' not in st.session_state:
     st.session_state.cosmos_step = 0
 if 'cosmos_results' not in st.session_state:
-    st.session_state.cosmos_results = []
+    st.session_state.cosmos_results = StepRecorder()
 if 'cosmos_db_name' not in st.session_state:
     st.session_state.cosmos_db_name = ''
 if 'cosmos_ct_name' not in st.session_state:
@@ -394,14 +456,17 @@ with st.form("cosmos_form"):
     submitted_cosmos = st.form_submit_button("Bắt đầu kiểm tra Cosmos DB")
     if submitted_cosmos:
         st.session_state.cosmos_step = 1
-        st.session_state.cosmos_results = []
+        st.session_state.cosmos_results = StepRecorder()
         st.session_state.cosmos_db_name = f"testdb{uuid.uuid4().hex[:6]}"
         st.session_state.cosmos_ct_name = f"testct{uuid.uuid4().hex[:6]}"
+        st.session_state.cosmos_results.begin("connect")
         try:
-            st.session_state.cosmos_client = CosmosClient(f"https://{cosmos_endpoint}/", cosmos_key)
+            st.session_state.cosmos_client = azure_cosmos.CosmosClient(f"https://{cosmos_endpoint}/", cosmos_key)
         except Exception as e:
-            st.session_state.cosmos_results.append((False, f"Kết nối thất bại: {e}"))
+            st.session_state.cosmos_results.fail(f"Kết nối thất bại: {e}")
             st.session_state.cosmos_step = 0
+        else:
+            st.session_state.cosmos_results.ok("Kết nối thành công")
 
 if st.session_state.cosmos_step > 0 and st.session_state.cosmos_client:
     client = st.session_state.cosmos_client
@@ -410,105 +475,113 @@ if st.session_state.cosmos_step > 0 and st.session_state.cosmos_client:
     # Bước 1: Create DB
     if st.session_state.cosmos_step == 1:
         if st.button("Bước 1: Tạo database"):
+            st.session_state.cosmos_results.begin("create_database")
             try:
                 db = client.create_database(db_name)
                 st.session_state.cosmos_db = db
-                st.session_state.cosmos_results.append((True, f"Tạo database '{db_name}' thành công"))
+                st.session_state.cosmos_results.ok(f"Tạo database '{db_name}' thành công")
                 st.session_state.cosmos_step = 2
             except Exception as e:
-                st.session_state.cosmos_results.append((False, str(e)))
+                st.session_state.cosmos_results.fail(str(e))
                 st.session_state.cosmos_step = 0
     # Bước 2: Create container
     elif st.session_state.cosmos_step == 2:
         for ok, msg in st.session_state.cosmos_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 2: Tạo container"):
+            st.session_state.cosmos_results.begin("create_container")
             try:
                 db = client.get_database_client(db_name)
-                ct = db.create_container(id=ct_name, partition_key=PartitionKey(path="/id"))
+                ct = db.create_container(id=ct_name, partition_key=azure_cosmos.PartitionKey(path="/id"))
                 st.session_state.cosmos_ct = ct
-                st.session_state.cosmos_results.append((True, f"Tạo container '{ct_name}' thành công"))
+                st.session_state.cosmos_results.ok(f"Tạo container '{ct_name}' thành công")
                 st.session_state.cosmos_step = 3
             except Exception as e:
-                st.session_state.cosmos_results.append((False, str(e)))
+                st.session_state.cosmos_results.fail(str(e))
                 st.session_state.cosmos_step = 0
     # Bước 3: Insert item
     elif st.session_state.cosmos_step == 3:
         for ok, msg in st.session_state.cosmos_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 3: Insert item"):
+            st.session_state.cosmos_results.begin("create_item")
             try:
                 ct = client.get_database_client(db_name).get_container_client(ct_name)
                 item = {"id": "1", "val": "hello"}
                 ct.create_item(item)
-                st.session_state.cosmos_results.append((True, "Insert item thành công"))
+                st.session_state.cosmos_results.ok("Insert item thành công")
                 st.session_state.cosmos_step = 4
             except Exception as e:
-                st.session_state.cosmos_results.append((False, str(e)))
+                st.session_state.cosmos_results.fail(str(e))
                 st.session_state.cosmos_step = 0
     # Bước 4: Query item
     elif st.session_state.cosmos_step == 4:
         for ok, msg in st.session_state.cosmos_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 4: Query item"):
+            st.session_state.cosmos_results.begin("query_items")
             try:
                 ct = client.get_database_client(db_name).get_container_client(ct_name)
                 items = list(ct.query_items(query="SELECT * FROM c WHERE c.id='1'", enable_cross_partition_query=True))
                 if items and items[0]["val"] == "hello":
-                    st.session_state.cosmos_results.append((True, f"Query thành công: {items[0]['val']}"))
+                    st.session_state.cosmos_results.ok(f"Query thành công: {items[0]['val']}", count=len(items))
                     st.session_state.cosmos_step = 5
                 else:
-                    st.session_state.cosmos_results.append((False, "Query thất bại!"))
+                    st.session_state.cosmos_results.fail("Query thất bại!")
                     st.session_state.cosmos_step = 0
             except Exception as e:
-                st.session_state.cosmos_results.append((False, str(e)))
+                st.session_state.cosmos_results.fail(str(e))
                 st.session_state.cosmos_step = 0
     # Bước 5: Delete item
     elif st.session_state.cosmos_step == 5:
         for ok, msg in st.session_state.cosmos_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 5: Xóa item"):
+            st.session_state.cosmos_results.begin("delete_item")
             try:
                 ct = client.get_database_client(db_name).get_container_client(ct_name)
                 ct.delete_item(item="1", partition_key="1")
-                st.session_state.cosmos_results.append((True, "Xóa item thành công"))
+                st.session_state.cosmos_results.ok("Xóa item thành công")
                 st.session_state.cosmos_step = 6
             except Exception as e:
-                st.session_state.cosmos_results.append((False, str(e)))
+                st.session_state.cosmos_results.fail(str(e))
                 st.session_state.cosmos_step = 0
     # Bước 6: Delete container
     elif st.session_state.cosmos_step == 6:
         for ok, msg in st.session_state.cosmos_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 6: Xóa container"):
+            st.session_state.cosmos_results.begin("delete_container")
             try:
                 db = client.get_database_client(db_name)
                 db.delete_container(ct_name)
-                st.session_state.cosmos_results.append((True, "Xóa container thành công"))
+                st.session_state.cosmos_results.ok("Xóa container thành công")
                 st.session_state.cosmos_step = 7
             except Exception as e:
-                st.session_state.cosmos_results.append((False, str(e)))
+                st.session_state.cosmos_results.fail(str(e))
                 st.session_state.cosmos_step = 0
     # Bước 7: Delete DB
     elif st.session_state.cosmos_step == 7:
         for ok, msg in st.session_state.cosmos_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 7: Xóa database"):
+            st.session_state.cosmos_results.begin("delete_database")
             try:
                 client.delete_database(db_name)
-                st.session_state.cosmos_results.append((True, "Xóa database thành công"))
+                st.session_state.cosmos_results.ok("Xóa database thành công")
             except Exception as e:
-                st.session_state.cosmos_results.append((False, str(e)))
+                st.session_state.cosmos_results.fail(str(e))
             st.session_state.cosmos_step = 0
     for i, (ok, msg) in enumerate(st.session_state.cosmos_results, 1):
         show_result(f"Bước {i}", ok, msg)
+    show_waterfall(st.session_state.cosmos_results)
 
 # Blob Storage
 st.header("Blob Storage")
 if 'blob_step' not in st.session_state:
     st.session_state.blob_step = 0
 if 'blob_results' not in st.session_state:
-    st.session_state.blob_results = []
+    st.session_state.blob_results = StepRecorder()
 if 'blob_container' not in st.session_state:
     st.session_state.blob_container = ''
 if 'blob_name' not in st.session_state:
@@ -523,14 +596,18 @@ with st.form("blob_form"):
     submitted_blob = st.form_submit_button("Bắt đầu kiểm tra Blob Storage")
     if submitted_blob:
         st.session_state.blob_step = 1
-        st.session_state.blob_results = []
+        st.session_state.blob_results = StepRecorder()
         st.session_state.blob_container = f"testct{uuid.uuid4().hex[:6]}"
+        st.session_state.blob_results.begin("connect")
         try:
-            credential = DefaultAzureCredential()
-            st.session_state.blob_client = BlobServiceClient(account_url=f"https://{blob_url}/", credential=credential)
+            credential = get_credential()
+            st.session_state.blob_client = storage_blob.BlobServiceClient(
+                account_url=f"https://{blob_url}/", credential=credential)
         except Exception as e:
-            st.session_state.blob_results.append((False, f"Kết nối thất bại: {e}"))
+            st.session_state.blob_results.fail(f"Kết nối thất bại: {e}")
             st.session_state.blob_step = 0
+        else:
+            st.session_state.blob_results.ok("Kết nối thành công")
 
 if st.session_state.blob_step > 0 and st.session_state.blob_client:
     client = st.session_state.blob_client
@@ -540,76 +617,82 @@ if st.session_state.blob_step > 0 and st.session_state.blob_client:
     # Bước 1: Create container
     if st.session_state.blob_step == 1:
         if st.button("Bước 1: Tạo container"):
+            st.session_state.blob_results.begin("create_container")
             try:
                 client.create_container(container_name)
-                st.session_state.blob_results.append((True, f"Tạo container '{container_name}' thành công"))
+                st.session_state.blob_results.ok(f"Tạo container '{container_name}' thành công")
                 st.session_state.blob_step = 2
             except Exception as e:
-                st.session_state.blob_results.append((False, str(e)))
+                st.session_state.blob_results.fail(str(e))
                 st.session_state.blob_step = 0
     # Bước 2: Upload blob
     elif st.session_state.blob_step == 2:
         for ok, msg in st.session_state.blob_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 2: Upload blob"):
+            st.session_state.blob_results.begin("upload_blob")
             try:
                 container_client = client.get_container_client(container_name)
                 container_client.upload_blob(blob_name, data)
-                st.session_state.blob_results.append((True, "Upload blob thành công"))
+                st.session_state.blob_results.ok("Upload blob thành công", count=len(data))
                 st.session_state.blob_step = 3
             except Exception as e:
-                st.session_state.blob_results.append((False, str(e)))
+                st.session_state.blob_results.fail(str(e))
                 st.session_state.blob_step = 0
     # Bước 3: Download blob
     elif st.session_state.blob_step == 3:
         for ok, msg in st.session_state.blob_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 3: Download blob"):
+            st.session_state.blob_results.begin("download_blob")
             try:
                 container_client = client.get_container_client(container_name)
                 blob_data = container_client.download_blob(blob_name).readall()
                 if blob_data == data:
-                    st.session_state.blob_results.append((True, "Download blob thành công"))
+                    st.session_state.blob_results.ok("Download blob thành công", count=len(blob_data))
                     st.session_state.blob_step = 4
                 else:
-                    st.session_state.blob_results.append((False, "Dữ liệu blob không khớp!"))
+                    st.session_state.blob_results.fail("Dữ liệu blob không khớp!")
                     st.session_state.blob_step = 0
             except Exception as e:
-                st.session_state.blob_results.append((False, str(e)))
+                st.session_state.blob_results.fail(str(e))
                 st.session_state.blob_step = 0
     # Bước 4: Delete blob
     elif st.session_state.blob_step == 4:
         for ok, msg in st.session_state.blob_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 4: Xóa blob"):
+            st.session_state.blob_results.begin("delete_blob")
             try:
                 container_client = client.get_container_client(container_name)
                 container_client.delete_blob(blob_name)
-                st.session_state.blob_results.append((True, "Xóa blob thành công"))
+                st.session_state.blob_results.ok("Xóa blob thành công")
                 st.session_state.blob_step = 5
             except Exception as e:
-                st.session_state.blob_results.append((False, str(e)))
+                st.session_state.blob_results.fail(str(e))
                 st.session_state.blob_step = 0
     # Bước 5: Delete container
     elif st.session_state.blob_step == 5:
         for ok, msg in st.session_state.blob_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 5: Xóa container"):
+            st.session_state.blob_results.begin("delete_container")
             try:
                 client.delete_container(container_name)
-                st.session_state.blob_results.append((True, "Xóa container thành công"))
+                st.session_state.blob_results.ok("Xóa container thành công")
             except Exception as e:
-                st.session_state.blob_results.append((False, str(e)))
+                st.session_state.blob_results.fail(str(e))
             st.session_state.blob_step = 0
     for i, (ok, msg) in enumerate(st.session_state.blob_results, 1):
         show_result(f"Bước {i}", ok, msg)
+    show_waterfall(st.session_state.blob_results)
 
 # Azure Container Registry (ACR)
 st.header("Azure Container Registry (ACR)")
 if 'acr_step' not in st.session_state:
     st.session_state.acr_step = 0
 if 'acr_results' not in st.session_state:
-    st.session_state.acr_results = []
+    st.session_state.acr_results = StepRecorder()
 if 'acr_client' not in st.session_state:
     st.session_state.acr_client = None
 if 'acr_registry' not in st.session_state:
@@ -622,48 +705,54 @@ with st.form("acr_form"):
     submitted_acr = st.form_submit_button("Bắt đầu kiểm tra ACR")
     if submitted_acr:
         st.session_state.acr_step = 1
-        st.session_state.acr_results = []
+        st.session_state.acr_results = StepRecorder()
+        st.session_state.acr_results.begin("connect")
         try:
-            credential = DefaultAzureCredential()
-            acr_client = ContainerRegistryManagementClient(credential, acr_subscription)
+            credential = get_credential()
+            acr_client = acr_mgmt.ContainerRegistryManagementClient(credential, acr_subscription)
             st.session_state.acr_client = acr_client
         except Exception as e:
-            st.session_state.acr_results.append((False, f"Kết nối thất bại: {e}"))
+            st.session_state.acr_results.fail(f"Kết nối thất bại: {e}")
             st.session_state.acr_step = 0
+        else:
+            st.session_state.acr_results.ok("Kết nối thành công")
 
 if st.session_state.acr_step > 0 and st.session_state.acr_client:
     acr_client = st.session_state.acr_client
     # Bước 1: Get registry
     if st.session_state.acr_step == 1:
         if st.button("Bước 1: Lấy thông tin registry"):
+            st.session_state.acr_results.begin("get_registry")
             try:
                 registry = acr_client.registries.get(acr_rg, acr_name)
                 st.session_state.acr_registry = registry
-                st.session_state.acr_results.append((True, f"Login server: {registry.login_server}"))
+                st.session_state.acr_results.ok(f"Login server: {registry.login_server}")
                 st.session_state.acr_step = 2
             except Exception as e:
-                st.session_state.acr_results.append((False, str(e)))
+                st.session_state.acr_results.fail(str(e))
                 st.session_state.acr_step = 0
     # Bước 2: Get properties
     elif st.session_state.acr_step == 2:
         for ok, msg in st.session_state.acr_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 2: Kiểm tra quyền truy cập properties"):
+            st.session_state.acr_results.begin("get_properties")
             try:
                 props = acr_client.registries.get(acr_rg, acr_name)
-                st.session_state.acr_results.append((True, "Có thể truy cập registry properties"))
+                st.session_state.acr_results.ok("Có thể truy cập registry properties")
             except Exception as e:
-                st.session_state.acr_results.append((False, f"Không thể truy cập registry properties: {e}"))
+                st.session_state.acr_results.fail(f"Không thể truy cập registry properties: {e}")
             st.session_state.acr_step = 0
     for i, (ok, msg) in enumerate(st.session_state.acr_results, 1):
         show_result(f"Bước {i}", ok, msg)
+    show_waterfall(st.session_state.acr_results)
 
 # Azure Redis Cache
 st.header("Azure Redis Cache")
 if 'redis_step' not in st.session_state:
     st.session_state.redis_step = 0
 if 'redis_results' not in st.session_state:
-    st.session_state.redis_results = []
+    st.session_state.redis_results = StepRecorder()
 if 'redis_key' not in st.session_state:
     st.session_state.redis_key = ''
 if 'redis_value' not in st.session_state:
@@ -676,14 +765,17 @@ with st.form("redis_form"):
     submitted_redis = st.form_submit_button("Bắt đầu kiểm tra Redis")
     if submitted_redis:
         st.session_state.redis_step = 1
-        st.session_state.redis_results = []
+        st.session_state.redis_results = StepRecorder()
         st.session_state.redis_key = f"testkey:{uuid.uuid4().hex[:6]}"
         st.session_state.redis_value = uuid.uuid4().hex
+        st.session_state.redis_results.begin("connect")
         try:
             st.session_state.redis_client = redis.from_url(redis_conn)
         except Exception as e:
-            st.session_state.redis_results.append((False, f"Kết nối thất bại: {e}"))
+            st.session_state.redis_results.fail(f"Kết nối thất bại: {e}")
             st.session_state.redis_step = 0
+        else:
+            st.session_state.redis_results.ok("Kết nối thành công")
 
 if st.session_state.redis_step > 0 and st.session_state.redis_client:
     r = st.session_state.redis_client
@@ -692,39 +784,43 @@ if st.session_state.redis_step > 0 and st.session_state.redis_client:
     # Bước 1: Set
     if st.session_state.redis_step == 1:
         if st.button("Bước 1: Set key"):
+            st.session_state.redis_results.begin("set")
             try:
                 r.set(key, value)
-                st.session_state.redis_results.append((True, f"Set key '{key}' thành công"))
+                st.session_state.redis_results.ok(f"Set key '{key}' thành công")
                 st.session_state.redis_step = 2
             except Exception as e:
-                st.session_state.redis_results.append((False, str(e)))
+                st.session_state.redis_results.fail(str(e))
                 st.session_state.redis_step = 0
     # Bước 2: Get
     elif st.session_state.redis_step == 2:
         for ok, msg in st.session_state.redis_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 2: Get key"):
+            st.session_state.redis_results.begin("get")
             try:
                 val = r.get(key)
                 if val and val.decode() == value:
-                    st.session_state.redis_results.append((True, "Get key thành công"))
+                    st.session_state.redis_results.ok("Get key thành công")
                     st.session_state.redis_step = 3
                 else:
-                    st.session_state.redis_results.append((False, "Giá trị key không khớp!"))
+                    st.session_state.redis_results.fail("Giá trị key không khớp!")
                     st.session_state.redis_step = 0
             except Exception as e:
-                st.session_state.redis_results.append((False, str(e)))
+                st.session_state.redis_results.fail(str(e))
                 st.session_state.redis_step = 0
     # Bước 3: Delete
     elif st.session_state.redis_step == 3:
         for ok, msg in st.session_state.redis_results:
             show_result("Bước trước", ok, msg)
         if st.button("Bước 3: Xóa key"):
+            st.session_state.redis_results.begin("delete")
             try:
                 r.delete(key)
-                st.session_state.redis_results.append((True, "Xóa key thành công"))
+                st.session_state.redis_results.ok("Xóa key thành công")
             except Exception as e:
-                st.session_state.redis_results.append((False, str(e)))
+                st.session_state.redis_results.fail(str(e))
             st.session_state.redis_step = 0
     for i, (ok, msg) in enumerate(st.session_state.redis_results, 1):
-        show_result(f"Bước {i}", ok, msg) 
\ No newline at end of file
+        show_result(f"Bước {i}", ok, msg)
+    show_waterfall(st.session_state.redis_results) 
\ No newline at end of file
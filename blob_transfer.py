@@ -0,0 +1,112 @@
+"""
+Upload/download blob theo stream: chia block và upload song song, đọc về theo chunk
+(có thể đọc song song nhiều range), bộ nhớ chỉ giữ vài block/chunk tại một thời điểm.
+"""
+import base64
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_sdk import lazy_import
+
+azure_core = lazy_import("azure.core")
+storage_blob = lazy_import("azure.storage.blob")
+
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _read_exact(stream, size):
+    """Đọc đủ size byte (hoặc tới hết stream); stream của WSGI có thể trả ít hơn mỗi lần read."""
+    parts = []
+    remaining = size
+    while remaining:
+        data = stream.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b"".join(parts)
+
+
+def _block_id(index):
+    # Block ID phải cùng độ dài trong một blob
+    return base64.b64encode(f"{index:08d}".encode()).decode()
+
+
+def upload_stream(blob_client, stream, block_size=DEFAULT_BLOCK_SIZE, concurrency=4, content_settings=None):
+    """Đọc stream theo từng block và stage_block song song, xong thì commit_block_list.
+
+    Tối đa concurrency block đang upload cùng lúc (cộng một block đang đọc), nên bộ nhớ ~ (concurrency + 1) x block_size.
+    Trả về (số byte, số block, số giây).
+    """
+    start = time.perf_counter()
+    slots = threading.BoundedSemaphore(concurrency)
+    errors = []
+    futures = []
+    total = 0
+
+    def done(future):
+        slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            errors.append(future.exception())
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="blob-upload") as executor:
+        try:
+            while True:
+                data = _read_exact(stream, block_size)
+                if not data:
+                    break
+                slots.acquire()
+                future = executor.submit(blob_client.stage_block, _block_id(len(futures)), data, length=len(data))
+                future.add_done_callback(done)
+                futures.append(future)
+                total += len(data)
+                if errors:
+                    # Một block đã lỗi thì dừng đọc tiếp
+                    raise errors[0]
+            for future in futures:
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    if futures:
+        blocks = [storage_blob.BlobBlock(block_id=_block_id(i)) for i in range(len(futures))]
+        blob_client.commit_block_list(blocks, content_settings=content_settings)
+    else:
+        blob_client.upload_blob(b"", overwrite=True, content_settings=content_settings)
+    return total, len(futures), time.perf_counter() - start
+
+
+def iter_download(blob_client, chunk_size=DEFAULT_CHUNK_SIZE, concurrency=1, properties=None):
+    """Trả về từng chunk (tối đa chunk_size byte) của blob theo đúng thứ tự, ghim theo ETag để không lẫn phiên bản.
+
+    concurrency > 1: đọc trước tối đa concurrency range song song; bộ nhớ ~ concurrency x chunk_size.
+    """
+    properties = properties or blob_client.get_blob_properties()
+
+    def fetch(offset, length):
+        return blob_client.download_blob(offset=offset, length=length, etag=properties.etag,
+                                         match_condition=azure_core.MatchConditions.IfNotModified).readall()
+
+    if concurrency <= 1:
+        # Tự đọc từng range: chunks() của SDK dùng max_single_get_size (32MB) thay vì chunk_size
+        for offset in range(0, properties.size, chunk_size):
+            yield fetch(offset, min(chunk_size, properties.size - offset))
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="blob-download") as executor:
+        try:
+            for offset in range(0, properties.size, chunk_size):
+                pending.append(executor.submit(fetch, offset, min(chunk_size, properties.size - offset)))
+                if len(pending) >= concurrency:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Client ngắt giữa chừng: bỏ các range chưa chạy
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,273 @@
+"""
+Registry client SDK dùng chung trong process, khóa theo cấu hình đã parse,
+và pool connection có giới hạn cho pyodbc.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _close_client(client):
+    """Đóng client nếu SDK hỗ trợ, bỏ qua lỗi khi đóng."""
+    close = getattr(client, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class _Entry:
+    __slots__ = ("client", "created", "last_used", "last_checked", "close")
+
+    def __init__(self, client, now, close=None):
+        self.client = client
+        self.created = now
+        self.last_used = now
+        self.last_checked = now
+        self.close = close
+
+
+class ClientPool:
+    """Cấp client dùng chung giữa các thread (SecretClient, BlobServiceClient, CosmosClient, redis...),
+    thread-safe, có evict khi idle và health check trước khi dùng lại.
+
+    Client bị evict/reset chỉ được bỏ khỏi pool, không đóng: thread khác có thể vẫn đang dùng nó,
+    transport được giải phóng khi không còn tham chiếu. Client có cách đóng an toàn khi đang được dùng
+    (vd. SqlConnectionPool.close) thì truyền vào get(close=...).
+    """
+
+    def __init__(self, idle_timeout=300, check_interval=30):
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._shared = {}
+        self._creating = {}
+        self._last_sweep = time.monotonic()
+
+    def _healthy(self, entry, health_check, now):
+        if health_check is None or now - entry.last_checked < self.check_interval:
+            return True
+        try:
+            ok = health_check(entry.client)
+        except Exception:
+            ok = False
+        if ok:
+            entry.last_checked = now
+        return bool(ok)
+
+    def get(self, service, key, factory, health_check=None, close=None):
+        """Trả về client dùng chung cho (service, key), tạo bằng factory() nếu chưa có hoặc không còn khỏe.
+
+        close(client) được gọi khi client bị bỏ khỏi pool; chỉ truyền khi đóng lúc đang dùng là an toàn.
+        """
+        pool_key = (service, key)
+        now = time.monotonic()
+        self._sweep(now)
+        with self._lock:
+            entry = self._shared.get(pool_key)
+        if entry is not None and not self._healthy(entry, health_check, now):
+            self._discard(pool_key, entry)
+            entry = None
+        if entry is None:
+            # Mỗi key chỉ một thread được tạo client, các thread khác chờ và dùng lại kết quả
+            with self._lock:
+                create_lock = self._creating.setdefault(pool_key, threading.Lock())
+            with create_lock:
+                with self._lock:
+                    entry = self._shared.get(pool_key)
+                if entry is None:
+                    entry = _Entry(factory(), time.monotonic(), close)
+                    with self._lock:
+                        self._shared[pool_key] = entry
+        entry.last_used = now
+        return entry.client
+
+    def items(self, service):
+        """Các client hiện có của service (vd. để đọc thống kê)."""
+        with self._lock:
+            return [entry.client for k, entry in self._shared.items() if k[0] == service]
+
+    def reset(self, service, key=None):
+        """Bỏ các client của service (hoặc đúng key), dùng sau khi gặp lỗi; request sau sẽ tạo client mới."""
+        with self._lock:
+            dropped = [self._shared.pop(k) for k in list(self._shared)
+                       if k[0] == service and (key is None or k[1] == key)]
+        for entry in dropped:
+            self._retire(entry)
+
+    def clear(self):
+        """Bỏ toàn bộ client."""
+        with self._lock:
+            dropped = list(self._shared.values())
+            self._shared.clear()
+        for entry in dropped:
+            self._retire(entry)
+
+    @staticmethod
+    def _retire(entry):
+        if entry.close is not None:
+            try:
+                entry.close(entry.client)
+            except Exception:
+                pass
+
+    def _discard(self, pool_key, entry):
+        with self._lock:
+            if self._shared.get(pool_key) is entry:
+                del self._shared[pool_key]
+        self._retire(entry)
+
+    def _sweep(self, now):
+        """Evict các client không dùng quá idle_timeout; chạy tối đa một lần mỗi check_interval."""
+        if now - self._last_sweep < self.check_interval:
+            return
+        expired = []
+        with self._lock:
+            self._last_sweep = now
+            for k, entry in list(self._shared.items()):
+                if now - entry.last_used > self.idle_timeout:
+                    expired.append(self._shared.pop(k))
+        for entry in expired:
+            self._retire(entry)
+
+
+class PoolTimeout(Exception):
+    """Không mượn được connection trong checkout_timeout giây (pool đã dùng hết)."""
+
+
+class SqlConnectionPool:
+    """Pool connection có giới hạn cho pyodbc (connection không thread-safe, mỗi lần chỉ một thread dùng).
+
+    - Tối đa max_size connection (kể cả đang mượn); hết chỗ thì chờ tối đa checkout_timeout giây.
+    - Connection idle quá validate_after giây được kiểm tra bằng SELECT 1 trước khi giao; hỏng thì bỏ và lấy cái khác.
+    - Connection sống quá max_lifetime hoặc idle quá idle_timeout bị đóng.
+    - is_disconnect(exc) quyết định lỗi nào làm hỏng connection; lỗi khác chỉ rollback rồi trả lại pool.
+    """
+
+    def __init__(self, connect, max_size=5, max_lifetime=1800, idle_timeout=300, validate_after=30,
+                 checkout_timeout=10, is_disconnect=None):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.checkout_timeout = checkout_timeout
+        self._is_disconnect = is_disconnect or (lambda exc: True)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._closed = False
+        self._stats = {"checked_out": 0, "created": 0, "discarded": 0, "stale": 0, "timeouts": 0, "retries": 0}
+
+    @contextmanager
+    def connection(self):
+        """Mượn một connection trong khối with."""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeout(f"Hết connection SQL (tối đa {self.max_size}) sau {self.checkout_timeout}s")
+        try:
+            entry = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checked_out"] += 1
+        try:
+            yield entry.client
+        except BaseException as e:
+            if isinstance(e, Exception) and not self._is_disconnect(e) and self._rollback(entry):
+                self._checkin(entry)
+            else:
+                self._discard(entry)
+            raise
+        else:
+            self._checkin(entry)
+        finally:
+            with self._lock:
+                self._stats["checked_out"] -= 1
+            self._slots.release()
+
+    def run(self, func):
+        """Chạy func(conn); nếu connection cũ bị đứt giữa chừng thì chạy lại một lần với connection mới.
+
+        Chỉ dùng cho thao tác chạy lại được an toàn (đọc dữ liệu).
+        """
+        try:
+            with self.connection() as conn:
+                return func(conn)
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            if not self._is_disconnect(e):
+                raise
+            with self._lock:
+                self._stats["retries"] += 1
+        with self.connection() as conn:
+            return func(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+            stats["max_size"] = self.max_size
+        return stats
+
+    def close(self):
+        """Đóng connection idle; connection đang mượn sẽ bị đóng khi trả lại."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            _close_client(entry.client)
+
+    def _checkout(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                client = self._connect()
+                with self._lock:
+                    self._stats["created"] += 1
+                return _Entry(client, time.monotonic())
+            if now - entry.created > self.max_lifetime or now - entry.last_used > self.idle_timeout:
+                self._discard(entry)
+                continue
+            if now - entry.last_checked >= self.validate_after and not self._validate(entry, now):
+                with self._lock:
+                    self._stats["stale"] += 1
+                self._discard(entry)
+                continue
+            return entry
+
+    @staticmethod
+    def _validate(entry, now):
+        try:
+            entry.client.cursor().execute("SELECT 1").fetchone()
+        except Exception:
+            return False
+        entry.last_checked = now
+        return True
+
+    @staticmethod
+    def _rollback(entry):
+        try:
+            entry.client.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkin(self, entry):
+        entry.last_used = entry.last_checked = time.monotonic()
+        with self._lock:
+            if not self._closed and entry.last_used - entry.created <= self.max_lifetime:
+                self._idle.append(entry)
+                return
+        self._discard(entry)
+
+    def _discard(self, entry):
+        with self._lock:
+            self._stats["discarded"] += 1
+        _close_client(entry.client)
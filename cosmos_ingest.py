@@ -0,0 +1,199 @@
+"""
+Nạp nhiều item vào Cosmos DB: đọc dần JSON array / JSONL, gom theo partition key,
+ghi song song bằng transactional batch và tự chờ lại khi bị throttle (429).
+"""
+import codecs
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_sdk import lazy_import
+
+cosmos_exceptions = lazy_import("azure.cosmos.exceptions")
+
+# Giới hạn của Cosmos: tối đa 100 thao tác trong một transactional batch
+MAX_BATCH_OPERATIONS = 100
+# Một item Cosmos tối đa 2MB; buffer vượt mức này mà vẫn chưa parse được item nào thì coi là JSON hỏng
+MAX_ITEM_SIZE = 4 * 1024 * 1024
+
+
+def iter_json_items(stream, chunk_size=64 * 1024, max_item_size=MAX_ITEM_SIZE):
+    """Đọc lần lượt từng object từ stream text chứa JSON array hoặc JSONL, không nạp cả file vào bộ nhớ.
+
+    JSON hỏng hoặc một item dài hơn max_item_size ký tự thì ném ValueError, không đọc tiếp tới hết file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    array = None
+
+    def fill():
+        nonlocal buffer, eof
+        if len(buffer) > max_item_size:
+            raise ValueError(f"JSON không hợp lệ hoặc item dài hơn {max_item_size} ký tự (gần: {buffer[:80]!r})")
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+    while True:
+        buffer = buffer.lstrip()
+        if array and buffer.startswith(","):
+            buffer = buffer[1:].lstrip()
+        if not buffer:
+            if eof:
+                return
+            fill()
+            continue
+        if array is None:
+            array = buffer.startswith("[")
+            if array:
+                buffer = buffer[1:]
+            continue
+        if array and buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Object bị cắt giữa hai chunk, đọc thêm rồi parse lại
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # Số/literal ở cuối buffer có thể còn tiếp ở chunk sau
+            fill()
+            continue
+        buffer = buffer[end:]
+        yield item
+
+
+def open_text(upload=None, text=None):
+    """Stream text từ file upload (Flask FileStorage) hoặc từ chuỗi dán vào form."""
+    if upload is not None and getattr(upload, "filename", None):
+        # Không dùng TextIOWrapper: SpooledTemporaryFile của Werkzeug không có readable() trên Python 3.10
+        return codecs.getreader("utf-8-sig")(upload.stream)
+    return io.StringIO(text or "")
+
+
+def partition_key_value(item, path):
+    """Giá trị partition key của item theo path dạng /a/b."""
+    value = item
+    for part in path.strip("/").split("/"):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class IngestStats:
+    """Bộ đếm thread-safe cho một lần ingest."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = 0
+        self.failed = 0
+        self.batches = 0
+        self.throttled = 0
+        self.request_charge = 0.0
+        self.errors = []
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def error(self, message):
+        with self._lock:
+            self.failed += 1
+            if len(self.errors) < 5:
+                self.errors.append(message)
+
+    def charge_hook(self, headers, *_):
+        """response_hook của SDK: cộng RU tiêu thụ từ header x-ms-request-charge."""
+        try:
+            self.add(request_charge=float(headers.get("x-ms-request-charge", 0)))
+        except (TypeError, ValueError):
+            pass
+
+    def summary(self):
+        elapsed = self.elapsed or (time.perf_counter() - self.start)
+        return (f"Ingested {self.items} items in {elapsed:.2f}s "
+                f"({self.items / elapsed if elapsed else 0:,.0f} items/s, "
+                f"{self.request_charge:,.0f} RU, {self.request_charge / elapsed if elapsed else 0:,.0f} RU/s, "
+                f"{self.batches} batch, {self.throttled} lần 429, {self.failed} lỗi)")
+
+
+def _with_backoff(call, stats, max_retries):
+    """Gọi lại khi gặp 429, chờ theo x-ms-retry-after-ms (hoặc exponential backoff có jitter)."""
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except cosmos_exceptions.CosmosHttpResponseError as e:
+            if e.status_code != 429 or attempt == max_retries:
+                raise
+            stats.add(throttled=1)
+            headers = getattr(e, "headers", None) or getattr(getattr(e, "response", None), "headers", None) or {}
+            retry_after_ms = headers.get("x-ms-retry-after-ms")
+            delay = float(retry_after_ms) / 1000 if retry_after_ms else min(10.0, 0.1 * 2 ** attempt)
+            time.sleep(delay + random.uniform(0, 0.05))
+
+
+def _write_group(container, key, items, stats, max_retries):
+    if len(items) > 1:
+        operations = [("upsert", (item,)) for item in items]
+        try:
+            _with_backoff(lambda: container.execute_item_batch(
+                batch_operations=operations, partition_key=key, response_hook=stats.charge_hook), stats, max_retries)
+            stats.add(items=len(items), batches=1)
+            return
+        except Exception:
+            # Batch vượt giới hạn (2MB, item lỗi...) thì ghi từng item để biết item nào hỏng
+            pass
+    for item in items:
+        try:
+            _with_backoff(lambda item=item: container.upsert_item(item, response_hook=stats.charge_hook),
+                          stats, max_retries)
+            stats.add(items=1)
+        except Exception as e:
+            stats.error(f"{item.get('id')}: {e}")
+
+
+def ingest_items(container, items, partition_key_path="/id", workers=8, window=2000, max_retries=8):
+    """Upsert các item theo từng cửa sổ `window` item: gom theo partition key, mỗi nhóm ≤100 item
+    ghi bằng một transactional batch, các nhóm chạy song song trên `workers` thread.
+
+    Bộ nhớ chỉ giữ tối đa một cửa sổ. Trả về IngestStats.
+    """
+    stats = IngestStats()
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cosmos-ingest") as executor:
+        while True:
+            groups = {}
+            read = 0
+            for _, item in zip(range(window), items):
+                read += 1
+                if not isinstance(item, dict):
+                    stats.error(f"Bỏ qua phần tử không phải object: {str(item)[:50]}")
+                    continue
+                item.setdefault("id", uuid.uuid4().hex)
+                key = partition_key_value(item, partition_key_path)
+                groups.setdefault(json.dumps(key, sort_keys=True, default=str), (key, []))[1].append(item)
+            if not read:
+                break
+            futures = [
+                executor.submit(_write_group, container, key, group[i:i + MAX_BATCH_OPERATIONS], stats, max_retries)
+                for key, group in groups.values()
+                for i in range(0, len(group), MAX_BATCH_OPERATIONS)
+            ]
+            for future in futures:
+                future.result()
+    stats.elapsed = time.perf_counter() - stats.start
+    return stats
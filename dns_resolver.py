@@ -0,0 +1,174 @@
+"""
+Resolver DNS trong process với cache theo TTL (cache cả kết quả lỗi), thay cho việc gọi nslookup.
+"""
+import asyncio
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+    import dns.resolver
+except ImportError:  # dnspython là tùy chọn; không có thì dùng getaddrinfo của hệ thống (không có TTL thật)
+    dns = None
+
+Resolution = namedtuple("Resolution", "host addresses ttl resolver elapsed cached error canonical")
+Resolution.__doc__ = "Kết quả phân giải một host: địa chỉ, TTL, resolver đã trả lời và thời gian phân giải."
+
+
+def describe(result):
+    """Chuỗi mô tả ngắn gọn để log."""
+    source = f"resolver {result.resolver}, {result.elapsed * 1000:.1f}ms, ttl {result.ttl}s"
+    if result.cached:
+        source += ", cache"
+    if result.error:
+        return f"{result.error} ({source})"
+    alias = f" [{result.canonical}]" if result.canonical and result.canonical != result.host else ""
+    return f"{', '.join(result.addresses)}{alias} ({source})"
+
+
+class DnsResolver:
+    """Phân giải tên miền trong process, cache theo TTL của bản ghi và cache lỗi trong negative_ttl giây."""
+
+    def __init__(self, default_ttl=30, negative_ttl=10, min_ttl=1, max_ttl=300, timeout=5):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.timeout = timeout
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._sync_resolver = None
+        self._async_resolver = None
+
+    def resolve(self, host):
+        """Phân giải host (đồng bộ)."""
+        cached = self._cached(host)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        try:
+            addresses, ttl, resolver, canonical = self._lookup(host)
+            error = None
+        except Exception as e:
+            addresses, ttl, resolver, canonical, error = [], self.negative_ttl, self._resolver_name(), None, str(e) or type(e).__name__
+        return self._store(host, addresses, ttl, resolver, time.perf_counter() - start, error, canonical)
+
+    async def resolve_async(self, host):
+        """Phân giải host mà không chặn event loop."""
+        cached = self._cached(host)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        try:
+            if self._literal(host) or dns is None:
+                addresses, ttl, resolver, canonical = await self._lookup_system_async(host)
+            else:
+                if self._async_resolver is None:
+                    # Đọc /etc/resolv.conf một lần
+                    self._async_resolver = dns.asyncresolver.Resolver()
+                    self._async_resolver.lifetime = self.timeout
+                resolver = self._async_resolver
+                addresses, ttl, resolver, canonical = self._from_answer(
+                    await self._query(resolver, host, asynchronous=True), resolver)
+            error = None
+        except Exception as e:
+            addresses, ttl, resolver, canonical, error = [], self.negative_ttl, self._resolver_name(), None, str(e) or type(e).__name__
+        return self._store(host, addresses, ttl, resolver, time.perf_counter() - start, error, canonical)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _cached(self, host):
+        with self._lock:
+            hit = self._cache.get(host)
+        if hit is not None and hit[0] > time.monotonic():
+            return hit[1]._replace(cached=True)
+        return None
+
+    def _store(self, host, addresses, ttl, resolver, elapsed, error, canonical):
+        if error is None:
+            ttl = max(self.min_ttl, min(self.max_ttl, ttl))
+        result = Resolution(host, addresses, ttl, resolver, elapsed, False, error, canonical)
+        with self._lock:
+            self._cache[host] = (time.monotonic() + ttl, result)
+        return result
+
+    def _resolver_name(self):
+        return "dnspython" if dns is not None else "system"
+
+    @staticmethod
+    def _literal(host):
+        try:
+            ipaddress.ip_address(host)
+            return True
+        except ValueError:
+            return False
+
+    def _lookup(self, host):
+        if self._literal(host) or dns is None:
+            return self._lookup_system(host)
+        if self._sync_resolver is None:
+            self._sync_resolver = dns.resolver.Resolver()
+            self._sync_resolver.lifetime = self.timeout
+        return self._from_answer(self._query(self._sync_resolver, host), self._sync_resolver)
+
+    def _query(self, resolver, host, asynchronous=False):
+        # Tên không có dấu chấm (service nội bộ) mới dùng search domain; FQDN thì hỏi thẳng
+        search = "." not in host.rstrip(".")
+
+        async def query_async():
+            try:
+                return await resolver.resolve(host, "A", search=search)
+            except dns.resolver.NoAnswer:
+                return await resolver.resolve(host, "AAAA", search=search)
+
+        if asynchronous:
+            return query_async()
+        try:
+            return resolver.resolve(host, "A", search=search)
+        except dns.resolver.NoAnswer:
+            return resolver.resolve(host, "AAAA", search=search)
+
+    @staticmethod
+    def _from_answer(answer, resolver):
+        addresses = [rdata.address for rdata in answer]
+        nameserver = getattr(answer, "nameserver", None) or (resolver.nameservers[0] if resolver.nameservers else "?")
+        canonical = answer.canonical_name.to_text(omit_final_dot=True)
+        return addresses, answer.rrset.ttl, f"dns:{nameserver}", canonical
+
+    def _lookup_system(self, host):
+        infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        return self._from_addrinfo(host, infos)
+
+    async def _lookup_system_async(self, host):
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM), self.timeout)
+        return self._from_addrinfo(host, infos)
+
+    def _from_addrinfo(self, host, infos):
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        resolver = "literal" if self._literal(host) else "system"
+        return addresses, self.default_ttl if resolver == "system" else self.max_ttl, resolver, None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_resolver():
+    """Resolver dùng chung cho toàn process."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = DnsResolver(
+                    default_ttl=int(os.environ.get("DNS_DEFAULT_TTL", "30")),
+                    negative_ttl=int(os.environ.get("DNS_NEGATIVE_TTL", "10")),
+                )
+    return _shared
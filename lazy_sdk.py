@@ -0,0 +1,143 @@
+"""
+Import SDK theo nhu cầu: module của một service chỉ được import lần đầu service đó được dùng,
+kèm số liệu thời gian import và RSS tăng thêm để theo dõi cold start.
+
+Đo chi phí import từng SDK (mỗi module một process mới): python lazy_sdk.py [module ...]
+"""
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Các SDK nặng mà app/monitor dùng, theo service
+SDK_MODULES = (
+    "azure.identity",
+    "azure.keyvault.secrets",
+    "azure.storage.blob",
+    "azure.cosmos",
+    "azure.mgmt.containerregistry",
+    "pyodbc",
+    "redis",
+)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_lock = threading.Lock()
+_stats = {}
+_gauges = None
+
+
+def rss_bytes():
+    """RSS hiện tại của process (Linux: /proc/self/statm; nơi khác: RSS lớn nhất)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_age():
+    """Số giây từ lúc process khởi động (gồm cả khởi tạo interpreter), None nếu không đọc được."""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            # Trường 22 (starttime, tính bằng clock tick từ lúc boot); tên process ở trường 2 có thể chứa dấu cách
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _record(name, seconds, rss_delta):
+    with _lock:
+        _stats[name] = {"seconds": seconds, "rss_delta_bytes": rss_delta}
+        gauges = _gauges
+    if gauges is not None:
+        gauges[0].labels(name).set(seconds)
+        gauges[1].labels(name).set(rss_delta)
+
+
+class LazyModule:
+    """Đại diện cho một module chưa import; truy cập thuộc tính đầu tiên sẽ import thật (thread-safe)."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Import ngay (vd. ở gunicorn master trước khi fork) và trả về module thật."""
+        module = self._module
+        if module is not None:
+            return module
+        with self._load_lock:
+            if self._module is None:
+                already = self._name in sys.modules
+                rss_before = rss_bytes()
+                start = time.perf_counter()
+                module = importlib.import_module(self._name)
+                if not already:
+                    _record(self._name, time.perf_counter() - start, rss_bytes() - rss_before)
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+_modules = {}
+
+
+def lazy_import(name):
+    """LazyModule dùng chung cho tên module `name`."""
+    with _lock:
+        module = _modules.get(name)
+        if module is None:
+            module = _modules[name] = LazyModule(name)
+        return module
+
+
+def import_stats():
+    """{module: {"seconds", "rss_delta_bytes"}} của các module đã import qua lazy_import."""
+    with _lock:
+        return {name: dict(stat) for name, stat in _stats.items()}
+
+
+def register_metrics(registry):
+    """Đăng ký thời gian/RSS import từng SDK và RSS hiện tại của process vào metrics registry."""
+    global _gauges
+    seconds = registry.gauge("sdk_import_seconds", "Thời gian import lần đầu của SDK", ("module",))
+    rss = registry.gauge("sdk_import_rss_bytes", "RSS tăng thêm khi import SDK", ("module",))
+    with _lock:
+        _gauges = (seconds, rss)
+        stats = list(_stats.items())
+    for name, stat in stats:
+        seconds.labels(name).set(stat["seconds"])
+        rss.labels(name).set(stat["rss_delta_bytes"])
+    registry.callback("process_resident_memory_bytes", "gauge", "RSS hiện tại của process", rss_bytes)
+
+
+def measure(module):
+    """Import module trong một process Python mới, trả về (giây, RSS tăng thêm)."""
+    code = ("import sys, time; sys.path.insert(0, %r); import lazy_sdk; "
+            "r = lazy_sdk.rss_bytes(); t = time.perf_counter(); __import__(%r); "
+            "print(time.perf_counter() - t, lazy_sdk.rss_bytes() - r)") % (os.path.dirname(os.path.abspath(__file__)),
+                                                                           module)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+if __name__ == "__main__":
+    for module in sys.argv[1:] or SDK_MODULES + ("app",):
+        try:
+            seconds, rss = measure(module)
+            print(f"{module:32s} {seconds * 1000:8.0f} ms {rss / 1024 / 1024:8.1f} MB", flush=True)
+        except subprocess.CalledProcessError as e:
+            print(f"{module:32s} lỗi: {(e.stderr or '').strip().splitlines()[-1:]}", flush=True)
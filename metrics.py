@@ -0,0 +1,382 @@
+"""
+Metric trong bộ nhớ (counter, gauge, histogram) dùng chung cho monitor và Flask app,
+xuất theo định dạng text của Prometheus.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket (giây) đủ chi tiết cho DNS/TCP cỡ ms lẫn call SDK cỡ giây
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Histogram bucket cố định, thread-safe; giá trị tính bằng giây."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """(counts theo bucket, tổng, số mẫu); bucket cuối là +Inf."""
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def quantile(self, q):
+        """Ước lượng quantile q (0..1) bằng nội suy tuyến tính trong bucket."""
+        counts, _, total = self.snapshot()
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Counter:
+    """Bộ đếm chỉ tăng, thread-safe."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def value(self):
+        return self._value
+
+
+class Gauge:
+    """Giá trị hiện tại (tăng/giảm tùy ý)."""
+
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+
+class MetricFamily:
+    """Một metric có nhãn; mỗi bộ giá trị nhãn là một child (Counter/Gauge/Histogram)."""
+
+    def __init__(self, name, kind, help_text, labelnames, factory):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Registry:
+    """Tập metric của process; đăng ký lại cùng tên trả về metric đã có."""
+
+    def __init__(self):
+        self._families = {}
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, kind, help_text, labelnames, factory):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, kind, help_text, labelnames, factory)
+            return family
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(name, "counter", help_text, labelnames, Counter)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(name, "gauge", help_text, labelnames, Gauge)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(name, "histogram", help_text, labelnames, lambda: Histogram(buckets))
+
+    def callback(self, name, kind, help_text, func):
+        """Metric không nhãn, giá trị lấy từ func() tại thời điểm scrape."""
+        with self._lock:
+            self._callbacks[name] = (kind, help_text, func)
+
+    def render(self):
+        """Xuất toàn bộ metric theo định dạng text exposition 0.0.4."""
+        with self._lock:
+            families = list(self._families.values())
+            callbacks = list(self._callbacks.items())
+        lines = []
+        for family in families:
+            lines.append(f"# HELP {family.name} {family.help_text}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.items():
+                if family.kind == "histogram":
+                    counts, total, count = child.snapshot()
+                    cumulative = 0
+                    for bound, bucket_count in zip(child.buckets + (float("inf"),), counts):
+                        cumulative += bucket_count
+                        le = f'le="{_number(bound)}"'
+                        lines.append(f"{family.name}_bucket{_labels(family.labelnames, values, le)} {cumulative}")
+                    lines.append(f"{family.name}_sum{_labels(family.labelnames, values)} {_number(total)}")
+                    lines.append(f"{family.name}_count{_labels(family.labelnames, values)} {count}")
+                else:
+                    lines.append(f"{family.name}{_labels(family.labelnames, values)} {_number(child.value())}")
+        for name, (kind, help_text, func) in callbacks:
+            try:
+                value = func()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Giá trị hiện tại của mọi metric dạng JSON được (để gộp giữa nhiều process)."""
+        with self._lock:
+            families = list(self._families.values())
+            callbacks = list(self._callbacks.items())
+        result = {"families": [], "callbacks": []}
+        for family in families:
+            children = []
+            for values, child in family.items():
+                if family.kind == "histogram":
+                    counts, total, count = child.snapshot()
+                    children.append([list(values), {"buckets": list(child.buckets), "counts": counts,
+                                                    "sum": total, "count": count}])
+                else:
+                    children.append([list(values), child.value()])
+            result["families"].append({"name": family.name, "kind": family.kind, "help": family.help_text,
+                                       "labels": list(family.labelnames), "children": children})
+        for name, (kind, help_text, func) in callbacks:
+            try:
+                result["callbacks"].append([name, kind, help_text, func()])
+            except Exception:
+                continue
+        return result
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiprocessExporter:
+    """Gộp metric của các worker gunicorn qua một thư mục chung (mỗi worker một file <pid>.json).
+
+    Mỗi worker ghi snapshot của registry định kỳ (và ngay trước khi trả /metrics); khi scrape, worker
+    nhận request đọc mọi file và gộp lại:
+    - counter, histogram: cộng dồn mọi worker, kể cả worker đã thoát, nên không bao giờ giảm;
+    - gauge: chỉ lấy worker còn sống, thêm nhãn worker="<pid>".
+    """
+
+    def __init__(self, registry, directory, interval=1.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def clear(directory):
+        """Xóa snapshot cũ (gọi ở master trước khi fork worker)."""
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def flush(self):
+        """Ghi snapshot của process hiện tại (ghi file tạm rồi rename nên người đọc không thấy file dở)."""
+        pid = os.getpid()
+        data = self.registry.snapshot()
+        data["pid"] = pid
+        data["time"] = time.time()
+        path = os.path.join(self.directory, f"{pid}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def start(self):
+        """Ghi snapshot ngay rồi định kỳ trên thread nền (gọi trong từng worker sau khi fork)."""
+        self.flush()
+        self._stop = threading.Event()
+
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self._thread = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def snapshots(self, live_only=False):
+        """Snapshot của các worker (đọc từ thư mục), bỏ file hỏng/đang ghi."""
+        result = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            data["alive"] = _pid_alive(data.get("pid", 0))
+            if data["alive"] or not live_only:
+                result.append(data)
+        return result
+
+    def render(self):
+        """Text exposition của metric đã gộp từ mọi worker."""
+        try:
+            self.flush()
+        except OSError:
+            pass
+        merged = {}
+
+        def family(name, kind, help_text, labels):
+            return merged.setdefault(name, {"kind": kind, "help": help_text, "labels": labels, "children": {}})
+
+        for data in self.snapshots():
+            worker = str(data.get("pid"))
+            for fam in data["families"]:
+                gauge = fam["kind"] == "gauge"
+                if gauge and not data["alive"]:
+                    continue
+                labels = fam["labels"] + ["worker"] if gauge else fam["labels"]
+                target = family(fam["name"], fam["kind"], fam["help"], labels)["children"]
+                for values, value in fam["children"]:
+                    key = tuple(values + [worker] if gauge else values)
+                    if fam["kind"] == "histogram":
+                        current = target.get(key)
+                        if current is None:
+                            target[key] = dict(value, counts=list(value["counts"]))
+                        elif current["buckets"] == value["buckets"]:
+                            current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                            current["sum"] += value["sum"]
+                            current["count"] += value["count"]
+                    elif gauge:
+                        target[key] = value
+                    else:
+                        target[key] = target.get(key, 0) + value
+            for name, kind, help_text, value in data["callbacks"]:
+                if kind == "gauge":
+                    if data["alive"]:
+                        family(name, kind, help_text, ["worker"])["children"][(worker,)] = value
+                else:
+                    children = family(name, kind, help_text, [])["children"]
+                    children[()] = children.get((), 0) + value
+
+        lines = []
+        for name, fam in merged.items():
+            lines.append(f"# HELP {name} {fam['help']}")
+            lines.append(f"# TYPE {name} {fam['kind']}")
+            for values, value in fam["children"].items():
+                if fam["kind"] == "histogram":
+                    cumulative = 0
+                    for bound, bucket_count in zip(value["buckets"] + [float("inf")], value["counts"]):
+                        cumulative += bucket_count
+                        le = f'le="{_number(bound)}"'
+                        lines.append(f"{name}_bucket{_labels(fam['labels'], values, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(fam['labels'], values)} {_number(value['sum'])}")
+                    lines.append(f"{name}_count{_labels(fam['labels'], values)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_labels(fam['labels'], values)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def start_http_server(port, registry=REGISTRY, addr="0.0.0.0"):
+    """Phục vụ GET /metrics trên một thread nền (dùng cho monitor, vốn không có web server)."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
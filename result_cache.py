@@ -0,0 +1,248 @@
+"""
+Cache kết quả các thao tác list theo TTL (LRU, giới hạn số entry), gộp các request giống nhau
+đang chạy thành một lần gọi (single-flight); có backend Redis để các replica dùng chung.
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _BaseCache:
+    """Phần chung: single-flight và invalidate theo generation của namespace.
+
+    Mỗi namespace (vd. ("sql", connection_string)) có một generation, là một phần của khóa entry;
+    invalidate() đổi generation, nên kết quả của lần load bắt đầu trước khi invalidate chỉ được ghi
+    vào generation cũ và không còn ai đọc. Mỗi get_or_load chỉ đọc generation một lần.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._flight_lock = threading.Lock()
+        self._flights = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "loads": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        """Trả về giá trị trong cache; nếu chưa có thì gọi loader() (mỗi key chỉ một lần gọi tại một thời điểm).
+
+        Lỗi của loader được ném lại cho mọi request đang chờ và không được cache.
+        """
+        generation = self._generation(namespace)
+        value = self._lookup(namespace, generation, key)
+        if value is not _MISSING:
+            return value
+        flight_key = (namespace, key)
+        with self._flight_lock:
+            call = self._flights.get(flight_key)
+            leader = call is None
+            if leader:
+                call = self._flights[flight_key] = _Call()
+        if not leader:
+            self._count("coalesced")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = loader()
+            self._count("loads")
+            self._set(namespace, generation, key, call.value, self.ttl if ttl is None else ttl)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            self._count("errors")
+            raise
+        finally:
+            with self._flight_lock:
+                del self._flights[flight_key]
+            call.event.set()
+
+    def get(self, namespace, key):
+        """Giá trị còn hạn, hoặc _MISSING."""
+        return self._lookup(namespace, self._generation(namespace), key)
+
+    def _lookup(self, namespace, generation, key):
+        value = self._get(namespace, generation, key)
+        self._count("misses" if value is _MISSING else "hits")
+        return value
+
+
+class TTLCache(_BaseCache):
+    """Cache trong bộ nhớ của process: TTL cho từng entry, LRU khi vượt max_entries.
+
+    Có generation_dir thì generation của namespace nằm trong file ở thư mục đó: các process cùng đọc
+    (vd. worker gunicorn trên cùng pod), nên invalidate() ở một worker cũng bỏ cache của các worker khác.
+    """
+
+    def __init__(self, ttl=30, max_entries=1024, generation_dir=None):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.generation_dir = generation_dir
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._invalidations = itertools.count()
+        self._stats["evictions"] = 0
+        if generation_dir:
+            os.makedirs(generation_dir, exist_ok=True)
+
+    def _generation_file(self, namespace):
+        return os.path.join(self.generation_dir, f"{_digest(namespace)}.gen")
+
+    def _generation(self, namespace):
+        if self.generation_dir:
+            try:
+                with open(self._generation_file(namespace), encoding="ascii") as f:
+                    return f.read()
+            except OSError:
+                # Chưa từng invalidate (hoặc không đọc được): dùng generation mặc định
+                return ""
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def _get(self, namespace, generation, key):
+        entry_key = (namespace, generation, key)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(entry_key)
+            if hit is None:
+                return _MISSING
+            if hit[0] <= now:
+                del self._data[entry_key]
+                return _MISSING
+            self._data.move_to_end(entry_key)
+            return hit[1]
+
+    def _set(self, namespace, generation, key, value, ttl):
+        with self._lock:
+            self._data[(namespace, generation, key)] = (time.monotonic() + ttl, value)
+            self._data.move_to_end((namespace, generation, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def set(self, namespace, key, value, ttl=None):
+        self._set(namespace, self._generation(namespace), key, value, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, namespace):
+        """Xóa mọi entry của namespace (vd. sau khi ghi dữ liệu mới)."""
+        if self.generation_dir:
+            # Giá trị duy nhất (pid + thời điểm + số thứ tự): chỉ cần khác generation cũ, không cần tăng dần
+            path = self._generation_file(namespace)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="ascii") as f:
+                f.write(f"{os.getpid()}-{time.time_ns()}-{next(self._invalidations)}")
+            os.replace(tmp, path)
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for k in [k for k in self._data if k[0] == namespace]:
+                del self._data[k]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _digest(value):
+    # Namespace có thể chứa connection string (có secret) nên chỉ lưu hash vào Redis
+    return hashlib.sha256(repr(value).encode()).hexdigest()[:32]
+
+
+class RedisCache(_BaseCache):
+    """Cache dùng chung giữa các replica trên Redis; giá trị lưu dạng JSON (tuple đọc lại thành list).
+
+    Entry tự hết hạn theo TTL, dung lượng do maxmemory-policy của Redis quản lý. invalidate() chỉ
+    INCR generation của namespace, entry cũ không còn được đọc và tự hết hạn.
+    Redis lỗi thì coi như cache miss, không làm hỏng thao tác list; sau lỗi, đọc/ghi cache bỏ qua Redis
+    trong retry_after giây để list không phải chờ socket timeout ở mỗi request.
+    """
+
+    def __init__(self, client, ttl=30, prefix="listcache", retry_after=10):
+        super().__init__(ttl)
+        self._client = client
+        self.prefix = prefix
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._stats["skipped"] = 0
+
+    def _available(self):
+        if time.monotonic() < self._down_until:
+            self._count("skipped")
+            return False
+        return True
+
+    def _failed(self):
+        self._down_until = time.monotonic() + self.retry_after
+
+    def _generation_key(self, namespace):
+        return f"{self.prefix}:gen:{_digest(namespace)}"
+
+    def _entry_key(self, namespace, generation, key):
+        return f"{self.prefix}:{_digest(namespace)}:{generation}:{_digest(key)}"
+
+    def _generation(self, namespace):
+        # -1: Redis không dùng được, _get/_set coi như không có cache
+        if not self._available():
+            return -1
+        try:
+            return int(self._client.get(self._generation_key(namespace)) or 0)
+        except Exception:
+            self._failed()
+            return -1
+
+    def _get(self, namespace, generation, key):
+        if generation < 0:
+            return _MISSING
+        try:
+            raw = self._client.get(self._entry_key(namespace, generation, key))
+        except Exception:
+            self._failed()
+            return _MISSING
+        return _MISSING if raw is None else json.loads(raw)
+
+    def _set(self, namespace, generation, key, value, ttl):
+        if generation < 0 or not self._available():
+            return
+        try:
+            self._client.set(self._entry_key(namespace, generation, key), json.dumps(value, default=str), ex=ttl)
+        except Exception:
+            self._failed()
+
+    def set(self, namespace, key, value, ttl=None):
+        self._set(namespace, self._generation(namespace), key, value, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, namespace):
+        # Luôn thử kể cả khi đang bỏ qua Redis: ghi dữ liệu ít khi xảy ra, bỏ sót invalidate thì replica khác
+        # đọc list cũ
+        try:
+            self._client.incr(self._generation_key(namespace))
+        except Exception:
+            self._failed()
+        else:
+            self._down_until = 0.0
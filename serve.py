@@ -0,0 +1,113 @@
+"""
+Chạy Flask app cho production bằng gunicorn: nhiều worker (process) x nhiều thread mỗi worker.
+
+App (cấu hình + SDK của các service đã cấu hình) được import một lần ở process master rồi mới fork, mỗi worker
+sau khi fork tự tạo sẵn client của mình. Cấu hình qua biến môi trường:
+    WEB_BIND (0.0.0.0:5000), WEB_WORKERS (= số CPU được cấp), WEB_THREADS (8),
+    WEB_TIMEOUT (120), WEB_GRACEFUL_TIMEOUT (30), WEB_KEEPALIVE (5), WEB_MAX_REQUESTS (0 = không restart worker),
+    METRICS_MULTIPROC_DIR (thư mục gộp metric giữa các worker, mặc định một thư mục tạm mới),
+    LIST_CACHE_DIR (thư mục generation của cache list để invalidate ở mọi worker, mặc định một thư mục tạm mới).
+Chạy: python serve.py
+"""
+import math
+import os
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+
+def _cgroup_cpu_limit():
+    """Giới hạn CPU của container (resources.limits.cpu) theo cgroup v2 hoặc v1; None nếu không giới hạn."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="ascii") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", encoding="ascii") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", encoding="ascii") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus():
+    """Số CPU process thực sự được dùng: tính cả cpuset và CPU quota của pod, không phải số core của node."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def _post_fork(server, worker):
+    import app as web
+    web.init_worker()
+
+
+def _worker_exit(server, worker):
+    # Dừng thread theo dõi cấu hình; ghi snapshot cuối để counter của worker vừa thoát vẫn được cộng vào /metrics
+    import app as web
+    web.settings.stop()
+    if web.metrics_exporter is not None:
+        web.metrics_exporter.stop()
+
+
+def gunicorn_options():
+    max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "0"))
+    return {
+        "bind": os.environ.get("WEB_BIND", "0.0.0.0:5000"),
+        "workers": int(os.environ.get("WEB_WORKERS") or available_cpus()),
+        # gthread: mỗi worker xử lý nhiều request cùng lúc, thread chờ I/O của Azure không chặn các request khác
+        "worker_class": "gthread",
+        "threads": int(os.environ.get("WEB_THREADS", "8")),
+        "timeout": int(os.environ.get("WEB_TIMEOUT", "120")),
+        "graceful_timeout": int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30")),
+        "keepalive": int(os.environ.get("WEB_KEEPALIVE", "5")),
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        # Import app (parse cấu hình, nạp SDK) trước khi fork: cấu hình sai thì dừng ngay ở master
+        "preload_app": True,
+        "post_fork": _post_fork,
+        "worker_exit": _worker_exit,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+
+
+class FlaskApplication(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import app as web
+        web.preload_sdks()
+        return web.app
+
+
+def prepare_environment(options):
+    """Biến môi trường app cần biết trước khi được import ở master: thư mục gộp metric, thư mục
+    generation của cache list và số worker."""
+    from metrics import MultiprocessExporter
+    directory = os.environ.setdefault("METRICS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="app-metrics-"))
+    MultiprocessExporter.clear(directory)
+    if not os.environ.get("LIST_CACHE_DIR"):
+        os.environ["LIST_CACHE_DIR"] = tempfile.mkdtemp(prefix="app-listcache-")
+    os.environ["WEB_WORKERS"] = str(options["workers"])
+
+
+if __name__ == "__main__":
+    options = gunicorn_options()
+    prepare_environment(options)
+    FlaskApplication(options).run()
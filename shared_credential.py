@@ -0,0 +1,152 @@
+"""
+Credential Azure dùng chung trong process: cache token theo scope và refresh nền trước khi hết hạn.
+"""
+import threading
+import time
+
+from lazy_sdk import lazy_import
+
+azure_identity = lazy_import("azure.identity")
+
+
+class CachedCredential:
+    """Bọc một TokenCredential (mặc định DefaultAzureCredential), cache AccessToken theo scope.
+
+    Token sắp hết hạn (trong refresh_margin giây) được thread nền lấy lại trước,
+    nên request của người dùng gần như luôn nhận token từ cache.
+    """
+
+    def __init__(self, credential=None, refresh_margin=300, refresh_interval=30, min_validity=30):
+        self._credential = credential or azure_identity.DefaultAzureCredential()
+        self.refresh_margin = refresh_margin
+        self.refresh_interval = refresh_interval
+        self.min_validity = min_validity
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._requests = {}
+        self._key_locks = {}
+        self._stop = threading.Event()
+        self._refresher = None
+        self._stats = {
+            "token_fetches": 0,
+            "token_fetch_errors": 0,
+            "cache_hits": 0,
+            "background_refreshes": 0,
+            "fetch_seconds_total": 0.0,
+            "fetch_seconds_max": 0.0,
+            "fetch_seconds_last": 0.0,
+        }
+
+    def get_token(self, *scopes, **kwargs):
+        """Trả về AccessToken cho scopes, lấy từ cache nếu token còn hạn."""
+        if kwargs.get("claims"):
+            # Challenge CAE yêu cầu token mới với claims, không dùng cache
+            return self._fetch(scopes, kwargs)
+        key = (scopes, kwargs.get("tenant_id"), bool(kwargs.get("enable_cae")))
+        token = self._valid_token(key)
+        if token is not None:
+            return token
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            token = self._valid_token(key)
+            if token is None:
+                token = self._fetch(scopes, kwargs)
+                with self._lock:
+                    self._tokens[key] = token
+                    self._requests[key] = (scopes, dict(kwargs))
+        self._ensure_refresher()
+        return token
+
+    def stats(self):
+        """Bộ đếm số lần lấy token và thời gian lấy token."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_scopes"] = len(self._tokens)
+        return stats
+
+    def close(self):
+        self._stop.set()
+        close = getattr(self._credential, "close", None)
+        if callable(close):
+            close()
+
+    def _valid_token(self, key):
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is not None and token.expires_on - time.time() > self.min_validity:
+                self._stats["cache_hits"] += 1
+                return token
+        return None
+
+    def _fetch(self, scopes, kwargs):
+        start = time.perf_counter()
+        try:
+            return self._credential.get_token(*scopes, **kwargs)
+        except Exception:
+            with self._lock:
+                self._stats["token_fetch_errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._stats["token_fetches"] += 1
+                self._stats["fetch_seconds_total"] += elapsed
+                self._stats["fetch_seconds_last"] = elapsed
+                self._stats["fetch_seconds_max"] = max(self._stats["fetch_seconds_max"], elapsed)
+
+    def _ensure_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="token-refresher", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            with self._lock:
+                due = [(key, self._requests[key]) for key, token in self._tokens.items()
+                       if token.expires_on - time.time() <= self.refresh_margin]
+            for key, (scopes, kwargs) in due:
+                try:
+                    token = self._fetch(scopes, kwargs)
+                except Exception:
+                    # Giữ token cũ (nếu còn hạn), thử lại ở vòng sau
+                    continue
+                with self._lock:
+                    self._tokens[key] = token
+                    self._stats["background_refreshes"] += 1
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_credential():
+    """Credential dùng chung cho toàn process (tạo lần đầu khi được gọi)."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = CachedCredential()
+    return _shared
+
+
+def _shared_stat(stat):
+    # Chỉ đọc credential đã có: scrape /metrics không được tạo credential (import azure.identity)
+    credential = _shared
+    return credential.stats()[stat] if credential is not None else 0
+
+
+def register_metrics(registry):
+    """Đăng ký bộ đếm token của credential dùng chung vào metrics registry (0 khi chưa tạo credential)."""
+    for name, kind, stat, help_text in (
+        ("azure_token_fetches_total", "counter", "token_fetches", "Số lần lấy token từ AAD"),
+        ("azure_token_fetch_errors_total", "counter", "token_fetch_errors", "Số lần lấy token lỗi"),
+        ("azure_token_cache_hits_total", "counter", "cache_hits", "Số lần trả token từ cache"),
+        ("azure_token_fetch_seconds_total", "counter", "fetch_seconds_total", "Tổng thời gian lấy token (giây)"),
+        ("azure_token_fetch_seconds_max", "gauge", "fetch_seconds_max", "Thời gian lấy token lâu nhất (giây)"),
+    ):
+        registry.callback(name, kind, help_text, lambda stat=stat: _shared_stat(stat))
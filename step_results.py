@@ -0,0 +1,72 @@
+"""
+Bản ghi từng bước của các test *_full: tên bước, trạng thái, thời gian và số byte/item.
+"""
+import time
+
+
+class Step:
+    """Kết quả một bước. Vẫn unpack được thành (ok, message) như tuple cũ."""
+
+    __slots__ = ("name", "ok", "message", "duration", "count")
+
+    def __init__(self, name, ok, message, duration=0.0, count=None):
+        self.name = name
+        self.ok = ok
+        self.message = message
+        self.duration = duration
+        self.count = count
+
+    def __iter__(self):
+        return iter((self.ok, self.message))
+
+    def __repr__(self):
+        return f"Step({self.name!r}, {self.ok!r}, {self.message!r}, {self.duration:.3f}s, count={self.count!r})"
+
+    def to_dict(self):
+        return {
+            "step": self.name,
+            "ok": self.ok,
+            "message": self.message,
+            "duration_ms": round(self.duration * 1000, 1),
+            "count": self.count,
+        }
+
+
+class StepRecorder(list):
+    """Danh sách Step; begin() bắt đầu đo một bước, ok()/fail() ghi kết quả của bước đó."""
+
+    def __init__(self, steps=()):
+        super().__init__(steps)
+        self._name = None
+        self._start = None
+
+    def begin(self, name):
+        self._name = name
+        self._start = time.perf_counter()
+
+    def ok(self, message, count=None):
+        return self._record(True, message, count)
+
+    def fail(self, message, count=None):
+        return self._record(False, message, count)
+
+    def _record(self, ok, message, count):
+        duration = time.perf_counter() - self._start if self._start is not None else 0.0
+        self.append(Step(self._name or "error", ok, message, duration, count))
+        self._name = self._start = None
+        return ok
+
+    @property
+    def total(self):
+        return sum(step.duration for step in self)
+
+
+def waterfall(steps):
+    """Các hàng (step, offset %, width %) để vẽ waterfall; các bước nối tiếp nhau theo thời gian."""
+    total = sum(step.duration for step in steps) or 1.0
+    rows = []
+    offset = 0.0
+    for step in steps:
+        rows.append((step, offset / total * 100, step.duration / total * 100))
+        offset += step.duration
+    return rows
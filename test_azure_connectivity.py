@@ -1,47 +1,155 @@
 """
 Module kiểm tra kết nối và thao tác cơ bản với các dịch vụ Azure.
 """
+import asyncio
 import os
+import select
+import signal
 import socket
-import subprocess
+import ssl
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
 import http.client
 
-# Azure SDK imports
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.storage.blob import BlobServiceClient
-from azure.cosmos import CosmosClient
-from azure.mgmt.containerregistry import ContainerRegistryManagementClient
-from azure.mgmt.containerregistry.models import Registry
-import pyodbc
-import redis
-
-def check_nslookup(host):
-    """Kiểm tra DNS lookup cho host."""
-    try:
-        output = subprocess.check_output(["nslookup", host], stderr=subprocess.STDOUT, text=True)
-        return True, output
-    except Exception as e:
-        return False, str(e)
+from dns_resolver import describe, get_resolver
+from lazy_sdk import lazy_import, process_age, register_metrics as register_sdk_metrics, rss_bytes
+from metrics import REGISTRY, start_http_server
+from shared_credential import get_credential, register_metrics
+
+# Azure SDK: chỉ import khi service tương ứng được kiểm tra lần đầu
+keyvault_secrets = lazy_import("azure.keyvault.secrets")
+storage_blob = lazy_import("azure.storage.blob")
+azure_cosmos = lazy_import("azure.cosmos")
+acr_mgmt = lazy_import("azure.mgmt.containerregistry")
+pyodbc = lazy_import("pyodbc")
+redis = lazy_import("redis")
+
+# Thời gian từng phase của một probe (giây): dns, tcp, tls, ttfb và total
+PHASES = ("dns", "tcp", "tls", "ttfb", "total")
+_SSL_CONTEXT = ssl.create_default_context()
+
+def _mark(phases, name, start):
+    """Ghi thời gian phase `name` tính từ start vào phases, trả về thời điểm hiện tại."""
+    now = time.perf_counter()
+    if phases is not None:
+        phases[name] = now - start
+    return now
+
+CONNECT_TIMEOUT = 5
+
+def _system_addresses(infos):
+    """Địa chỉ (không trùng, giữ thứ tự) từ kết quả getaddrinfo."""
+    return list(dict.fromkeys(info[4][0] for info in infos))
 
-def check_port(host, port):
+def _resolve_addresses(host, phases):
+    """Mọi địa chỉ A/AAAA của host; dnspython không trả gì (vd. tên chỉ có trong /etc/hosts hay hostAliases)
+    thì dùng getaddrinfo của hệ thống."""
+    start = time.perf_counter()
+    result = get_resolver().resolve(host)
+    addresses = list(result.addresses or ())
+    if not addresses:
+        try:
+            addresses = _system_addresses(socket.getaddrinfo(host, None, type=socket.SOCK_STREAM))
+        except OSError as e:
+            raise OSError(f"DNS: {result.error or e}") from e
+    _mark(phases, "dns", start)
+    return addresses
+
+def _tcp_connect(host, port, phases):
+    """Thử lần lượt từng địa chỉ của host (mỗi địa chỉ tối đa CONNECT_TIMEOUT giây), như socket.create_connection."""
+    error = None
+    for address in _resolve_addresses(host, phases):
+        start = time.perf_counter()
+        try:
+            sock = socket.create_connection((address, int(port)), timeout=CONNECT_TIMEOUT)
+        except OSError as e:
+            error = e
+            continue
+        _mark(phases, "tcp", start)
+        return sock
+    raise error or OSError(f"Không có địa chỉ cho {host}")
+
+def check_nslookup(host, phases=None):
+    """Kiểm tra DNS lookup cho host (resolver trong process, cache theo TTL)."""
+    start = time.perf_counter()
+    result = get_resolver().resolve(host)
+    _mark(phases, "dns", start)
+    return result.error is None, describe(result)
+
+def check_port(host, port, phases=None):
     """Kiểm tra kết nối TCP tới host:port."""
     try:
-        with socket.create_connection((host, int(port)), timeout=5):
+        with _tcp_connect(host, port, phases):
             return True, "SUCCESS"
     except Exception as e:
         return False, str(e)
 
-def check_http(host, port=443, path="/"):
-    """Kiểm tra HTTP GET tới host:port/path."""
-    conn = None
+# Chế độ keep-alive (MONITOR_HTTP_KEEPALIVE=1): giữ một connection HTTPS cho mỗi host:port giữa các vòng check
+_http_connections = {}
+
+def _connection_dropped(conn):
+    """True nếu connection idle không dùng lại được (server đã đóng, hoặc có dữ liệu lạ chờ đọc)."""
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+def _open_https(host, port, phases):
+    """Mở connection HTTPS, đo riêng DNS, TCP connect và TLS handshake."""
+    sock = _tcp_connect(host, port, phases)
+    start = time.perf_counter()
+    try:
+        tls_sock = _SSL_CONTEXT.wrap_socket(sock, server_hostname=host)
+    except Exception:
+        sock.close()
+        raise
+    _mark(phases, "tls", start)
+    conn = http.client.HTTPSConnection(host, port, timeout=5, context=_SSL_CONTEXT)
+    conn.sock = tls_sock
+    return conn
+
+def _http_request(conn, path, phases):
+    start = time.perf_counter()
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    _mark(phases, "ttfb", start)
+    # Đọc hết body để connection dùng lại được
+    resp.read()
+    return resp
+
+def check_http(host, port=443, path="/", keepalive=None, phases=None):
+    """Kiểm tra HTTP GET tới host:port/path.
+
+    Ở chế độ keep-alive, connection được giữ lại và dùng cho lần sau: request "warm" chỉ có ttfb,
+    request "cold" có thêm dns, tcp và tls.
+    """
+    if keepalive is None:
+        keepalive = os.environ.get("MONITOR_HTTP_KEEPALIVE") == "1"
+    conn = _http_connections.pop((host, port), None) if keepalive else None
+    if conn is not None and _connection_dropped(conn):
+        conn.close()
+        conn = None
     try:
-        conn = http.client.HTTPSConnection(host, port, timeout=5)
-        conn.request("GET", path)
-        resp = conn.getresponse()
-        return True, f"HTTP {resp.status} {resp.reason}"
+        if conn is not None:
+            try:
+                resp = _http_request(conn, path, phases)
+                detail = f"HTTP {resp.status} {resp.reason} (warm)"
+            except (http.client.RemoteDisconnected, ConnectionError, ssl.SSLEOFError):
+                # Server đóng connection giữa chừng -> kết nối lại
+                conn.close()
+                conn = None
+        if conn is None:
+            conn = _open_https(host, port, phases)
+            resp = _http_request(conn, path, phases)
+            detail = f"HTTP {resp.status} {resp.reason} (cold)"
+        if keepalive and not resp.will_close and _http_connections.setdefault((host, port), conn) is conn:
+            conn = None
+        return True, detail
     except Exception as e:
         return False, str(e)
     finally:
@@ -51,17 +159,39 @@ def check_http(host, port=443, path="/"):
             except Exception:
                 pass
 
-def log_change(service, check_type, status, detail):
+def format_phases(phases):
+    return " ".join(f"{name}={phases[name] * 1000:.1f}ms" for name in PHASES if name in phases)
+
+def log_change(service, check_type, status, detail, phases=None):
     """Ghi log khi trạng thái kiểm tra thay đổi."""
-    print(f"[{datetime.now().isoformat()}] {service} {check_type}: {status} - {detail}", flush=True)
+    timing = f" [{format_phases(phases)}]" if phases else ""
+    print(f"[{datetime.now().isoformat()}] {service} {check_type}: {status} - {detail}{timing}", flush=True)
+
+# Metric của monitor, xuất qua /metrics trên MONITOR_METRICS_PORT
+PROBE_PHASE_SECONDS = REGISTRY.histogram(
+    "azure_probe_phase_seconds", "Thời gian từng phase của probe", ("service", "check", "phase"))
+PROBE_UP = REGISTRY.gauge("azure_probe_up", "Kết quả probe gần nhất (1 = OK)", ("service", "check"))
+PROBE_FAILURES = REGISTRY.counter("azure_probe_failures_total", "Số probe thất bại", ("service", "check"))
+register_metrics(REGISTRY)
+register_sdk_metrics(REGISTRY)
 
-# Azure credential dùng chung
-credential = DefaultAzureCredential()
+def observe_phases(service, check_type, phases):
+    for name, value in phases.items():
+        PROBE_PHASE_SECONDS.labels(service, check_type, name).observe(value)
+
+def print_latency_summary():
+    """In p50/p95 của từng phase cho mỗi service."""
+    ordered = sorted(PROBE_PHASE_SECONDS.items(), key=lambda item: (item[0][0], item[0][1], PHASES.index(item[0][2])))
+    for (service, check_type, name), histogram in ordered:
+        _, _, count = histogram.snapshot()
+        print(f"[{datetime.now().isoformat()}] LATENCY {service} {check_type} {name}: "
+              f"p50={histogram.quantile(0.5) * 1000:.1f}ms p95={histogram.quantile(0.95) * 1000:.1f}ms n={count}",
+              flush=True)
 
 def test_key_vault(vault_url):
     """Kiểm tra truy cập Key Vault và liệt kê secrets."""
     try:
-        client = SecretClient(vault_url=f"https://{vault_url}/", credential=credential)
+        client = keyvault_secrets.SecretClient(vault_url=f"https://{vault_url}/", credential=get_credential())
         secrets = list(client.list_properties_of_secrets())
         return True, f"Num secrets: {len(secrets)}"
     except Exception as e:
@@ -86,7 +216,7 @@ def test_azure_sql(server, database):
 def test_cosmos_db(endpoint, key, database_name):
     """Kiểm tra truy cập Cosmos DB và liệt kê databases."""
     try:
-        client = CosmosClient(f"https://{endpoint}/", key)
+        client = azure_cosmos.CosmosClient(f"https://{endpoint}/", key)
         dbs = list(client.list_databases())
         return True, f"Num DBs: {len(dbs)}"
     except Exception as e:
@@ -95,7 +225,7 @@ def test_cosmos_db(endpoint, key, database_name):
 def test_blob_storage(blob_url):
     """Kiểm tra truy cập Blob Storage và liệt kê containers."""
     try:
-        client = BlobServiceClient(account_url=f"https://{blob_url}/", credential=credential)
+        client = storage_blob.BlobServiceClient(account_url=f"https://{blob_url}/", credential=get_credential())
         containers = list(client.list_containers())
         return True, f"Num containers: {len(containers)}"
     except Exception as e:
@@ -104,8 +234,8 @@ def test_blob_storage(blob_url):
 def test_container_registry(acr_name, subscription_id, resource_group):
     """Kiểm tra truy cập Azure Container Registry."""
     try:
-        acr_client = ContainerRegistryManagementClient(credential, subscription_id)
-        registry: Registry = acr_client.registries.get(resource_group, acr_name)
+        acr_client = acr_mgmt.ContainerRegistryManagementClient(get_credential(), subscription_id)
+        registry = acr_client.registries.get(resource_group, acr_name)
         login_server = registry.login_server
         return True, f"Login server: {login_server}"
     except Exception as e:
@@ -129,52 +259,304 @@ def get_services_from_env():
         ("Blob", os.environ.get("BLOB_URL", "").replace("https://", "").replace("/", ""), 443),
         ("ACR", os.environ.get("ACR_NAME", "") + ".azurecr.io", 443),
         ("Redis", os.environ.get("REDIS_HOST", ""), 6380),
-    ]
+    ] + get_extra_endpoints_from_env()
+
+def get_extra_endpoints_from_env():
+    """Endpoint bổ sung (chỉ check mạng) từ MONITOR_ENDPOINTS, dạng "ten=host:port,ten2=host2:port2"."""
+    endpoints = []
+    for entry in os.environ.get("MONITOR_ENDPOINTS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, target = entry.rpartition("=")
+        host, _, port = target.partition(":")
+        endpoints.append((name or host, host, int(port or 443)))
+    return endpoints
+
+def build_checks(services):
+    """Danh sách check (service, loại log, key trạng thái, hàm, args) cho mỗi vòng kiểm tra."""
+    checks = []
+    for name, host, port in services:
+        # HTTP check (chỉ cho các dịch vụ không phải Redis, ACR)
+        if name not in ("Redis", "ACR"):
+            checks.append((name, "HTTP", "http", check_http, (host, port)))
+        checks.append((name, "NSLOOKUP", "nslookup", check_nslookup, (host,)))
+        checks.append((name, "TELNET", "telnet", check_port, (host, port)))
+        # AZURE SDK/API check cho KeyVault, SQL, CosmosDB (bỏ qua Blob, ACR, Redis)
+        if name == "KeyVault":
+            checks.append((name, "AZURE", "azure", test_key_vault, (os.environ.get("KEY_VAULT_URL", ""),)))
+        elif name == "SQL":
+            checks.append((name, "AZURE", "azure", test_azure_sql, (host, os.environ.get("SQL_DATABASE", ""))))
+        elif name == "CosmosDB":
+            checks.append((name, "AZURE", "azure", test_cosmos_db,
+                           (host, os.environ.get("COSMOS_KEY", ""), os.environ.get("COSMOS_DATABASE_NAME", ""))))
+    return checks
+
+# Check mạng nhận tham số phases để ghi thời gian từng phase
+PHASED_CHECKS = {check_http, check_nslookup, check_port}
+
+def start_metrics_server():
+    """Bật endpoint /metrics nếu MONITOR_METRICS_PORT khác 0."""
+    port = int(os.environ.get("MONITOR_METRICS_PORT", "9102"))
+    if port:
+        start_http_server(port)
+        print(f"Metrics: http://0.0.0.0:{port}/metrics", flush=True)
+    age = process_age()
+    print(f"Startup: {age if age is not None else float('nan'):.2f}s, RSS {rss_bytes() / 1024 / 1024:.1f} MB "
+          "(SDK được import khi service được kiểm tra lần đầu)", flush=True)
+
+def run_probe(func, args):
+    """Chạy một check, trả về (status, detail, phases)."""
+    phases = {}
+    start = time.perf_counter()
+    if func in PHASED_CHECKS:
+        status, detail = func(*args, phases=phases)
+    else:
+        status, detail = func(*args)
+    _mark(phases, "total", start)
+    return status, detail, phases
+
+def handle_results(results, prev_status):
+    """Ghi histogram và log các check đổi trạng thái."""
+    for (name, check_type, key, _, _), status, detail, phases in results:
+        observe_phases(name, check_type, phases)
+        PROBE_UP.labels(name, check_type).set(1 if status else 0)
+        if not status:
+            PROBE_FAILURES.labels(name, check_type).inc()
+        if prev_status.get((name, key)) != status:
+            log_change(name, check_type, "OK" if status else "FAIL", detail, phases)
+        prev_status[(name, key)] = status
+
+def run_cycle(executor, checks, inflight, check_timeout, cycle_timeout):
+    """Chạy song song một vòng check, mỗi check có deadline riêng và cả vòng có deadline chung.
+
+    Check của vòng trước còn treo (vd. endpoint bị black-hole) không bị submit lại,
+    để không chiếm thêm worker; nó được báo FAIL cho tới khi chạy xong.
+    """
+    cycle_deadline = time.monotonic() + cycle_timeout
+    submitted = []
+    for check in checks:
+        name, _, key, func, args = check
+        future = inflight.get((name, key))
+        if future is not None and not future.done():
+            submitted.append((check, None, None))
+            continue
+        future = executor.submit(run_probe, func, args)
+        inflight[(name, key)] = future
+        submitted.append((check, future, time.monotonic()))
+
+    results = []
+    for check, future, started in submitted:
+        if future is None:
+            results.append((check, False, "Check vòng trước vẫn chưa xong", {}))
+            continue
+        deadline = min(started + check_timeout, cycle_deadline)
+        try:
+            status, detail, phases = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            status, detail, phases = False, f"TIMEOUT sau {check_timeout:g}s", {"total": time.monotonic() - started}
+        except Exception as e:
+            status, detail, phases = False, str(e), {}
+        results.append((check, status, detail, phases))
+    return results
 
 def main():
-    """Vòng lặp kiểm tra trạng thái các dịch vụ Azure."""
+    """Vòng lặp kiểm tra trạng thái các dịch vụ Azure (các check chạy song song)."""
+    services = get_services_from_env()
+    print("Service list:", services, flush=True)
+    start_metrics_server()
+    interval = float(os.environ.get("MONITOR_INTERVAL", "5"))
+    check_timeout = float(os.environ.get("MONITOR_CHECK_TIMEOUT", "10"))
+    cycle_timeout = float(os.environ.get("MONITOR_CYCLE_TIMEOUT", "20"))
+    checks = build_checks(services)
+    workers = max(1, min(int(os.environ.get("MONITOR_WORKERS", "32")), len(checks)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe")
+    summary_interval = float(os.environ.get("MONITOR_SUMMARY_INTERVAL", "60"))
+    last_summary = time.monotonic()
+    prev_status = {}
+    inflight = {}
+    try:
+        while True:
+            cycle_start = time.monotonic()
+            handle_results(run_cycle(executor, checks, inflight, check_timeout, cycle_timeout), prev_status)
+            if summary_interval > 0 and cycle_start - last_summary >= summary_interval:
+                print_latency_summary()
+                last_summary = cycle_start
+            time.sleep(max(0.0, interval - (time.monotonic() - cycle_start)))
+    finally:
+        # Không chờ các check đang treo khi thoát
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Chế độ asyncio: probe mạng không chặn, một process theo dõi được hàng trăm endpoint ---
+async def _async_resolve_addresses(host, phases):
+    start = time.perf_counter()
+    result = await get_resolver().resolve_async(host)
+    addresses = list(result.addresses or ())
+    if not addresses:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except OSError as e:
+            raise OSError(f"DNS: {result.error or e}") from e
+        addresses = _system_addresses(infos)
+    _mark(phases, "dns", start)
+    return addresses
+
+async def _async_tcp_connect(host, port, phases):
+    """Như _tcp_connect nhưng không chặn event loop."""
+    error = None
+    for address in await _async_resolve_addresses(host, phases):
+        sock = socket.socket(socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.get_running_loop().sock_connect(sock, (address, int(port))),
+                                   CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as e:
+            sock.close()
+            error = e
+            continue
+        except BaseException:
+            sock.close()
+            raise
+        _mark(phases, "tcp", start)
+        return sock
+    raise error or OSError(f"Không có địa chỉ cho {host}")
+
+async def async_check_nslookup(host, phases=None):
+    """Phân giải DNS cho host mà không chặn event loop (dùng chung cache với check_nslookup)."""
+    start = time.perf_counter()
+    result = await get_resolver().resolve_async(host)
+    _mark(phases, "dns", start)
+    return result.error is None, describe(result)
+
+async def async_check_port(host, port, phases=None):
+    """Kiểm tra kết nối TCP tới host:port (non-blocking)."""
+    try:
+        sock = await _async_tcp_connect(host, port, phases)
+        sock.close()
+        return True, "SUCCESS"
+    except Exception as e:
+        return False, str(e) or type(e).__name__
+
+async def async_check_http(host, port=443, path="/", phases=None):
+    """Kiểm tra HTTPS GET tới host:port/path (non-blocking), chỉ đọc status line."""
+    writer = None
+    try:
+        sock = await _async_tcp_connect(host, port, phases)
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(sock=sock, ssl=_SSL_CONTEXT, server_hostname=host)
+        except BaseException:
+            sock.close()
+            raise
+        start = _mark(phases, "tls", start)
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: identity\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = (await reader.readline()).decode("latin-1").strip()
+        _mark(phases, "ttfb", start)
+        _, status, reason = (status_line.split(" ", 2) + ["", ""])[:3]
+        if not status.isdigit():
+            return False, f"Phản hồi không hợp lệ: {status_line!r}"
+        return True, f"HTTP {status} {reason}"
+    except Exception as e:
+        return False, str(e) or type(e).__name__
+    finally:
+        if writer is not None:
+            writer.close()
+
+# Hàm check đồng bộ -> bản async tương ứng; các check SDK còn lại chạy trong thread pool
+ASYNC_PROBES = {
+    check_http: async_check_http,
+    check_nslookup: async_check_nslookup,
+    check_port: async_check_port,
+}
+
+async def _run_async_check(semaphore, func, args, check_timeout):
+    async with semaphore:
+        phases = {}
+        start = time.perf_counter()
+        probe = ASYNC_PROBES.get(func)
+        if probe is not None:
+            awaitable = probe(*args, phases=phases)
+        else:
+            awaitable = asyncio.get_running_loop().run_in_executor(None, func, *args)
+        try:
+            status, detail = await asyncio.wait_for(awaitable, check_timeout)
+        except asyncio.TimeoutError:
+            status, detail = False, f"TIMEOUT sau {check_timeout:g}s"
+        except Exception as e:
+            status, detail = False, str(e)
+        _mark(phases, "total", start)
+        return status, detail, phases
+
+async def run_async_cycle(checks, semaphore, check_timeout, cycle_timeout):
+    """Chạy một vòng check trên event loop; check chưa xong khi hết cycle_timeout bị hủy và báo FAIL."""
+    tasks = [asyncio.ensure_future(_run_async_check(semaphore, func, args, check_timeout))
+             for _, _, _, func, args in checks]
+    try:
+        await asyncio.wait(tasks, timeout=cycle_timeout)
+        results = []
+        for check, task in zip(checks, tasks):
+            if task.done():
+                status, detail, phases = task.result()
+            else:
+                status, detail, phases = False, f"TIMEOUT vòng kiểm tra sau {cycle_timeout:g}s", {}
+            results.append((check, status, detail, phases))
+        return results
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def async_main():
+    """Vòng lặp kiểm tra dùng asyncio, dừng sạch khi nhận SIGINT/SIGTERM."""
     services = get_services_from_env()
     print("Service list:", services, flush=True)
+    start_metrics_server()
+    interval = float(os.environ.get("MONITOR_INTERVAL", "5"))
+    check_timeout = float(os.environ.get("MONITOR_CHECK_TIMEOUT", "10"))
+    cycle_timeout = float(os.environ.get("MONITOR_CYCLE_TIMEOUT", "20"))
+    semaphore = asyncio.Semaphore(int(os.environ.get("MONITOR_CONCURRENCY", "100")))
+    checks = build_checks(services)
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    summary_interval = float(os.environ.get("MONITOR_SUMMARY_INTERVAL", "60"))
+    last_summary = loop.time()
     prev_status = {}
-    while True:
-        for name, host, port in services:
-            # HTTP check (chỉ cho các dịch vụ không phải Redis, ACR)
-            if name not in ("Redis", "ACR"):
-                http_status, http_detail = check_http(host, port)
-                if prev_status.get((name, "http")) != http_status:
-                    log_change(name, "HTTP", "OK" if http_status else "FAIL", http_detail)
-                prev_status[(name, "http")] = http_status
-
-            # NSLOOKUP check
-            nslookup_status, nslookup_detail = check_nslookup(host)
-            if prev_status.get((name, "nslookup")) != nslookup_status:
-                log_change(name, "NSLOOKUP", "OK" if nslookup_status else "FAIL", nslookup_detail)
-            prev_status[(name, "nslookup")] = nslookup_status
-
-            # TELNET check
-            telnet_status, telnet_detail = check_port(host, port)
-            if prev_status.get((name, "telnet")) != telnet_status:
-                log_change(name, "TELNET", "OK" if telnet_status else "FAIL", telnet_detail)
-            prev_status[(name, "telnet")] = telnet_status
-
-            # AZURE SDK/API check cho KeyVault, SQL, CosmosDB
-            if name == "KeyVault":
-                kv_status, kv_detail = test_key_vault(os.environ.get("KEY_VAULT_URL", ""))
-                if prev_status.get((name, "azure")) != kv_status:
-                    log_change(name, "AZURE", "OK" if kv_status else "FAIL", kv_detail)
-                    prev_status[(name, "azure")] = kv_status
-            elif name == "SQL":
-                sql_status, sql_detail = test_azure_sql(host, os.environ.get("SQL_DATABASE", ""))
-                if prev_status.get((name, "azure")) != sql_status:
-                    log_change(name, "AZURE", "OK" if sql_status else "FAIL", sql_detail)
-                    prev_status[(name, "azure")] = sql_status
-            elif name == "CosmosDB":
-                cosmos_status, cosmos_detail = test_cosmos_db(host, os.environ.get("COSMOS_KEY", ""), os.environ.get("COSMOS_DATABASE_NAME", ""))
-                if prev_status.get((name, "azure")) != cosmos_status:
-                    log_change(name, "AZURE", "OK" if cosmos_status else "FAIL", cosmos_detail)
-                    prev_status[(name, "azure")] = cosmos_status
-            # Bỏ qua AZURE check cho Blob, ACR, Redis
-        time.sleep(5)
+    stop_waiter = asyncio.ensure_future(stop.wait())
+    try:
+        while not stop.is_set():
+            cycle_start = loop.time()
+            cycle = asyncio.ensure_future(run_async_cycle(checks, semaphore, check_timeout, cycle_timeout))
+            await asyncio.wait({cycle, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if not cycle.done():
+                cycle.cancel()
+                await asyncio.gather(cycle, return_exceptions=True)
+                break
+            handle_results(cycle.result(), prev_status)
+            if summary_interval > 0 and cycle_start - last_summary >= summary_interval:
+                print_latency_summary()
+                last_summary = cycle_start
+            await asyncio.wait({stop_waiter}, timeout=max(0.0, interval - (loop.time() - cycle_start)))
+    finally:
+        stop_waiter.cancel()
+    print(f"[{datetime.now().isoformat()}] Monitor stopped", flush=True)
+
+def main_async():
+    """Entry point chế độ asyncio."""
+    asyncio.run(async_main())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--async" in sys.argv[1:] or os.environ.get("MONITOR_MODE") == "async":
+        main_async()
+    else:
+        main()
\ No newline at end of file
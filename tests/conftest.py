@@ -0,0 +1,9 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Cấu hình giả cho test: app parse cấu hình lúc import, SDK chỉ import khi service được gọi thật
+os.environ.setdefault("SQL_CONNECTION_STRING", "DRIVER={ODBC Driver 18 for SQL Server};SERVER=test;DATABASE=test")
+os.environ.setdefault("COSMOS_CONNECTION_STRING", "AccountEndpoint=https://test.documents.azure.com:443/;AccountKey=a2V5==;")
+os.environ.setdefault("CONFIG_FILE", "")
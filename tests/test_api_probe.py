@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+import app as web
+from step_results import StepRecorder
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def fake_run_full_test(service, config, credential):
+        steps = StepRecorder()
+        steps.begin("connect")
+        steps.ok(service)
+        return steps
+
+    monkeypatch.setattr(web, "run_full_test", fake_run_full_test)
+    monkeypatch.setattr(web, "get_credential", lambda: None)
+    return web.app.test_client()
+
+
+def test_selected_services_run(client):
+    response = client.post("/api/probe", json={"services": ["sql", "redis"]})
+    assert response.status_code == 200
+    assert response.json["ok"] is True
+    assert sorted(response.json["suites"]) == ["redis", "sql"]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"json": {"services": ["sqll"]}},
+    {"query_string": {"services": "sql,typo"}},
+    {"json": {"services": [1]}},
+    {"json": ["x"]},
+    {"json": "sql"},
+])
+def test_bad_input_is_rejected(client, kwargs):
+    response = client.post("/api/probe", **kwargs)
+    assert response.status_code == 400
+    assert response.json["ok"] is False
+
+
+def test_get_does_not_run_full_tests(monkeypatch):
+    calls = []
+    monkeypatch.setattr(web, "run_full_test", lambda *args: calls.append(args))
+    response = web.app.test_client().get("/api/probe")
+    assert response.status_code == 405
+    assert calls == []
+
+
+def test_timeout_is_clamped_and_running_suite_is_not_started_again(monkeypatch):
+    release = threading.Event()
+
+    def hung_run_full_test(service, config, credential):
+        release.wait(5)
+        return StepRecorder()
+
+    monkeypatch.setattr(web, "run_full_test", hung_run_full_test)
+    monkeypatch.setattr(web, "get_credential", lambda: None)
+    monkeypatch.setattr(web, "PROBE_TIMEOUT", 0.05)
+    client = web.app.test_client()
+    try:
+        response = client.post("/api/probe", json={"services": ["sql"], "timeout": 3600})
+        assert response.status_code == 503
+        assert response.json["suites"]["sql"]["error"] == "timeout sau 0.05s"
+        assert client.post("/api/probe", json={"services": ["sql"]}).status_code == 409
+    finally:
+        release.set()
+    deadline = time.monotonic() + 5
+    while web._probe_running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert web._probe_running == set()
@@ -0,0 +1,33 @@
+import os
+import time
+
+import pytest
+
+from app_config import ConfigHolder
+
+pytest.importorskip("yaml")
+
+
+def test_unreadable_file_keeps_config_and_watcher(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("acr_name: first\n")
+    holder = ConfigHolder(str(path), environ={})
+    holder.watch(0.01)
+    try:
+        path.write_bytes(b"acr_name: \xff\n")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        deadline = time.monotonic() + 5
+        while not holder.reload_errors and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert holder.reload_errors == 1
+        assert holder.last_error
+        assert holder.config.acr_name == "first"
+
+        path.write_text("acr_name: second\n")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+        while holder.config.acr_name != "second" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert holder.config.acr_name == "second"
+        assert holder.last_error is None
+    finally:
+        holder.stop()
@@ -0,0 +1,32 @@
+import types
+
+import pytest
+
+import blob_transfer
+
+
+class FakeBlob:
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+
+    def download_blob(self, offset=None, length=None, **kwargs):
+        self.ranges.append((offset, length))
+        return types.SimpleNamespace(readall=lambda: self.data[offset:offset + length])
+
+
+@pytest.fixture(autouse=True)
+def match_conditions(monkeypatch):
+    monkeypatch.setattr(blob_transfer, "azure_core",
+                        types.SimpleNamespace(MatchConditions=types.SimpleNamespace(IfNotModified="if-not-modified")))
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_download_respects_chunk_size(concurrency):
+    data = bytes(range(256)) * 40
+    blob = FakeBlob(data)
+    properties = types.SimpleNamespace(size=len(data), etag='"1"')
+    chunks = list(blob_transfer.iter_download(blob, chunk_size=1000, concurrency=concurrency, properties=properties))
+    assert b"".join(chunks) == data
+    assert [len(chunk) for chunk in chunks] == [1000] * 10 + [240]
+    assert sorted(blob.ranges)[0] == (0, 1000)
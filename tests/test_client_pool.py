@@ -0,0 +1,28 @@
+from client_pool import ClientPool
+
+
+class FakeClient:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_reset_and_sweep_do_not_close_shared_clients():
+    pool = ClientPool(idle_timeout=0, check_interval=0)
+    client = pool.get("blob", "a", FakeClient)
+    pool.reset("blob")
+    assert not client.closed
+    assert pool.get("blob", "a", FakeClient) is not client
+
+    idle = pool.get("redis", "b", FakeClient)
+    pool.get("redis", "c", FakeClient)  # sweep evicts "b"
+    assert not idle.closed
+    assert pool.items("redis") != [idle]
+
+
+def test_close_hook_runs_on_reset():
+    pool = ClientPool()
+    client = pool.get("sql", "a", FakeClient, close=FakeClient.close)
+    pool.reset("sql", "a")
+    assert client.closed
@@ -0,0 +1,33 @@
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from cosmos_ingest import iter_json_items, open_text
+
+
+class CountingStream(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_array_and_jsonl():
+    assert list(iter_json_items(io.StringIO('[{"id": "1"}, {"id": "2"}]'), chunk_size=3)) == [{"id": "1"}, {"id": "2"}]
+    assert list(iter_json_items(io.StringIO('{"id": 1}\n{"id": 22}\n'), chunk_size=4)) == [{"id": 1}, {"id": 22}]
+
+
+def test_malformed_json_stops_before_reading_whole_stream():
+    stream = CountingStream('[{"id": "1", "broken' + " " * 1_000_000 + "]")
+    with pytest.raises(ValueError):
+        list(iter_json_items(stream, chunk_size=1024, max_item_size=10 * 1024))
+    assert stream.reads < 20
+
+
+def test_open_text_decodes_uploaded_file():
+    upload = FileStorage(io.BytesIO('﻿[{"id": "xin chào"}]'.encode("utf-8")), filename="items.json")
+    assert list(iter_json_items(open_text(upload))) == [{"id": "xin chào"}]
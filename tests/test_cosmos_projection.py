@@ -0,0 +1,15 @@
+import pytest
+
+from app import cosmos_projection
+
+
+def test_projection_quotes_every_field():
+    assert cosmos_projection("value, top,meta.select") == \
+        'SELECT c["id"], c["value"], c["top"], c["meta"]["select"] FROM c'
+    assert cosmos_projection("") == "SELECT * FROM c"
+
+
+@pytest.mark.parametrize("fields", ['a"]', "a b", "a..b"])
+def test_projection_rejects_invalid_names(fields):
+    with pytest.raises(ValueError):
+        cosmos_projection(fields)
@@ -0,0 +1,17 @@
+import app as web
+from app_config import AppConfig
+
+
+def test_cosmos_full_test_uses_parsed_config_and_pooled_client(monkeypatch):
+    calls = []
+
+    def fake_get_cosmos_client(endpoint, key):
+        calls.append((endpoint, key))
+        raise RuntimeError("không có Cosmos")
+
+    monkeypatch.setattr(web, "get_cosmos_client", fake_get_cosmos_client)
+    config = AppConfig(cosmos_connection_string="không dùng", cosmos_endpoint="test.documents.azure.com:443",
+                       cosmos_key="a2V5==")
+    steps = web.run_full_test("cosmos", config, None)
+    assert calls == [("test.documents.azure.com:443", "a2V5==")]
+    assert not all(step.ok for step in steps)
@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import MultiprocessExporter, Registry
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_merge_sums_counters_and_keeps_live_gauges(tmp_path):
+    registry = Registry()
+    registry.counter("requests_total", "Requests", ("status",)).labels("200").inc(3)
+    registry.histogram("latency_seconds", "Latency").labels().observe(0.2)
+    registry.gauge("in_flight", "In flight").labels().set(2)
+    registry.callback("ready", "gauge", "Ready", lambda: 1)
+    exporter = MultiprocessExporter(registry, str(tmp_path))
+
+    # Snapshot của một worker đã thoát: counter/histogram vẫn được cộng, gauge thì bỏ
+    exited = registry.snapshot()
+    exited["pid"] = dead_pid()
+    (tmp_path / f"{exited['pid']}.json").write_text(json.dumps(exited))
+    registry.counter("requests_total", "Requests", ("status",)).labels("200").inc(2)
+
+    text = exporter.render()
+    assert 'requests_total{status="200"} 8' in text
+    assert "latency_seconds_count 2" in text
+    assert f'in_flight{{worker="{os.getpid()}"}} 2' in text
+    assert f'worker="{exited["pid"]}"' not in text
+    assert [data["pid"] for data in exporter.snapshots(live_only=True)] == [os.getpid()]
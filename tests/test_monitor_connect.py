@@ -0,0 +1,40 @@
+import asyncio
+import socket
+import types
+
+import pytest
+
+import test_azure_connectivity as monitor
+
+class FakeResolver:
+    def __init__(self, addresses, error=None):
+        self.result = types.SimpleNamespace(addresses=addresses, error=error)
+
+    def resolve(self, host):
+        return self.result
+
+    async def resolve_async(self, host):
+        return self.result
+
+
+@pytest.fixture
+def listener():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    yield server.getsockname()[1]
+    server.close()
+
+
+def test_port_check_tries_every_address(monkeypatch, listener):
+    # 127.0.0.2 không có ai listen: địa chỉ đầu lỗi, địa chỉ sau vẫn phải được thử
+    monkeypatch.setattr(monitor, "get_resolver", lambda: FakeResolver(["127.0.0.2", "127.0.0.1"]))
+    assert monitor.check_port("example.test", listener) == (True, "SUCCESS")
+    assert asyncio.run(monitor.async_check_port("example.test", listener)) == (True, "SUCCESS")
+
+
+def test_falls_back_to_system_resolver(monkeypatch, listener):
+    # Tên chỉ có trong /etc/hosts: dnspython không trả địa chỉ nào
+    monkeypatch.setattr(monitor, "get_resolver", lambda: FakeResolver([], error="NXDOMAIN"))
+    assert monitor.check_port("localhost", listener) == (True, "SUCCESS")
+    assert asyncio.run(monitor.async_check_port("localhost", listener)) == (True, "SUCCESS")
@@ -0,0 +1,67 @@
+import pytest
+
+import app as web
+
+
+class FakePipeline:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def set(self, key, value, ex=None):
+        self.calls.append(("set", key, ex))
+
+    def execute(self):
+        self.calls.append(("execute",))
+
+
+class FakeRedis:
+    def __init__(self, cluster_enabled=0):
+        self.cluster_enabled = cluster_enabled
+        self.calls = []
+        self.info_calls = 0
+
+    def info(self, section):
+        self.info_calls += 1
+        return {"cluster_enabled": self.cluster_enabled}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.calls)
+
+    def mset(self, mapping):
+        self.calls.append(("mset", sorted(mapping)))
+
+
+PAIRS = [("a", "1"), ("b", "2"), ("c", "3")]
+
+
+@pytest.fixture(autouse=True)
+def no_cached_mode(monkeypatch):
+    monkeypatch.setattr(web, "_redis_cluster_mode", {})
+
+
+def test_bulk_set_uses_mset_on_standalone(monkeypatch):
+    client = FakeRedis(cluster_enabled=0)
+    monkeypatch.setattr(web, "get_redis_client", lambda conn: client)
+    monkeypatch.setattr(web, "get_redis_cluster_client", lambda conn: pytest.fail("không phải cluster"))
+    count, round_trips, _ = web.bulk_set_redis("redis://test", PAIRS, batch_size=2)
+    assert (count, round_trips) == (3, 2)
+    assert client.calls == [("mset", ["a", "b"]), ("mset", ["c"])]
+
+
+def test_bulk_set_uses_cluster_client_and_caches_mode(monkeypatch):
+    probe, cluster = FakeRedis(cluster_enabled=1), FakeRedis()
+    monkeypatch.setattr(web, "get_redis_client", lambda conn: probe)
+    monkeypatch.setattr(web, "get_redis_cluster_client", lambda conn: cluster)
+    web.bulk_set_redis("redis://test", PAIRS, batch_size=2)
+    web.bulk_set_redis("redis://test", PAIRS[:1], batch_size=2)
+    assert probe.info_calls == 1
+    assert probe.calls == []
+    assert cluster.calls == [("set", "a", None), ("set", "b", None), ("execute",),
+                             ("set", "c", None), ("execute",), ("set", "a", None), ("execute",)]
+
+
+@pytest.mark.parametrize("ttl", [0, -5])
+def test_bulk_set_rejects_non_positive_ttl(monkeypatch, ttl):
+    monkeypatch.setattr(web, "get_redis_client", lambda conn: pytest.fail("không được tạo client"))
+    with pytest.raises(ValueError):
+        web.bulk_set_redis("redis://test", PAIRS, ttl=ttl)
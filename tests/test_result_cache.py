@@ -0,0 +1,31 @@
+from result_cache import RedisCache, TTLCache
+
+
+def test_invalidate_reaches_other_processes_sharing_the_directory(tmp_path):
+    # Hai worker: mỗi worker một cache trong bộ nhớ, dùng chung thư mục generation
+    first, second = TTLCache(generation_dir=str(tmp_path)), TTLCache(generation_dir=str(tmp_path))
+    assert second.get_or_load("sql", "tables", lambda: ["a"]) == ["a"]
+    assert second.get_or_load("sql", "tables", lambda: ["stale"]) == ["a"]
+    first.invalidate("sql")
+    assert second.get_or_load("sql", "tables", lambda: ["a", "b"]) == ["a", "b"]
+    assert second.get_or_load("redis", "keys", lambda: ["k"]) == ["k"]
+
+
+class DownRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        raise ConnectionError("timeout")
+
+    set = incr = get
+
+
+def test_redis_cache_skips_redis_after_a_failure():
+    client = DownRedis()
+    cache = RedisCache(client, retry_after=60)
+    assert cache.get_or_load("sql", "tables", lambda: ["a"]) == ["a"]
+    assert cache.get_or_load("sql", "tables", lambda: ["b"]) == ["b"]
+    assert client.calls == 1
+    assert cache.stats()["skipped"] == 1
@@ -0,0 +1,12 @@
+import shared_credential
+from metrics import Registry
+
+
+def test_metrics_do_not_create_the_credential(monkeypatch):
+    monkeypatch.setattr(shared_credential, "_shared", None)
+    monkeypatch.setattr(shared_credential, "CachedCredential",
+                        lambda: (_ for _ in ()).throw(AssertionError("không được tạo credential")))
+    registry = Registry()
+    shared_credential.register_metrics(registry)
+    assert "azure_token_fetches_total 0" in registry.render()
+    assert shared_credential._shared is None
@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+import app as web
+
+
+@pytest.fixture
+def inserted(monkeypatch):
+    calls = []
+
+    def fake_bulk_insert(connection_string, table, rows, header=False, batch_size=1000):
+        calls.append((table, list(rows), header))
+        return len(calls[-1][1]), 0.01
+
+    monkeypatch.setattr(web, "bulk_insert_sql", fake_bulk_insert)
+    monkeypatch.setattr(web, "get_credential", lambda: None)
+    return calls
+
+
+def post_csv(data, **form):
+    client = web.app.test_client()
+    fields = {"service": "sql", "action": "bulk", "sql_table": "bulk_test",
+              "sql_file": (io.BytesIO(data), "rows.csv", "text/csv")}
+    fields.update(form)
+    return client.post("/", data=fields, content_type="multipart/form-data")
+
+
+def test_multipart_csv_upload(inserted):
+    response = post_csv("﻿val\r\nxin chào\r\n\"a,b\",2\r\n\r\n".encode("utf-8"), sql_header="1")
+    assert response.status_code == 200
+    assert inserted == [("bulk_test", [["val"], ["xin chào"], ["a,b", "2"]], True)]
+    assert "Inserted 3 rows" in response.get_data(as_text=True)
+
+
+def test_large_multipart_csv_upload_is_spooled(inserted):
+    # > 500KB: Werkzeug ghi file upload ra SpooledTemporaryFile thay vì BytesIO
+    data = "".join(f"giá trị {i}\n" for i in range(60000)).encode("utf-8")
+    assert len(data) > 500 * 1024
+    response = post_csv(data)
+    assert response.status_code == 200
+    rows = inserted[0][1]
+    assert len(rows) == 60000
+    assert rows[0] == ["giá trị 0"] and rows[-1] == ["giá trị 59999"]
@@ -0,0 +1,28 @@
+import app as web
+from step_results import StepRecorder
+
+
+def fake_run_full_test(service, config, credential):
+    steps = StepRecorder()
+    steps.begin("connect")
+    steps.ok(service)
+    return steps
+
+
+def test_get_does_not_run_full_tests(monkeypatch):
+    calls = []
+    monkeypatch.setattr(web, "run_full_test", lambda *args: calls.append(args))
+    response = web.app.test_client().get("/stream")
+    assert response.status_code == 405
+    assert calls == []
+
+
+def test_post_streams_selected_panels(monkeypatch):
+    monkeypatch.setattr(web, "run_full_test", fake_run_full_test)
+    monkeypatch.setattr(web, "get_credential", lambda: None)
+    response = web.app.test_client().post("/stream", data={"services": "sql,redis"})
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert 'showPanel("sql")' in body and 'showPanel("redis")' in body
+    assert 'showPanel("acr")' not in body
+    assert body.rstrip().endswith("</html>")
@@ -0,0 +1,24 @@
+import app as web
+from app_config import AppConfig
+
+
+class FakeCosmosClient:
+    def __init__(self):
+        self.calls = []
+
+    def list_databases(self, max_item_count=None):
+        self.calls.append(max_item_count)
+        return iter([{"id": "db"}])
+
+
+def test_cosmos_only_warms_with_a_request_and_no_credential(monkeypatch):
+    cosmos = FakeCosmosClient()
+
+    def no_credential():
+        raise AssertionError("credential không cần cho Cosmos")
+
+    monkeypatch.setattr(web, "get_credential", no_credential)
+    monkeypatch.setattr(web, "get_cosmos_client", lambda endpoint, key: cosmos)
+    config = AppConfig(cosmos_endpoint="test.documents.azure.com:443", cosmos_key="a2V5==")
+    assert web.warm_clients(config) == {"cosmos": None}
+    assert cosmos.calls == [1]